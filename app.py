@@ -1,87 +1,23 @@
-def compute_progressive_tax(gain):
-    tax = 0
-    if gain <= 0:
-        return 0
-    brackets = [
-        (6000, 0.19),
-        (44000, 0.21),
-        (150000, 0.23),
-        (float("inf"), 0.26),
-    ]
-    remaining = gain
-    limits = [6000, 50000, 200000]
-    prev = 0
-    for limit, rate in zip(limits, [0.19, 0.21, 0.23]):
-        if remaining <= 0:
-            break
-        taxable = min(remaining, limit - prev)
-        tax += taxable * rate
-        remaining -= taxable
-        prev = limit
-    if remaining > 0:
-        tax += remaining * 0.26
-    return tax
-
-# === Helper: Cálculo neto desde bruto anual en España (aprox) ===
-def compute_salary_net(gross_annual: float):
-    """
-    Cálculo aproximado de sueldo NETO a partir de BRUTO anual en España.
+from planificador.arbol import TargetTree, tree_contribution
+from planificador.busqueda import SEARCH_PAGE_SIZE, InstrumentIndex
+from planificador.cache import memoize
+from planificador.catalogo import AssetCatalog
+from planificador.estado import portfolio_state
+from planificador.fiscalidad import NO_TAX_BRACKETS, compute_salary_net, progressive_tax
+from planificador.lotes import LOT_COLUMNS, LotLedger, lowest_tax_band_rebalance
+from planificador.montecarlo import simulate_monte_carlo
+from planificador.objetivos import required_constant_monthly_net, required_final_monthly_net
+from planificador.ordenes import plan_orders
+from planificador.proyeccion import MAX_PROJECTION_MONTHS, MIN_PROJECTION_MONTHS, project_contributions
+from planificador.resumen import ramp_yearly_summary
+from planificador.sensibilidad import required_monthly_grid
+from planificador.simulacion import simulate_constant_plan, simulate_dca_ramp, solve_ramp_final_monthly
+from planificador.universo import ASSET_TYPES, UNIVERSE_FILE, load_universe, universe_version
 
-    - Aplica una cotización de Seguridad Social del trabajador ~6.35% sobre el bruto,
-      con un tope de base anual aproximado (por encima de esa base la cuota ya no aumenta).
-    - Sobre la base después de SS aplica tramos de IRPF aproximados (tipo combinado estatal + autonómico).
-    - NO tiene en cuenta mínimos personales/familiares ni deducciones específicas,
-      así que es una estimación orientativa, no una simulación fiscal exacta.
-    """
-    if gross_annual <= 0:
-        return 0.0, 0.0, 0.0, 0.0
-
-    # 1) Seguridad Social trabajador (~6.35% del bruto) con tope de base
-    ss_rate = 0.0635
-
-    # Aproximación de base máxima anual de cotización:
-    # por encima de esta cantidad, no aumentan las cotizaciones del trabajador.
-    SS_MAX_BASE_ANUAL = 60000.0  # aprox; valor orientativo
-
-    ss_base = min(gross_annual, SS_MAX_BASE_ANUAL)
-    ss_contrib = ss_base * ss_rate
-
-    # Base para IRPF (simplificada: bruto - SS)
-    base_irpf = max(0.0, gross_annual - ss_contrib)
-
-    # 2) Tramos IRPF aproximados (ejemplo genérico España, puede variar por CCAA)
-    #    0–12.450€: 19%
-    #    12.450–20.200€: 24%
-    #    20.200–35.200€: 30%
-    #    35.200–60.000€: 37%
-    #    60.000–300.000€: 45%
-    #    >300.000€: 47%
-    limits = [12450, 20200, 35200, 60000, 300000]
-    rates = [0.19, 0.24, 0.30, 0.37, 0.45]
-    remaining = base_irpf
-    prev = 0.0
-    irpf = 0.0
-
-    for limit, rate in zip(limits, rates):
-        if remaining <= 0:
-            break
-        tramo = min(remaining, limit - prev)
-        if tramo > 0:
-            irpf += tramo * rate
-            remaining -= tramo
-            prev = limit
-
-    # Tramo final > 300.000€
-    if remaining > 0:
-        irpf += remaining * 0.47
-
-    net_annual = gross_annual - ss_contrib - irpf
-    if gross_annual > 0:
-        effective_total_rate = 1.0 - (net_annual / gross_annual)
-    else:
-        effective_total_rate = 0.0
 
-    return net_annual, ss_contrib, irpf, effective_total_rate
+def compute_progressive_tax(gain):
+    """Impuesto sobre plusvalías por tramos progresivos (tabla en planificador/fiscalidad.py)."""
+    return float(progressive_tax(gain))
 
 # === JSON helpers for cartera/planes ===
 import os
@@ -153,131 +89,13 @@ def save_custom_assets(custom_assets: list) -> None:
 
 
 import streamlit as st
+import altair as alt
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
-# === Lógica financiera y de rebalanceo (antes en rebalance_marcos.py) ===
-class Portfolio:
-    def __init__(self, holdings: dict, targets: dict, asset_types: dict | None = None):
-        """
-        holdings: diccionario {activo: valor_actual_€}
-        targets:  diccionario {activo: peso_objetivo (0–1), sumando ~1}
-        asset_types: diccionario opcional {activo: tipo}
-        """
-        self.holdings = dict(holdings)
-        self.targets = dict(targets)
-        self.asset_types = dict(asset_types or {})
-
-    def total_value(self) -> float:
-        """Valor total actual de la cartera."""
-        return float(sum(self.holdings.values()))
-
-    def current_weights(self) -> dict:
-        """Pesos actuales (0–1) de cada activo en la cartera."""
-        total = self.total_value()
-        if total <= 0:
-            return {a: 0.0 for a in self.holdings}
-        return {a: float(v) / total for a, v in self.holdings.items()}
-
-
-def compute_contribution_plan(
-    portfolio: Portfolio,
-    monthly_contribution: float,
-    rebalance_threshold: float = 0.0,
-) -> dict:
-    """
-    Reparte la aportación mensual entre los activos de forma que:
-    - Se intente acercar cada activo a su peso objetivo tras la aportación.
-    - Nunca se venden activos (solo compras, contribuciones >= 0).
-    - Si el ideal implicara vender en algún activo, se reasigna a los infra ponderados.
-
-    rebalance_threshold se mantiene en la firma por compatibilidad, pero no se usa
-    dentro de esta función (el umbral se aplica luego en la lógica de ventas opcionales).
-    """
-    holdings = portfolio.holdings
-    targets = portfolio.targets
-    C = float(monthly_contribution)
-
-    if C <= 0 or not holdings:
-        return {a: 0.0 for a in holdings}
-
-    total0 = portfolio.total_value()
-    if total0 < 0:
-        total0 = 0.0
-    total1 = total0 + C
-
-    # 1) Contribuciones "ideales" para acabar justo en los pesos objetivo
-    raw_contribs: dict[str, float] = {}
-    for a, h in holdings.items():
-        t = float(targets.get(a, 0.0))
-        ideal_value = t * total1
-        raw = ideal_value - float(h)
-        raw_contribs[a] = max(0.0, raw)  # nunca vendemos
-
-    sum_raw = sum(raw_contribs.values())
-
-    # Caso límite: nadie está claramente infraponderado
-    if sum_raw <= 0:
-        sum_targets = sum(targets.values())
-        if sum_targets <= 0:
-            n = len(holdings)
-            if n == 0:
-                return {}
-            uniforme = C / n
-            return {a: uniforme for a in holdings}
-        return {
-            a: C * (float(targets.get(a, 0.0)) / sum_targets)
-            for a in holdings
-        }
-
-    # 2) Si la suma de "ideales" excede la aportación, escalamos todo
-    if sum_raw >= C:
-        scale = C / sum_raw
-        contribs = {a: raw_contribs[a] * scale for a in holdings}
-    else:
-        # 3) Si nos sobra aportación, repartimos el sobrante según los pesos objetivo
-        leftover = C - sum_raw
-        contribs = raw_contribs.copy()
-        sum_targets = sum(targets.values())
-        if sum_targets <= 0:
-            n = len(holdings)
-            extra_each = leftover / n if n > 0 else 0.0
-            for a in holdings:
-                contribs[a] += extra_each
-        else:
-            for a in holdings:
-                contribs[a] += leftover * (float(targets.get(a, 0.0)) / sum_targets)
-
-    return contribs
-
-
-def simulate_constant_plan(
-    current_total: float,
-    monthly_contribution: float,
-    years: int,
-    annual_return: float,
-    extra_savings: float = 0.0,
-):
-    """
-    Simula un plan con aportación mensual constante y rentabilidad anual constante.
-
-    Devuelve:
-    - valor final
-    - lista con el valor estimado mes a mes
-    """
-    months = int(years * 12)
-    r_m = float(annual_return) / 12.0
-    value = float(current_total) + float(extra_savings)
-    series = []
-
-    for _ in range(months):
-        value *= (1.0 + r_m)
-        value += float(monthly_contribution)
-        series.append(value)
-
-    return value, series
-
-
+# === Objetivos de ahorro (la simulación y el reparto están en el paquete planificador) ===
+@memoize("app.required_constant_monthly_for_goal")
 def required_constant_monthly_for_goal(
     current_total: float,
     objetivo_final: float,
@@ -293,59 +111,17 @@ def required_constant_monthly_for_goal(
     tax_rate se mantiene por compatibilidad pero no se usa aquí (los impuestos
     se tratan explícitamente en la lógica de la app).
     """
-    months = int(years * 12)
-    r_m = float(annual_return) / 12.0
-    pv = float(current_total) + float(extra_savings)
-
-    # Sin interés (o casi): reparto lineal
-    if abs(r_m) < 1e-12:
-        needed = objetivo_final - pv
-        if needed <= 0:
-            return 0
-        return int(round(needed / max(months, 1)))
-
-    factor = (1.0 + r_m) ** months
-    fv_pv = pv * factor
-
-    if fv_pv >= objetivo_final:
-        return 0
-
-    pmt = (objetivo_final - fv_pv) * r_m / (factor - 1.0)
-    return int(round(max(0.0, pmt)))
-
-
-def simulate_dca_ramp(
-    initial_monthly: float,
-    final_monthly: float,
-    years: int,
-    annual_return: float,
-    initial_value: float = 0.0,
-):
-    """
-    Simula aportaciones mensuales CRECIENTES de forma lineal entre initial_monthly
-    y final_monthly durante 'years' años.
-    """
-    months = int(years * 12)
-    r_m = float(annual_return) / 12.0
-    value = float(initial_value)
-    series = []
-
-    if months <= 0:
-        return value, series
-
-    for m in range(months):
-        if months > 1:
-            frac = m / (months - 1)
-        else:
-            frac = 1.0
-        contrib = float(initial_monthly) + (float(final_monthly) - float(initial_monthly)) * frac
-        value *= (1.0 + r_m)
-        value += contrib
-        series.append(value)
-
-    return value, series
+    monthly = required_constant_monthly_net(
+        objetivo_final,
+        float(current_total) + float(extra_savings),
+        years,
+        annual_return,
+        brackets=NO_TAX_BRACKETS,
+    )
+    return int(round(monthly))
 
 
+@memoize("app.required_growing_monthlies_for_goal")
 def required_growing_monthlies_for_goal(
     current_total: float,
     objetivo_final: float,
@@ -357,50 +133,44 @@ def required_growing_monthlies_for_goal(
 ):
     """
     Dado un plan con aportaciones crecientes lineales desde initial_monthly hasta
-    una aportación final desconocida, busca (por búsqueda binaria) esa aportación
-    final necesaria para alcanzar 'objetivo_final' de forma BRUTA.
+    una aportación final desconocida, calcula esa aportación final necesaria para
+    alcanzar 'objetivo_final' de forma BRUTA.
+
+    El valor final de la rampa es afín en la aportación final, así que se despeja
+    de forma exacta con dos sumas precalculadas (ver planificador.simulacion.ramp_sums),
+    sin búsqueda binaria ni simulaciones mes a mes.
 
     Devuelve:
-    - aportación mensual final aproximada
+    - aportación mensual final aproximada (nunca menor que initial_monthly)
     - una lista vacía (segundo valor se mantiene por compatibilidad con el código existente).
     """
-    initial_value = float(current_total) + float(extra_savings)
-
-    # Comprobamos si ya llegamos usando aportación plana = initial_monthly
-    val0, _ = simulate_dca_ramp(
-        initial_monthly=initial_monthly,
-        final_monthly=initial_monthly,
-        years=years,
-        annual_return=annual_return,
-        initial_value=initial_value,
-    )
-    if val0 >= objetivo_final:
-        return int(round(initial_monthly)), []
-
-    low = float(initial_monthly)
-    high = max(float(initial_monthly) * 3.0, 5000.0)
-    final_val = val0
-
-    for _ in range(40):
-        mid = (low + high) / 2.0
-        val_mid, _ = simulate_dca_ramp(
+    final_monthly = float(
+        solve_ramp_final_monthly(
+            goal=objetivo_final,
+            initial_value=float(current_total) + float(extra_savings),
             initial_monthly=initial_monthly,
-            final_monthly=mid,
             years=years,
             annual_return=annual_return,
-            initial_value=initial_value,
         )
-        if val_mid < objetivo_final:
-            low = mid
-        else:
-            high = mid
-            final_val = val_mid  # noqa: F841
+    )
+    # Si con la aportación plana ya se llega, no hace falta que crezca
+    return int(round(max(float(initial_monthly), final_monthly))), []
+
 
-    return int(round(high)), []
+@memoize("app.compute_mortgage_payment")
+def compute_mortgage_payment(principal: float, annual_rate: float, years: float) -> float:
+    """Cuota mensual de un préstamo francés (tipo nominal anual / 12) a 'years' años."""
+    r_m = float(annual_rate) / 12.0
+    months = int(years * 12)
+    if months <= 0:
+        return 0.0
+    if r_m > 0:
+        return principal * r_m * (1 + r_m) ** months / ((1 + r_m) ** months - 1)
+    return principal / months
 
 # --- Loader del universo de activos (CSV grande) ---
 @st.cache_data
-def load_universe_csv():
+def load_universe_csv(version: str = ""):
     """
     Carga el universo completo de activos desde el CSV generado
     (ej: 'TradeRepublic_Activos_Completo.csv').
@@ -408,22 +178,135 @@ def load_universe_csv():
     El CSV debe contener al menos:
     ISIN, Name, Type, Region, Country, Country_Code, ETF_Provider,
     ETF_Subtype, Distribution, Currency_Name, Is_ADR, Page, Search_Key
+
+    La tabla normalizada se guarda en una caché Feather junto al CSV que se
+    rehace sola cuando el CSV cambia (ver planificador.universo). `version`
+    (universe_version()) solo forma parte de la clave de st.cache_data: si el CSV
+    cambia, se vuelve a cargar sin reiniciar la app.
     """
     try:
-        df = pd.read_csv("TradeRepublic_Activos_Completo.csv")
-        # Normalizamos algunas columnas clave
-        for col in ["ISIN", "Name", "Search_Key"]:
-            if col in df.columns:
-                df[col] = df[col].astype(str).str.strip()
-        # Aseguramos columnas esperadas aunque vengan ausentes
-        for col in ["Type", "Region", "Country", "ETF_Provider", "ETF_Subtype", "Currency_Name"]:
-            if col not in df.columns:
-                df[col] = ""
-        return df
+        return load_universe(UNIVERSE_FILE)
     except Exception:
         return pd.DataFrame()
 
 
+@st.cache_resource(show_spinner=False)
+def load_asset_catalog(custom_rows: tuple, version: str = "") -> AssetCatalog:
+    """
+    Catálogo del selector de la pestaña 1: activos personalizados (nombre, ISIN,
+    tipo) y universo completo, sin filas vacías ni ISIN repetidos. Se construye
+    una vez por proceso, lista de personalizados y versión del universo, y se
+    comparte entre sesiones.
+    """
+    custom_catalog_df = pd.DataFrame(list(custom_rows), columns=["Nombre", "ISIN", "Tipo"])
+
+    universo_df = load_universe_csv(version)
+    if not universo_df.empty:
+        # El tipo de activo ya viene normalizado con el universo (columna Tipo)
+        universe_small = universo_df[["Name", "ISIN", "Tipo"]].copy()
+        universe_small["Nombre"] = universe_small["Name"].astype(str).str.strip()
+        universe_small["ISIN"] = universe_small["ISIN"].astype(str).str.strip().str.upper()
+        universe_small["Tipo"] = universe_small["Tipo"].astype(str)
+        universe_small = universe_small[["Nombre", "ISIN", "Tipo"]]
+        catalog_df = pd.concat([custom_catalog_df, universe_small], ignore_index=True)
+    else:
+        catalog_df = custom_catalog_df
+
+    if not catalog_df.empty:
+        catalog_df = catalog_df[(catalog_df["Nombre"] != "") & (catalog_df["ISIN"] != "")]
+        catalog_df = catalog_df.drop_duplicates(subset="ISIN").reset_index(drop=True)
+    return AssetCatalog.from_frame(catalog_df)
+
+
+@st.cache_resource(show_spinner=False)
+def load_instrument_index(version: str = "") -> InstrumentIndex:
+    """
+    Buscador del universo de la pestaña 4 (ver planificador.busqueda), con la
+    etiqueta de cada activo ya construida. Se construye una vez por versión del
+    universo y se comparte entre sesiones.
+    """
+    universe_df = load_universe_csv(version)
+    labels = (
+        universe_df["Name"].astype(str)
+        + " ("
+        + universe_df["ISIN"].astype(str)
+        + ") - "
+        + universe_df["Type"].astype(str)
+        + " "
+        + universe_df["Region"].astype(str)
+    )
+    return InstrumentIndex.from_frame(universe_df, labels=labels.tolist())
+
+
+@st.cache_data(show_spinner=False)
+def cached_sensitivity_grid(
+    goal: float,
+    initial_value: float,
+    initial_monthly: float | None,
+    apply_tax: bool,
+) -> pd.DataFrame:
+    """
+    Rejilla (rentabilidad × años) de aportación necesaria, cacheada por el hash de
+    sus entradas: solo se recalcula cuando cambian el objetivo, el capital inicial,
+    el modo de aportación o la opción de impuestos.
+    """
+    return required_monthly_grid(
+        goal=goal,
+        initial_value=initial_value,
+        initial_monthly=initial_monthly,
+        apply_tax=apply_tax,
+    )
+
+
+def render_monte_carlo(
+    initial_value: float,
+    initial_monthly: float,
+    final_monthly: float,
+    years: int,
+    annual_return: float,
+    annual_volatility: float,
+    goal: float,
+    goal_after_tax: bool,
+    n_paths: int,
+    distribution: str,
+):
+    """
+    Simula el plan con rentabilidades aleatorias (Monte Carlo) y muestra las bandas
+    P5/P50/P95 del patrimonio junto con la probabilidad de alcanzar el objetivo.
+    """
+    resultado = simulate_monte_carlo(
+        initial_value=initial_value,
+        initial_monthly=initial_monthly,
+        final_monthly=final_monthly,
+        years=years,
+        annual_return=annual_return,
+        annual_volatility=annual_volatility,
+        n_paths=n_paths,
+        distribution=distribution,
+        goal=goal,
+        goal_after_tax=goal_after_tax,
+    )
+
+    st.markdown("#### 🎲 Escenarios con volatilidad (Monte Carlo)")
+    objetivo_texto = "NETOS" if goal_after_tax else "brutos"
+    st.write(
+        f"Con una volatilidad anual del **{annual_volatility * 100:.1f}%**, el plan alcanza "
+        f"**{goal:,.0f} € {objetivo_texto}** en aproximadamente el "
+        f"**{resultado.goal_probability * 100:.1f}%** de los {n_paths:,} escenarios simulados."
+    )
+    st.write(
+        f"Patrimonio bruto final: pesimista (P5) **{resultado.band(5)[-1]:,.0f} €**, "
+        f"mediano (P50) **{resultado.band(50)[-1]:,.0f} €**, "
+        f"optimista (P95) **{resultado.band(95)[-1]:,.0f} €**."
+    )
+    st.line_chart(resultado.to_frame(), x="Año", y=["P5", "P50", "P95"])
+    st.caption(
+        "Cada mes la rentabilidad se sortea alrededor de la rentabilidad anual indicada. "
+        "P5/P95: solo un 5% de los escenarios queda por debajo/encima de esa línea. "
+        "La mediana suele quedar por debajo del cálculo determinista por el efecto de la volatilidad."
+    )
+
+
 
 st.set_page_config(
     page_title="Planificador de cartera - Marcos",
@@ -468,30 +351,9 @@ with tab1:
         "3. Pulsa el botón para ver cómo repartir el dinero."
     )
 
-    # Cargamos listado maestro de activos: universo completo + personalizados
-    universo_df = load_universe_csv()
+    # Activos personalizados (el universo completo llega con el catálogo, más abajo)
     custom_assets = load_custom_assets()
 
-    # --- Normalización de tipos de activo del CSV ---
-    def normalize_asset_type(raw_type: str) -> str:
-        """Normaliza el tipo de activo del CSV a las categorías usadas en la app."""
-        if not raw_type:
-            return ""
-        s = str(raw_type).strip().lower()
-        if any(x in s for x in ["etf", "index fund", "fund", "fonds"]):
-            return "ETF"
-        if any(x in s for x in ["stock", "share", "equity", "aktion", "acción", "acciones"]):
-            return "Acción"
-        if any(x in s for x in ["bond", "renta fija", "obligat"]):
-            return "Bono"
-        if any(x in s for x in ["crypto", "bitcoin", "btc", "eth"]):
-            return "Criptomoneda"
-        if any(x in s for x in ["derivative", "option", "future", "warrant"]):
-            return "Derivado"
-        if any(x in s for x in ["fund", "sicav", "fond"]):
-            return "Fondo"
-        return "Otro"
-
     # UI para crear activos personalizados locales
     with st.expander("➕ Añadir activo personalizado a tu lista"):
         nombre_custom = st.text_input(
@@ -500,7 +362,7 @@ with tab1:
         )
         tipo_custom = st.selectbox(
             "Tipo del activo personalizado",
-            options=["ETF", "Acción", "Bono", "Derivado", "Criptomoneda", "Fondo", "Otro"],
+            options=list(ASSET_TYPES),
             key="tipo_activo_pers",
         )
         ticker_custom = st.text_input(
@@ -576,34 +438,18 @@ with tab1:
         else:
             st.session_state["cartera_df"] = default_data.copy()
 
-    # --- Catálogo de activos para el selector (Nombre + ISIN) ---
-    # Construimos un DataFrame vectorizado (mucho más rápido que iterar fila a fila)
-    custom_rows = [
-        {
-            "Nombre": str(a.get("nombre", "")).strip(),
-            "ISIN": str(a.get("isin", "")).strip().upper(),
-            "Tipo": str(a.get("tipo", "")).strip(),
-        }
-        for a in custom_assets
-    ]
-    if custom_rows:
-        custom_catalog_df = pd.DataFrame(custom_rows)
-    else:
-        custom_catalog_df = pd.DataFrame(columns=["Nombre", "ISIN", "Tipo"])
-
-    if not universo_df.empty:
-        universe_small = universo_df[["Name", "ISIN", "Type"]].copy()
-        universe_small["Nombre"] = universe_small["Name"].astype(str).str.strip()
-        universe_small["ISIN"] = universe_small["ISIN"].astype(str).str.strip().str.upper()
-        universe_small["Tipo"] = universe_small["Type"].apply(normalize_asset_type)
-        universe_small = universe_small[["Nombre", "ISIN", "Tipo"]]
-        catalog_df = pd.concat([custom_catalog_df, universe_small], ignore_index=True)
-    else:
-        catalog_df = custom_catalog_df.copy()
-
-    if not catalog_df.empty:
-        catalog_df = catalog_df[(catalog_df["Nombre"] != "") & (catalog_df["ISIN"] != "")]
-        catalog_df = catalog_df.drop_duplicates(subset="ISIN").reset_index(drop=True)
+    # --- Catálogo de activos para el selector (Nombre + ISIN), indexado por ISIN ---
+    catalog = load_asset_catalog(
+        tuple(
+            (
+                str(a.get("nombre", "")).strip(),
+                str(a.get("isin", "")).strip().upper(),
+                str(a.get("tipo", "")).strip(),
+            )
+            for a in custom_assets
+        ),
+        universe_version(),
+    )
 
     st.subheader("📋 Activos de la cartera")
 
@@ -613,7 +459,7 @@ with tab1:
     # DataFrame actual de cartera (normalizado)
     cartera_df_current = ensure_cartera_schema(st.session_state["cartera_df"])
 
-    if catalog_df.empty:
+    if catalog.empty:
         # Fallback manual si no hay catálogo con ISIN
         st.info(
             "No se ha podido cargar el universo de activos con ISIN. "
@@ -623,29 +469,41 @@ with tab1:
         isin_manual = st.text_input("ISIN")
         tipo_manual = st.selectbox(
             "Tipo de activo",
-            options=["ETF", "Acción", "Bono", "Derivado", "Criptomoneda", "Fondo", "Otro"],
+            options=list(ASSET_TYPES),
         )
         selected_nombre = nombre_manual.strip()
         selected_isin = isin_manual.strip().upper()
         selected_tipo = tipo_manual
     else:
-        # Selector por ISIN, mostrando Nombre (ISIN) para diferenciar activos con mismo nombre
-        isin_options = catalog_df["ISIN"].tolist()
-
-        def _format_isin(opt_isin: str) -> str:
-            fila = catalog_df[catalog_df["ISIN"] == opt_isin]
-            if fila.empty:
-                return opt_isin
-            nombre = fila["Nombre"].iloc[0]
-            return f"{nombre} ({opt_isin})"
+        # Búsqueda opcional por nombre o ISIN (admite erratas): el selector enseña solo los resultados
+        busqueda_activo = st.text_input(
+            "Buscar activo por nombre o ISIN (opcional)",
+            key="busqueda_catalogo",
+            placeholder="p. ej. ishres core msci wrld, siemens, IE00B4L5",
+            help="Encuentra el activo aunque el nombre esté mal escrito o a medias.",
+        )
+        isin_options = catalog.isins
+        if busqueda_activo.strip():
+            resultado_busqueda = catalog.search(busqueda_activo)
+            if resultado_busqueda.total == 0:
+                st.warning(f"Ningún activo coincide con '{busqueda_activo}'; se muestra la lista completa.")
+            else:
+                isin_options = catalog.isins[resultado_busqueda.rows]
+                mensaje = f"{resultado_busqueda.total:,} activos coinciden"
+                if resultado_busqueda.total > len(isin_options):
+                    mensaje += f" (se muestran los {len(isin_options)} más relevantes)"
+                if resultado_busqueda.corrected:
+                    mensaje += f"; búsqueda aproximada para: {', '.join(resultado_busqueda.corrected)}"
+                st.caption(mensaje + ".")
 
+        # Selector por ISIN, mostrando Nombre (ISIN) para diferenciar activos con mismo nombre
         selected_isin = st.selectbox(
             "Busca y selecciona un activo (Nombre + ISIN)",
             options=isin_options,
-            format_func=_format_isin,
+            format_func=catalog.label,
         )
 
-        fila_sel = catalog_df[catalog_df["ISIN"] == selected_isin].iloc[0]
+        fila_sel = catalog.row(selected_isin)
         selected_nombre = fila_sel["Nombre"]
         selected_tipo = fila_sel["Tipo"] or ""
 
@@ -694,11 +552,13 @@ with tab1:
             else:
                 df_cart = pd.concat([df_cart, pd.DataFrame([nueva_fila])], ignore_index=True)
 
-            st.session_state["cartera_df"] = ensure_cartera_schema(df_cart)
+            cartera_df_current = ensure_cartera_schema(df_cart)
+            st.session_state["cartera_df"] = cartera_df_current
             st.success("Activo añadido/actualizado en la cartera.")
 
     # --- Tabla de cartera actual (solo lectura) ---
-    df_activos = ensure_cartera_schema(st.session_state["cartera_df"])
+    # Ya normalizada arriba (o tras añadir un activo): no hace falta volver a pasarla por el esquema
+    df_activos = cartera_df_current
     if df_activos.empty:
         st.info("Todavía no has añadido activos a tu cartera.")
     else:
@@ -709,15 +569,14 @@ with tab1:
         isins_en_cartera = df_activos["ISIN"].astype(str).str.strip().tolist()
         if any(isins_en_cartera):
             isins_unicos = sorted(set(i for i in isins_en_cartera if i))
+            # Primer nombre de cada ISIN, en un diccionario (sin filtrar la tabla por opción)
+            nombres_por_isin = {}
+            for isin, nombre in zip(isins_en_cartera, df_activos["Activo"].tolist()):
+                nombres_por_isin.setdefault(isin, nombre)
             isin_to_delete = st.multiselect(
                 "Selecciona activos para eliminar de la cartera",
                 options=isins_unicos,
-                format_func=lambda isin: (
-                    df_activos.loc[
-                        df_activos["ISIN"].astype(str).str.strip().eq(isin), "Activo"
-                    ].iloc[0]
-                    + f" ({isin})"
-                ),
+                format_func=lambda isin: f"{nombres_por_isin[isin]} ({isin})",
             )
             if isin_to_delete and st.button("🗑️ Eliminar seleccionados"):
                 mask_del = df_activos["ISIN"].astype(str).str.strip().isin(isin_to_delete)
@@ -729,8 +588,7 @@ with tab1:
     # Mostrar suma de pesos objetivo justo debajo de la tabla (solo filas con Activo no vacío)
     show_normalize_button = False
     try:
-        df_live = df_activos.copy()
-        df_live = df_live[df_live["Activo"].astype(str).str.strip().ne("")]
+        df_live = df_activos[df_activos["Activo"].str.strip().ne("")]
         suma_pesos_live = float(df_live["Peso_objetivo_%"].sum())
         st.markdown(
             f"**Suma de pesos objetivo (filas con activo) en tiempo real: {suma_pesos_live:.2f}%**"
@@ -762,7 +620,7 @@ with tab1:
             st.error(f"No se pudo normalizar los pesos: {e}")
 
     # Filtrar filas vacías (sin activo) para el resto de cálculos y gráficos
-    df_activos = df_activos[df_activos["Activo"].astype(str).str.strip().ne("")].copy()
+    df_activos = df_activos[df_activos["Activo"].str.strip().ne("")]
 
     # Gráfico de tarta con la distribución actual de la cartera (en tiempo real)
     if not df_activos.empty:
@@ -863,50 +721,29 @@ with tab1:
     elif monthly_contribution <= 0:
         st.info("Introduce una aportación mensual mayor que 0 para calcular el plan de aportación.")
     else:
-        # Construir diccionarios para Portfolio
-        holdings = {}
-        targets = {}
-        asset_types = {}
-
-        for _, row in df_activos.iterrows():
-            nombre = str(row["Activo"]).strip()
-            tipo = str(row["Tipo"]).strip()
-            valor = float(row["Valor_actual_€"])
-            peso_pct = float(row["Peso_objetivo_%"])
-
-            holdings[nombre] = valor
-            targets[nombre] = peso_pct / 100.0
-            asset_types[nombre] = tipo
-
-        # Normalizar targets si no suman 1
-        suma_targets = sum(targets.values())
-        if suma_targets == 0:
+        # Estado de la cartera (arrays alineados, pesos ya normalizados) cacheado por la huella de la
+        # tabla: si solo cambian la aportación o el umbral, se reutiliza y solo se rehace el último paso
+        estado = portfolio_state(df_activos)
+
+        if estado.target_sum == 0:
             st.error("Los pesos objetivo no pueden ser todos cero.")
         else:
-            if abs(suma_targets - 1.0) > 0.01:
+            if estado.was_normalized:
                 st.info("Normalizando porcentajes objetivo para que sumen 100%.")
-                targets = {k: v / suma_targets for k, v in targets.items()}
+            portfolio = estado.portfolio
 
-            portfolio = Portfolio(
-                holdings=holdings,
-                targets=targets,
-                asset_types=asset_types,
-            )
-
-            rebalance_threshold = umbral_pct / 100.0
+            activos = portfolio.names
+            valores = portfolio.values
+            targets = portfolio.target_weights
 
-            plan = compute_contribution_plan(
-                portfolio=portfolio,
-                monthly_contribution=float(monthly_contribution),
-                rebalance_threshold=rebalance_threshold,
-            )
+            plan = estado.contribution(float(monthly_contribution))
 
             st.subheader("✅ Plan de aportación sugerido (actualizado en tiempo real)")
 
             df_plan = pd.DataFrame(
                 {
-                    "Activo": list(plan.keys()),
-                    "Aportación_mes_€": list(plan.values()),
+                    "Activo": activos,
+                    "Aportación_mes_€": plan,
                 }
             )
 
@@ -914,36 +751,182 @@ with tab1:
             st.markdown(
                 "Esta tabla indica **cómo repartir la aportación del próximo mes** entre tus activos "
                 "para acercarte a los porcentajes objetivo, **sin vender nada**, solo añadiendo dinero nuevo. "
+                "El dinero va primero al activo más infraponderado hasta igualarlo con el siguiente, y así "
+                "sucesivamente, de modo que la desviación respecto a los objetivos sea la mínima posible. "
                 "Se recalcula automáticamente cada vez que modificas la tabla o los parámetros."
             )
 
+            # Plan ejecutable: importes mínimos por orden y compra por acciones enteras / lotes
+            with st.expander("🧾 Convertir el plan en órdenes ejecutables"):
+                st.markdown(
+                    "Indica, si quieres, el **precio** y el **tamaño de lote** de los activos que compras por "
+                    "acciones (deja el precio vacío para comprar por importe, como en un plan de ahorro) y el "
+                    "**importe mínimo por orden**. Se redondea el plan hacia abajo y el dinero sobrante se asigna, "
+                    "incremento a incremento, al activo que más lejos queda de su objetivo."
+                )
+                minimo_global = st.number_input(
+                    "Importe mínimo por orden por defecto (€)",
+                    min_value=0.0,
+                    step=1.0,
+                    value=1.0,
+                    key="Importe mínimo por orden",
+                )
+                df_params_ordenes = st.data_editor(
+                    pd.DataFrame(
+                        {
+                            "Activo": activos,
+                            "Precio_€": np.full(len(activos), np.nan),
+                            "Lote_acciones": np.ones(len(activos)),
+                            "Mínimo_orden_€": np.full(len(activos), float(minimo_global)),
+                        }
+                    ),
+                    disabled=["Activo"],
+                    hide_index=True,
+                    key="editor_parametros_ordenes",
+                )
+                ordenes = plan_orders(
+                    portfolio,
+                    float(monthly_contribution),
+                    prices=df_params_ordenes["Precio_€"].to_numpy(dtype=float),
+                    lot_sizes=df_params_ordenes["Lote_acciones"].to_numpy(dtype=float),
+                    min_tickets=df_params_ordenes["Mínimo_orden_€"].to_numpy(dtype=float),
+                )
+                st.dataframe(ordenes.to_frame().round({"Ideal_€": 2, "Unidades": 4, "Importe_orden_€": 2}))
+                st.markdown(
+                    f"Se invierten **{ordenes.invested:,.2f} €** en **{int((ordenes.amounts > 0).sum())}** órdenes."
+                )
+                if ordenes.leftover > 0.005:
+                    st.caption(
+                        f"Quedan **{ordenes.leftover:,.2f} €** sin invertir: no alcanzan para el mínimo por orden "
+                        "ni para una acción/lote más de ningún activo."
+                    )
+
+            # Proyección de los próximos meses repitiendo el mismo reparto (solo compras)
+            with st.expander("📅 Proyección de los próximos meses"):
+                st.markdown(
+                    "Repite el plan de aportación mes a mes con la rentabilidad anual esperada de cada activo, "
+                    "para ver **en qué mes se empieza a comprar cada activo** y **cuándo entra la cartera en la "
+                    "banda de tolerancia** (objetivo ± umbral de rebalanceo) sin vender nada."
+                )
+                col_proy_1, col_proy_2 = st.columns(2)
+                with col_proy_1:
+                    meses_proyeccion = st.slider(
+                        "Meses a proyectar",
+                        min_value=MIN_PROJECTION_MONTHS,
+                        max_value=MAX_PROJECTION_MONTHS,
+                        value=24,
+                        step=12,
+                        key="meses_proyeccion",
+                    )
+                with col_proy_2:
+                    aportacion_final_proy = st.number_input(
+                        "Aportación mensual al final del periodo (€) (igual a la actual = fija)",
+                        min_value=0,
+                        step=10,
+                        value=int(monthly_contribution),
+                        key="aportacion_final_proyeccion",
+                    )
+                df_rent_proy = st.data_editor(
+                    pd.DataFrame({"Activo": activos, "Rentabilidad_anual_%": np.full(len(activos), 6.0)}),
+                    disabled=["Activo"],
+                    hide_index=True,
+                    key="editor_rentabilidad_proyeccion",
+                )
+                proyeccion = project_contributions(
+                    portfolio,
+                    float(monthly_contribution),
+                    meses_proyeccion,
+                    annual_returns=df_rent_proy["Rentabilidad_anual_%"].fillna(0.0).to_numpy(dtype=float) / 100.0,
+                    final_contribution=float(aportacion_final_proy),
+                    band=umbral_pct / 100.0,
+                )
+                if proyeccion.band_entry_month:
+                    st.success(f"La cartera entra en la banda de tolerancia en el **mes {proyeccion.band_entry_month}**.")
+                else:
+                    st.warning(
+                        f"En {meses_proyeccion} meses la cartera no llega a entrar en la banda de tolerancia "
+                        "solo con aportaciones."
+                    )
+                st.dataframe(proyeccion.to_frame().round(2))
+                st.caption("Primera_compra_mes = 0 significa que el activo no se compra en todo el periodo.")
+                st.line_chart(proyeccion.monthly_frame(), x="Mes", y="Desviación_máx_pp")
+
+            # Objetivos por niveles: clase de activo → subclase → activo
+            with st.expander("🌳 Objetivos por niveles (clase → subclase → activo)"):
+                st.markdown(
+                    "Define los pesos objetivo **por niveles**: una fila por nodo con su **ruta** "
+                    "(`Renta variable/Europa/Nombre del activo`, separando niveles con `/`) y su **peso dentro "
+                    "del nivel superior**. Las hojas deben llamarse como los activos de la cartera. Por defecto "
+                    "se agrupa por tipo de activo con los pesos de la tabla. La aportación se reparte de arriba "
+                    "abajo: en cada nivel, si todos los nodos están dentro de su banda se reparte según los "
+                    "pesos objetivo; si alguno se sale, primero se rellena el más infraponderado."
+                )
+                arbol_defecto = TargetTree.from_portfolio(portfolio)
+                df_arbol = st.data_editor(
+                    pd.DataFrame(
+                        {
+                            "Ruta": arbol_defecto.labels[1:],
+                            "Peso_%": arbol_defecto.local_weights[1:] * 100,
+                        }
+                    ),
+                    num_rows="dynamic",
+                    hide_index=True,
+                    key="editor_arbol_objetivos",
+                )
+                col_arbol_1, col_arbol_2 = st.columns(2)
+                with col_arbol_1:
+                    banda_clases = st.number_input(
+                        "Banda entre clases (puntos)", min_value=0.0, step=0.5, value=5.0, key="banda_arbol_clases"
+                    )
+                with col_arbol_2:
+                    banda_resto = st.number_input(
+                        "Banda en los niveles inferiores (puntos)",
+                        min_value=0.0,
+                        step=0.5,
+                        value=float(umbral_pct),
+                        key="banda_arbol_resto",
+                    )
+                try:
+                    arbol = TargetTree.from_frame(df_arbol)
+                except ValueError as e:
+                    st.error(f"El árbol de objetivos no es válido: {e}")
+                else:
+                    hojas_sin_activo = arbol.names[arbol.leaves][arbol.leaf_positions(activos) < 0]
+                    if hojas_sin_activo.size:
+                        st.warning(
+                            "Estas hojas no coinciden con ningún activo de la cartera (se tratan como activos "
+                            f"nuevos con valor 0): {', '.join(map(str, hojas_sin_activo))}."
+                        )
+                    plan_arbol = tree_contribution(
+                        arbol,
+                        portfolio,
+                        float(monthly_contribution),
+                        bands=[banda_clases / 100.0, banda_resto / 100.0],
+                    )
+                    st.dataframe(plan_arbol.to_frame().round(2))
+                    st.dataframe(
+                        pd.DataFrame(
+                            {"Activo": plan_arbol.asset_names, "Aportación_mes_€": plan_arbol.asset_contributions}
+                        ).round(2)
+                    )
+
             # Mostrar situación de la cartera antes y después de aplicar la aportación mensual
             st.subheader("⚖️ Situación de la cartera: antes y después de la aportación")
 
-            total_actual = portfolio.total_value()
-            pesos_actuales = portfolio.current_weights()
+            pesos_actuales = estado.current_weights
 
             # Valores y pesos después de aplicar el plan de aportación
-            total_despues = total_actual + float(monthly_contribution)
-            valores_despues = {
-                a: holdings[a] + float(plan.get(a, 0.0)) for a in holdings.keys()
-            }
-            if total_despues > 0:
-                pesos_despues = {
-                    a: valores_despues[a] / total_despues for a in holdings.keys()
-                }
-            else:
-                pesos_despues = {a: 0.0 for a in holdings.keys()}
+            total_despues, valores_despues, pesos_despues = estado.after_contribution(float(monthly_contribution))
 
             df_pesos = pd.DataFrame(
                 {
-                    "Activo": list(holdings.keys()),
-                    "Valor_antes_€": [holdings[a] for a in holdings.keys()],
-                    "Peso_antes_%": [pesos_actuales[a] * 100 for a in holdings.keys()],
-                    "Aportación_mes_€": [float(plan.get(a, 0.0)) for a in holdings.keys()],
-                    "Valor_despues_€": [valores_despues[a] for a in holdings.keys()],
-                    "Peso_despues_%": [pesos_despues[a] * 100 for a in holdings.keys()],
-                    "Peso_objetivo_%": [targets[a] * 100 for a in holdings.keys()],
+                    "Activo": activos,
+                    "Valor_antes_€": valores,
+                    "Peso_antes_%": pesos_actuales * 100,
+                    "Aportación_mes_€": plan,
+                    "Valor_despues_€": valores_despues,
+                    "Peso_despues_%": pesos_despues * 100,
+                    "Peso_objetivo_%": targets * 100,
                 }
             )
 
@@ -957,97 +940,68 @@ with tab1:
                 "sin necesidad de vender posiciones."
             )
 
-            # --- Escenario alternativo: incluir ventas si solo con compras no se entra en los porcentajes objetivo ---
+            # --- Escenario alternativo: incluir ventas si solo con compras no se entra en la banda de tolerancia ---
             # Comprobamos si, tras aplicar solo la aportación del mes, alguna posición sigue fuera del umbral
-            fuera_umbral = []
-            for a in holdings.keys():
-                peso_obj_pp = targets[a] * 100.0
-                peso_desp_pp = pesos_despues[a] * 100.0
-                diff_pp = abs(peso_desp_pp - peso_obj_pp)
-                if diff_pp > umbral_pct + 1e-6:
-                    fuera_umbral.append(a)
-
-            if fuera_umbral:
-                st.subheader("💸 Escenario con ventas para llegar exactamente a los porcentajes objetivo")
+            fuera_umbral = np.abs(pesos_despues * 100.0 - targets * 100.0) > umbral_pct + 1e-6
+
+            if fuera_umbral.any():
+                st.subheader("💸 Escenario con ventas para volver a la banda de tolerancia")
                 st.markdown(
                     "Con solo la aportación de **este mes** no es posible dejar **todas** las posiciones dentro del "
                     "umbral de rebalanceo definido. A continuación se muestra un escenario en el que, además de "
-                    "las compras del plan, se realizan **ventas mínimas necesarias** en los activos sobreponderados "
-                    "para llegar exactamente a los pesos objetivo."
+                    "las compras del plan, se opera **solo con los activos fuera de su banda** "
+                    f"(objetivo ± {umbral_pct:g} puntos), con el **mínimo volumen de compraventa** posible."
                 )
 
-                # Valor total tras aplicar únicamente la aportación (sin ventas)
-                total_despues_solo_compras = total_despues
-
-                # Holdings ideales si rebalanceamos completamente (compras + ventas) a los pesos objetivo
-                ideal_holdings = {
-                    a: targets[a] * total_despues_solo_compras for a in holdings.keys()
-                }
+                destino_banda = st.radio(
+                    "¿Hasta dónde llevar los activos fuera de banda?",
+                    ["Hasta el borde de la banda (menos operaciones)", "Hasta el peso objetivo (centro de la banda)"],
+                    key="destino_banda_rebalanceo",
+                )
 
-                # Diferencias respecto a la situación tras la aportación:
-                # diff > 0  -> compra adicional necesaria
-                # diff < 0  -> venta necesaria
-                ventas = {}
-                compras = {}
-                for a in holdings.keys():
-                    actual = valores_despues[a]
-                    ideal = ideal_holdings[a]
-                    diff = ideal - actual
-                    if diff < 0:
-                        ventas[a] = -diff
-                        compras[a] = 0.0
-                    elif diff > 0:
-                        ventas[a] = 0.0
-                        compras[a] = diff
-                    else:
-                        ventas[a] = 0.0
-                        compras[a] = 0.0
+                # Rebalanceo con bandas partiendo de la situación tras aplicar solo la aportación (sin ventas)
+                destino = "edge" if destino_banda.startswith("Hasta el borde") else "centre"
+                rebalanceo = estado.band_rebalance(float(monthly_contribution), umbral_pct / 100.0, target=destino)
+                ventas = rebalanceo.sells
+                compras = rebalanceo.buys
+                venta_total = float(ventas.sum())
 
-                venta_total = float(sum(ventas.values()))
-                compra_total = float(sum(compras.values()))
+                # Volumen que movería el rebalanceo completo a los pesos exactos, como referencia
+                rotacion_completa = float(np.abs(targets * total_despues - valores_despues).sum())
 
-                # Por construcción, si usamos ideal_holdings la suma de ventas y compras debería ser casi igual.
-                # Permitimos un pequeño desajuste numérico y redondeamos solo para mostrar.
                 if venta_total <= 1e-6:
                     st.info(
                         "En la práctica, las desviaciones son muy pequeñas y no merece la pena plantear ventas adicionales."
                     )
                 else:
-                    # Valores finales después de aplicar el rebalanceo completo
-                    valores_final = ideal_holdings.copy()
-                    total_final = total_despues_solo_compras
-                    if total_final <= 0:
-                        total_final = 1e-9
-
-                    # Los pesos finales coinciden (por construcción) con los objetivos
-                    pesos_final = {a: targets[a] for a in holdings.keys()}
-
                     df_ventas = pd.DataFrame(
                         {
-                            "Activo": list(holdings.keys()),
-                            "Tipo": [asset_types.get(a, "") for a in holdings.keys()],
-                            "Valor_antes_€": [holdings[a] for a in holdings.keys()],
-                            "Aportación_mes_€": [float(plan.get(a, 0.0)) for a in holdings.keys()],
-                            "Valor_despues_solo_compras_€": [valores_despues[a] for a in holdings.keys()],
-                            "Peso_despues_solo_compras_%": [pesos_despues[a] * 100 for a in holdings.keys()],
-                            "Peso_objetivo_%": [targets[a] * 100 for a in holdings.keys()],
-                            "Venta_necesaria_€": [ventas[a] for a in holdings.keys()],
-                            "Compra_extra_€": [compras[a] for a in holdings.keys()],
-                            "Valor_final_post_venta_€": [valores_final[a] for a in holdings.keys()],
-                            "Peso_final_%": [pesos_final[a] * 100 for a in holdings.keys()],
+                            "Activo": activos,
+                            "Tipo": portfolio.types,
+                            "Valor_antes_€": valores,
+                            "Aportación_mes_€": plan,
+                            "Valor_despues_solo_compras_€": valores_despues,
+                            "Peso_despues_solo_compras_%": pesos_despues * 100,
+                            "Peso_objetivo_%": targets * 100,
+                            "Venta_necesaria_€": ventas,
+                            "Compra_extra_€": compras,
+                            "Valor_final_post_venta_€": rebalanceo.values_after,
+                            "Peso_final_%": rebalanceo.weights_after * 100,
                         }
                     )
 
                     st.markdown(
-                        f"**Venta total mínima necesaria para alcanzar exactamente los pesos objetivo (realizando también las compras necesarias):** "
-                        f"≈ **{venta_total:,.0f} €**, repartida entre los activos sobreponderados."
+                        f"**Venta total necesaria para volver a la banda:** ≈ **{venta_total:,.0f} €**. "
+                        f"Volumen total negociado (ventas + compras): **{rebalanceo.turnover:,.0f} €**, "
+                        f"frente a **{rotacion_completa:,.0f} €** si se llevara todo exactamente a los pesos objetivo."
                     )
 
                     # Tabla 1: resumen de ventas por activo (más compacta)
-                    st.markdown("##### 🧾 Resumen de ventas por activo")
+                    st.markdown("##### 🧾 Resumen de ventas y compras por activo")
                     df_resumen_ventas = df_ventas[[
                         "Activo",
                         "Venta_necesaria_€",
+                        "Compra_extra_€",
                         "Peso_despues_solo_compras_%",
                         "Peso_final_%",
                         "Peso_objetivo_%",
@@ -1055,11 +1009,76 @@ with tab1:
                     st.dataframe(df_resumen_ventas)
 
                     st.caption(
-                        "Las cantidades de venta se calculan como la **venta mínima necesaria** para dejar cada activo "
-                        "en su peso objetivo, partiendo de la situación tras aplicar solo la aportación del mes. "
-                        "Las compras adicionales se financian íntegramente con esas ventas (sin aportar más dinero nuevo)."
+                        "Solo se venden los activos por encima de su banda y solo se compran los que están por debajo; "
+                        "si las ventas no cuadran con las compras, la diferencia se reparte entre los demás activos "
+                        "sin sacarlos de su banda. Las compras adicionales se financian íntegramente con esas ventas "
+                        "(sin aportar más dinero nuevo)."
                     )
 
+                    # Impacto fiscal de las ventas con los lotes de compra (FIFO)
+                    with st.expander("🧮 Impacto fiscal de las ventas (lotes FIFO)"):
+                        st.markdown(
+                            "Indica tus **compras** (una fila por lote: activo, fecha, unidades y coste total en €) "
+                            "o sube un CSV con esas columnas. Las ventas se imputan por **FIFO** (primero lo más "
+                            "antiguo), como en España, y la plusvalía neta pasa por los tramos del ahorro. La compra "
+                            "de este mes se añade automáticamente como un lote más."
+                        )
+                        fichero_lotes = st.file_uploader(
+                            "CSV de compras (Activo, Fecha, Unidades, Coste_€)",
+                            type=["csv"],
+                            key="csv_lotes_fifo",
+                        )
+                        if fichero_lotes is not None:
+                            df_lotes = pd.read_csv(fichero_lotes)
+                        else:
+                            # Por defecto, un lote por activo con coste igual al valor actual (sin plusvalía)
+                            df_lotes = st.data_editor(
+                                pd.DataFrame(
+                                    {
+                                        "Activo": activos,
+                                        "Fecha": pd.Timestamp("2020-01-01"),
+                                        "Unidades": valores,
+                                        "Coste_€": valores,
+                                    }
+                                ),
+                                num_rows="dynamic",
+                                hide_index=True,
+                                key="editor_lotes_fifo",
+                            )
+                        faltan = [col for col in LOT_COLUMNS if col not in df_lotes.columns]
+                        if faltan:
+                            st.error(f"Faltan columnas en las compras: {', '.join(faltan)}.")
+                        else:
+                            registro = LotLedger.from_frame(df_lotes).with_purchases(
+                                activos, valores, plan, pd.Timestamp.today()
+                            )
+                            plusvalias, impuesto = registro.sale_tax(activos, valores_despues, ventas)
+                            propuesta = lowest_tax_band_rebalance(
+                                registro, valores_despues, targets, umbral_pct / 100.0, activos, target=destino
+                            )
+                            col_fiscal_1, col_fiscal_2 = st.columns(2)
+                            with col_fiscal_1:
+                                st.metric("Impuesto de las ventas de arriba", f"{impuesto:,.0f} €")
+                                st.caption(f"Plusvalía neta: {plusvalias.sum():,.0f} €")
+                            with col_fiscal_2:
+                                st.metric(
+                                    "Impuesto de la propuesta con menos impuestos",
+                                    f"{propuesta.tax:,.0f} €",
+                                    delta=f"{propuesta.tax - impuesto:,.0f} €",
+                                    delta_color="inverse",
+                                )
+                                st.caption(f"Plusvalía neta: {propuesta.net_gain:,.0f} €")
+                            st.markdown(
+                                "La propuesta hace las mismas ventas obligatorias que el escenario de arriba (lo que "
+                                "sobra por encima de cada banda, hasta el destino elegido), pero el dinero que falta para "
+                                "las compras lo saca de los lotes con **menos plusvalía por euro** (o con pérdidas), "
+                                "sin sacar a nadie de su banda y sin aumentar el volumen negociado."
+                            )
+                            df_propuesta = propuesta.to_frame()[
+                                ["Activo", "Venta_€", "Compra_€", "Plusvalía_€", "Peso_final_%", "Peso_objetivo_%"]
+                            ]
+                            st.dataframe(df_propuesta.round(2))
+
 
     # Gestión de carteras nombradas (guardado/carga en carteras.json)
     st.markdown("---")
@@ -1234,6 +1253,45 @@ Además puedes incluir **ahorros extra** que ya tengas fuera de la cartera.
             key="¿Qué porcentaje de tu sueldo quieres que represente la aportación mensual? (%) (opcional)",
         )
 
+        simular_volatilidad = st.checkbox(
+            "Simular volatilidad del mercado (Monte Carlo)",
+            value=False,
+            help=(
+                "Además del cálculo con rentabilidad fija, simula miles de escenarios con rentabilidades "
+                "mensuales aleatorias y muestra bandas de patrimonio y la probabilidad de llegar al objetivo."
+            ),
+            key="Simular volatilidad del mercado (Monte Carlo)",
+        )
+        volatilidad_input = 15.0
+        distribucion_mc = "lognormal"
+        n_paths_mc = 10_000
+        if simular_volatilidad:
+            volatilidad_input = st.number_input(
+                "Volatilidad anual estimada (%)",
+                min_value=0.0,
+                max_value=60.0,
+                step=1.0,
+                value=15.0,
+                help="Como referencia, un índice global de acciones suele rondar el 15%.",
+                key="Volatilidad anual estimada (%)",
+            )
+            distribucion_mc = st.selectbox(
+                "Distribución de las rentabilidades mensuales",
+                options=["lognormal", "normal", "t"],
+                format_func=lambda d: {
+                    "lognormal": "Log-normal",
+                    "normal": "Normal",
+                    "t": "t de Student (colas gruesas)",
+                }[d],
+                key="Distribución de las rentabilidades mensuales",
+            )
+            n_paths_mc = st.select_slider(
+                "Número de escenarios simulados",
+                options=[1_000, 5_000, 10_000, 50_000, 100_000],
+                value=10_000,
+                key="Número de escenarios simulados",
+            )
+
     if st.button("🧮 Calcular plan para llegar al objetivo"):
         if objetivo_final <= 0:
             st.error("El objetivo debe ser mayor que 0.")
@@ -1242,53 +1300,21 @@ Además puedes incluir **ahorros extra** que ya tengas fuera de la cartera.
                 months_total = years * 12
 
                 if apply_tax:
-                    # Buscamos la aportación mensual para que el objetivo sea NETO (después de impuestos)
-                    def net_final_with_monthly(C: float):
-                        C_int = int(round(C))
-                        if C_int < 0:
-                            C_int = 0
-                        final_value_sim, _ = simulate_constant_plan(
-                            current_total=current_total,
-                            monthly_contribution=C_int,
-                            years=years,
-                            annual_return=annual_return,
-                            extra_savings=extra_savings,
+                    # Menor aportación mensual entera con la que el objetivo es NETO (después de impuestos),
+                    # despejada en forma cerrada por tramos del impuesto
+                    mensual_necesaria = int(
+                        np.ceil(
+                            required_constant_monthly_net(
+                                goal=objetivo_final,
+                                initial_value=current_total + extra_savings,
+                                years=years,
+                                annual_return=annual_return,
+                            )
+                            - 1e-9
                         )
-                        principal_total_sim = current_total + extra_savings + C_int * months_total
-                        gain_sim = max(0.0, final_value_sim - principal_total_sim)
-                        tax_sim = compute_progressive_tax(gain_sim)
-                        net_final_sim = final_value_sim - tax_sim
-                        return net_final_sim, final_value_sim, gain_sim, tax_sim
-
-                    net0, _, _, _ = net_final_with_monthly(0.0)
-                    if net0 >= objetivo_final:
-                        mensual_necesaria = 0
-                        final_value = current_total + extra_savings
-                        gain = 0.0
-                        tax = 0.0
-                        net_final = final_value
-                        series = [final_value] * months_total
-                    else:
-                        low = 0.0
-                        high = max(objetivo_final / max(months_total, 1) * 3, 5000.0)
-                        final_value = 0.0
-                        gain = 0.0
-                        tax = 0.0
-                        net_final = 0.0
-                        for _ in range(40):
-                            mid = (low + high) / 2
-                            net_mid, final_mid, gain_mid, tax_mid = net_final_with_monthly(mid)
-                            if net_mid < objetivo_final:
-                                low = mid
-                            else:
-                                high = mid
-                                final_value = final_mid
-                                gain = gain_mid
-                                tax = tax_mid
-                                net_final = net_mid
-                        mensual_necesaria = int(round(high))
-
-                    # Vuelve a simular para obtener la serie (bruta)
+                    )
+
+                    # Simulamos el plan resultante para obtener la serie (bruta)
                     final_value, series = simulate_constant_plan(
                         current_total=current_total,
                         monthly_contribution=mensual_necesaria,
@@ -1373,12 +1399,7 @@ Además puedes incluir **ahorros extra** que ya tengas fuera de la cartera.
                     )
 
                 st.markdown("#### Evolución estimada del patrimonio (antes de impuestos)")
-                df_evol = pd.DataFrame(
-                    {
-                        "Año": [m / 12 for m in range(1, len(series) + 1)],
-                        "Patrimonio_estimado_€": series,
-                    }
-                )
+                df_evol = series.to_frame("Patrimonio_estimado_€")
                 st.line_chart(df_evol, x="Año", y="Patrimonio_estimado_€")
 
                 st.caption(
@@ -1387,6 +1408,20 @@ Además puedes incluir **ahorros extra** que ya tengas fuera de la cartera.
                     "la volatilidad real del mercado."
                 )
 
+                if simular_volatilidad:
+                    render_monte_carlo(
+                        initial_value=current_total + extra_savings,
+                        initial_monthly=mensual_necesaria,
+                        final_monthly=mensual_necesaria,
+                        years=years,
+                        annual_return=annual_return,
+                        annual_volatility=volatilidad_input / 100.0,
+                        goal=objetivo_final,
+                        goal_after_tax=apply_tax,
+                        n_paths=n_paths_mc,
+                        distribution=distribucion_mc,
+                    )
+
             else:  # Creciente
                 if initial_monthly <= 0:
                     st.error("La aportación inicial debe ser mayor que 0.")
@@ -1394,70 +1429,34 @@ Además puedes incluir **ahorros extra** que ya tengas fuera de la cartera.
                     months_total = years * 12
 
                     if apply_tax:
-                        # Buscamos la aportación mensual final para que el objetivo sea NETO
-                        def net_final_with_final_monthly(F: float):
-                            F_float = float(F)
-                            final_val, _ = simulate_dca_ramp(
-                                initial_monthly=initial_monthly,
-                                final_monthly=F_float,
-                                years=years,
-                                annual_return=annual_return,
-                                initial_value=current_total + extra_savings,
-                            )
-                            contrib_total = months_total * (initial_monthly + F_float) / 2.0
-                            principal_total_sim = current_total + extra_savings + contrib_total
-                            gain_sim = max(0.0, final_val - principal_total_sim)
-                            tax_sim = compute_progressive_tax(gain_sim)
-                            net_final_sim = final_val - tax_sim
-                            return net_final_sim, final_val, gain_sim, tax_sim
-
-                        net0, _, _, _ = net_final_with_final_monthly(initial_monthly)
-                        if net0 >= objetivo_final:
-                            final_monthly_aprox = initial_monthly
-                            final_value_grow, series_grow = simulate_dca_ramp(
-                                initial_monthly=initial_monthly,
-                                final_monthly=final_monthly_aprox,
-                                years=years,
-                                annual_return=annual_return,
-                                initial_value=current_total + extra_savings,
-                            )
-                            contrib_total = months_total * (initial_monthly + final_monthly_aprox) / 2.0
-                            principal_total = current_total + extra_savings + contrib_total
-                            gain = max(0.0, final_value_grow - principal_total)
-                            tax = compute_progressive_tax(gain)
-                            net_final = final_value_grow - tax
-                        else:
-                            low = initial_monthly
-                            high = max(initial_monthly * 3, 5000.0)
-                            final_value_grow = 0.0
-                            gain = 0.0
-                            tax = 0.0
-                            net_final = 0.0
-                            series_grow = []
-                            for _ in range(40):
-                                mid = (low + high) / 2
-                                net_mid, final_mid, gain_mid, tax_mid = net_final_with_final_monthly(mid)
-                                if net_mid < objetivo_final:
-                                    low = mid
-                                else:
-                                    high = mid
-                                    final_value_grow = final_mid
-                                    gain = gain_mid
-                                    tax = tax_mid
-                                    net_final = net_mid
-                            final_monthly_aprox = int(round(high))
-                            final_value_grow, series_grow = simulate_dca_ramp(
-                                initial_monthly=initial_monthly,
-                                final_monthly=final_monthly_aprox,
-                                years=years,
-                                annual_return=annual_return,
-                                initial_value=current_total + extra_savings,
+                        # Aportación mensual final para que el objetivo sea NETO, despejada en forma cerrada;
+                        # si con la aportación inicial plana ya se llega, no hace falta que crezca
+                        final_monthly_aprox = int(
+                            round(
+                                max(
+                                    float(initial_monthly),
+                                    required_final_monthly_net(
+                                        goal=objetivo_final,
+                                        initial_value=current_total + extra_savings,
+                                        initial_monthly=initial_monthly,
+                                        years=years,
+                                        annual_return=annual_return,
+                                    ),
+                                )
                             )
-                            contrib_total = months_total * (initial_monthly + final_monthly_aprox) / 2.0
-                            principal_total = current_total + extra_savings + contrib_total
-                            gain = max(0.0, final_value_grow - principal_total)
-                            tax = compute_progressive_tax(gain)
-                            net_final = final_value_grow - tax
+                        )
+                        final_value_grow, series_grow = simulate_dca_ramp(
+                            initial_monthly=initial_monthly,
+                            final_monthly=final_monthly_aprox,
+                            years=years,
+                            annual_return=annual_return,
+                            initial_value=current_total + extra_savings,
+                        )
+                        contrib_total = months_total * (initial_monthly + final_monthly_aprox) / 2.0
+                        principal_total = current_total + extra_savings + contrib_total
+                        gain = max(0.0, final_value_grow - principal_total)
+                        tax = compute_progressive_tax(gain)
+                        net_final = final_value_grow - tax
                     else:
                         final_monthly_aprox, resumen_anual = required_growing_monthlies_for_goal(
                             current_total=current_total,
@@ -1481,37 +1480,6 @@ Además puedes incluir **ahorros extra** que ya tengas fuera de la cartera.
                         tax = 0.0
                         net_final = final_value_grow
 
-                    # Construimos resumen anual
-                    resumen_anual = []
-                    for año in range(1, years + 1):
-                        start_idx = (año - 1) * 12
-                        end_idx = año * 12 - 1
-                        if months_total > 1:
-                            start_month = int(
-                                round(
-                                    initial_monthly
-                                    + (final_monthly_aprox - initial_monthly) * (start_idx / (months_total - 1))
-                                )
-                            )
-                            end_month = int(
-                                round(
-                                    initial_monthly
-                                    + (final_monthly_aprox - initial_monthly) * (end_idx / (months_total - 1))
-                                )
-                            )
-                        else:
-                            start_month = final_monthly_aprox
-                            end_month = final_monthly_aprox
-                        avg_month = int(round((start_month + end_month) / 2))
-                        resumen_anual.append(
-                            {
-                                "year": año,
-                                "start": start_month,
-                                "end": end_month,
-                                "avg": avg_month,
-                            }
-                        )
-
                     st.subheader("📌 Resultado (aportación creciente)")
                     st.write(
                         f"Para alcanzar aproximadamente **{objetivo_final:,.0f} € NETOS** en **{years} años** "
@@ -1520,40 +1488,14 @@ Además puedes incluir **ahorros extra** que ya tengas fuera de la cartera.
                         f"aproximadamente **{final_monthly_aprox} € al mes**."
                     )
 
-                    df_resumen = pd.DataFrame(resumen_anual)
-                    df_resumen = df_resumen.rename(
-                        columns={
-                            "year": "Año",
-                            "start": "Inicio_€/mes",
-                            "end": "Fin_€/mes",
-                            "avg": "Media_€/mes",
-                        }
+                    # Resumen por año (y sueldo de referencia si se ha indicado un % de sueldo)
+                    df_resumen = ramp_yearly_summary(
+                        initial_monthly,
+                        final_monthly_aprox,
+                        years,
+                        salary_share=salary_pct_input / 100.0,
                     )
 
-                    # Si el usuario ha indicado un porcentaje de sueldo, añadimos columnas de sueldo BRUTO y NETO necesarios
-                    if salary_pct_input > 0:
-                        pct = salary_pct_input / 100.0
-                        sueldos_brutos = []
-                        sueldos_netos = []
-                        retenciones_totales = []
-                        for _, fila in df_resumen.iterrows():
-                            media_mes = fila["Media_€/mes"]
-                            if media_mes <= 0:
-                                sueldo_bruto_anual = 0.0
-                                sueldo_neto_anual = 0.0
-                                ret_total_pct = 0.0
-                            else:
-                                sueldo_bruto_anual = media_mes * 12 / pct
-                                sueldo_neto_anual, ss_contrib, irpf, eff_rate = compute_salary_net(sueldo_bruto_anual)
-                                ret_total_pct = eff_rate * 100.0
-                            sueldos_brutos.append(round(sueldo_bruto_anual))
-                            sueldos_netos.append(round(sueldo_neto_anual))
-                            retenciones_totales.append(round(ret_total_pct, 1))
-
-                        df_resumen["Sueldo_bruto_necesario_€/año"] = sueldos_brutos
-                        df_resumen["Sueldo_neto_estimado_€/año"] = sueldos_netos
-                        df_resumen["Retención_total_aprox_%"] = retenciones_totales
-
                     st.markdown("#### Aportaciones aproximadas por año")
                     st.dataframe(df_resumen)
 
@@ -1581,12 +1523,7 @@ Además puedes incluir **ahorros extra** que ya tengas fuera de la cartera.
                         )
 
                     st.markdown("#### Evolución estimada del patrimonio (antes de impuestos)")
-                    df_evol_grow = pd.DataFrame(
-                        {
-                            "Año": [m / 12 for m in range(1, len(series_grow) + 1)],
-                            "Patrimonio_estimado_€": series_grow,
-                        }
-                    )
+                    df_evol_grow = series_grow.to_frame("Patrimonio_estimado_€")
                     st.line_chart(df_evol_grow, x="Año", y="Patrimonio_estimado_€")
 
                     st.caption(
@@ -1601,6 +1538,81 @@ Además puedes incluir **ahorros extra** que ya tengas fuera de la cartera.
                         "pero sirve como referencia para visualizar la tendencia."
                     )
 
+                    if simular_volatilidad:
+                        render_monte_carlo(
+                            initial_value=current_total + extra_savings,
+                            initial_monthly=initial_monthly,
+                            final_monthly=final_monthly_aprox,
+                            years=years,
+                            annual_return=annual_return,
+                            annual_volatility=volatilidad_input / 100.0,
+                            goal=objetivo_final,
+                            goal_after_tax=apply_tax,
+                            n_paths=n_paths_mc,
+                            distribution=distribucion_mc,
+                        )
+
+    # --- Mapa de sensibilidad: aportación necesaria según rentabilidad y plazo ---
+    with st.expander("🗺️ Sensibilidad: aportación necesaria según rentabilidad y plazo"):
+        st.markdown(
+            "Cada celda muestra la aportación mensual que haría falta para llegar al objetivo con "
+            "rentabilidades del **2% al 10%** y plazos de **5 a 40 años**, con los datos introducidos arriba. "
+            "En modo creciente se muestra la aportación **final** de la rampa. "
+            "El recuadro blanco marca la combinación de rentabilidad y años elegida."
+        )
+        sens_tax = st.checkbox(
+            "Objetivo neto de impuestos en el mapa",
+            value=apply_tax,
+            key="Objetivo neto de impuestos en el mapa",
+        )
+        if objetivo_final <= 0:
+            st.info("Introduce un objetivo mayor que 0 para ver el mapa de sensibilidad.")
+        elif modo == "Creciente" and initial_monthly <= 0:
+            st.info("Introduce una aportación inicial mayor que 0 para ver el mapa en modo creciente.")
+        else:
+            df_sens = cached_sensitivity_grid(
+                goal=float(objetivo_final),
+                initial_value=float(current_total + extra_savings),
+                initial_monthly=float(initial_monthly) if modo == "Creciente" else None,
+                apply_tax=bool(sens_tax),
+            )
+            titulo_valor = "Aportación final (€/mes)" if modo == "Creciente" else "Aportación (€/mes)"
+            eje_x = alt.X("Años:O", title="Años hasta el objetivo")
+            eje_y = alt.Y("Rentabilidad_%:O", title="Rentabilidad anual (%)", sort="descending")
+
+            heatmap = alt.Chart(df_sens).mark_rect().encode(
+                x=eje_x,
+                y=eje_y,
+                color=alt.Color(
+                    "Aportación_€/mes:Q",
+                    title=titulo_valor,
+                    scale=alt.Scale(type="symlog", scheme="viridis"),
+                ),
+                tooltip=[
+                    alt.Tooltip("Rentabilidad_%:Q", title="Rentabilidad (%)"),
+                    alt.Tooltip("Años:O", title="Años"),
+                    alt.Tooltip("Aportación_€/mes:Q", title=titulo_valor, format=",.0f"),
+                ],
+            )
+
+            # Resaltamos la combinación actual si cae dentro de la rejilla
+            actual = df_sens[
+                (df_sens["Años"] == int(years))
+                & (np.isclose(df_sens["Rentabilidad_%"], annual_return_input))
+            ]
+            if not actual.empty:
+                heatmap = heatmap + alt.Chart(actual).mark_rect(
+                    filled=False,
+                    stroke="white",
+                    strokeWidth=2,
+                ).encode(x=eje_x, y=eje_y)
+
+            st.altair_chart(heatmap, use_container_width=True)
+            st.caption(
+                "Mismo modelo que el cálculo principal (rentabilidad constante, aportación a final de mes). "
+                "La escala de color es logarítmica suave para que se distingan tanto los plazos cortos como los largos."
+            )
+
     # Gestión de presets / planes para objetivo a largo plazo
     st.markdown("---")
     st.markdown("### 💾 Planes guardados (largo plazo)")
@@ -1668,6 +1680,11 @@ Además puedes incluir **ahorros extra** que ya tengas fuera de la cartera.
             "Modo de aportación",
             "¿Con cuánto te gustaría empezar aportando cada mes? (€)",
             "¿Qué porcentaje de tu sueldo quieres que represente la aportación mensual? (%) (opcional)",
+            "Simular volatilidad del mercado (Monte Carlo)",
+            "Volatilidad anual estimada (%)",
+            "Distribución de las rentabilidades mensuales",
+            "Número de escenarios simulados",
+            "Objetivo neto de impuestos en el mapa",
         ]
         for key in keys_lp:
             if key in st.session_state:
@@ -1804,6 +1821,48 @@ La app te indica cuánto ahorrar, cuánto aportar al mes, en cuánto tiempo y te
             key="Aportación inicial vivienda",
         )
 
+    simular_volatilidad_house = st.checkbox(
+        "Simular volatilidad del mercado para la hucha de la entrada (Monte Carlo)",
+        value=False,
+        help=(
+            "Además del cálculo con rentabilidad fija, simula miles de escenarios con rentabilidades "
+            "mensuales aleatorias y muestra la probabilidad de reunir la entrada a tiempo."
+        ),
+        key="Simular volatilidad vivienda",
+    )
+    volatilidad_house_input = 10.0
+    distribucion_mc_house = "lognormal"
+    n_paths_mc_house = 10_000
+    if simular_volatilidad_house:
+        col_mc_1, col_mc_2, col_mc_3 = st.columns(3)
+        with col_mc_1:
+            volatilidad_house_input = st.number_input(
+                "Volatilidad anual estimada del ahorro (%)",
+                min_value=0.0,
+                max_value=60.0,
+                step=1.0,
+                value=10.0,
+                key="Volatilidad anual vivienda",
+            )
+        with col_mc_2:
+            distribucion_mc_house = st.selectbox(
+                "Distribución de las rentabilidades mensuales",
+                options=["lognormal", "normal", "t"],
+                format_func=lambda d: {
+                    "lognormal": "Log-normal",
+                    "normal": "Normal",
+                    "t": "t de Student (colas gruesas)",
+                }[d],
+                key="Distribución rentabilidades vivienda",
+            )
+        with col_mc_3:
+            n_paths_mc_house = st.select_slider(
+                "Número de escenarios simulados",
+                options=[1_000, 5_000, 10_000, 50_000, 100_000],
+                value=10_000,
+                key="Número de escenarios vivienda",
+            )
+
     entrada_objetivo = house_price * entrada_pct / 100.0
     gastos_totales = house_price * gastos_pct / 100.0
     objetivo_total_efectivo = entrada_objetivo + gastos_totales
@@ -1825,14 +1884,9 @@ La app te indica cuánto ahorrar, cuánto aportar al mes, en cuánto tiempo y te
     # Simulación rápida de hipoteca
     hipoteca_principal = max(0.0, house_price - entrada_objetivo)
     if hipoteca_principal > 0 and tipo_hipoteca_input >= 0 and plazo_hipoteca_years > 0:
-        r_mensual = (tipo_hipoteca_input / 100.0) / 12.0
-        n_meses_hipoteca = int(plazo_hipoteca_years * 12)
-        if r_mensual > 0:
-            cuota_mensual_hipoteca = hipoteca_principal * r_mensual * (1 + r_mensual) ** n_meses_hipoteca / (
-                (1 + r_mensual) ** n_meses_hipoteca - 1
-            )
-        else:
-            cuota_mensual_hipoteca = hipoteca_principal / n_meses_hipoteca
+        cuota_mensual_hipoteca = compute_mortgage_payment(
+            hipoteca_principal, tipo_hipoteca_input / 100.0, plazo_hipoteca_years
+        )
         st.markdown(
             f"💳 Hipoteca simulada: principal aproximado **{hipoteca_principal:,.0f} €**, "
             f"cuota mensual estimada **{cuota_mensual_hipoteca:,.0f} €** a {plazo_hipoteca_years:.0f} años "
@@ -1856,63 +1910,30 @@ La app te indica cuánto ahorrar, cuánto aportar al mes, en cuánto tiempo y te
             if modo_house == "Constante":
                 # === MODO CONSTANTE ===
                 if apply_tax_house:
-                    # Buscamos la aportación mensual para que el objetivo total (entrada + gastos) sea NETO tras impuestos
-                    def net_final_house_with_monthly(C: float):
-                        C_int = int(round(C))
-                        if C_int < 0:
-                            C_int = 0
-                        final_val_sim, _ = simulate_constant_plan(
-                            current_total=ahorro_actual_entrada,
-                            monthly_contribution=C_int,
-                            years=int(years_house),
-                            annual_return=annual_return_house,
-                            extra_savings=0.0,
-                        )
-                        principal_total_sim = ahorro_actual_entrada + C_int * months_house
-                        gain_sim = max(0.0, final_val_sim - principal_total_sim)
-                        tax_sim = compute_progressive_tax(gain_sim)
-                        net_final_sim = final_val_sim - tax_sim
-                        return net_final_sim, final_val_sim, gain_sim, tax_sim
-
-                    net0, _, _, _ = net_final_house_with_monthly(0.0)
-                    if net0 >= objetivo_total_efectivo:
-                        mensual_entrada = 0
-                        final_entrada = ahorro_actual_entrada
-                        principal_total_entrada = ahorro_actual_entrada
-                        gain_entrada = 0.0
-                        tax_entrada = 0.0
-                        net_final_entrada = final_entrada
-                        series_entrada = [final_entrada] * months_house
-                    else:
-                        low = 0.0
-                        high = max(objetivo_total_efectivo / max(months_house, 1) * 3, 5000.0)
-                        final_entrada = 0.0
-                        gain_entrada = 0.0
-                        tax_entrada = 0.0
-                        net_final_entrada = 0.0
-                        for _ in range(40):
-                            mid = (low + high) / 2
-                            net_mid, final_mid, gain_mid, tax_mid = net_final_house_with_monthly(mid)
-                            if net_mid < objetivo_total_efectivo:
-                                low = mid
-                            else:
-                                high = mid
-                                final_entrada = final_mid
-                                gain_entrada = gain_mid
-                                tax_entrada = tax_mid
-                                net_final_entrada = net_mid
-                        mensual_entrada = int(round(high))
-                        final_entrada, series_entrada = simulate_constant_plan(
-                            current_total=ahorro_actual_entrada,
-                            monthly_contribution=mensual_entrada,
-                            years=int(years_house),
-                            annual_return=annual_return_house,
-                            extra_savings=0.0,
+                    # Menor aportación mensual entera con la que el objetivo total (entrada + gastos) es NETO
+                    # tras impuestos, despejada en forma cerrada por tramos del impuesto
+                    mensual_entrada = int(
+                        np.ceil(
+                            required_constant_monthly_net(
+                                goal=objetivo_total_efectivo,
+                                initial_value=ahorro_actual_entrada,
+                                years=int(years_house),
+                                annual_return=annual_return_house,
+                            )
+                            - 1e-9
                         )
-                        principal_total_entrada = ahorro_actual_entrada + mensual_entrada * months_house
-                        gain_entrada = max(0.0, final_entrada - principal_total_entrada)
-                        tax_entrada = compute_progressive_tax(gain_entrada)
-                        net_final_entrada = final_entrada - tax_entrada
+                    )
+                    final_entrada, series_entrada = simulate_constant_plan(
+                        current_total=ahorro_actual_entrada,
+                        monthly_contribution=mensual_entrada,
+                        years=int(years_house),
+                        annual_return=annual_return_house,
+                        extra_savings=0.0,
+                    )
+                    principal_total_entrada = ahorro_actual_entrada + mensual_entrada * months_house
+                    gain_entrada = max(0.0, final_entrada - principal_total_entrada)
+                    tax_entrada = compute_progressive_tax(gain_entrada)
+                    net_final_entrada = final_entrada - tax_entrada
                 else:
                     # Sin impuestos: objetivo total bruto (entrada + gastos)
                     mensual_entrada = required_constant_monthly_for_goal(
@@ -1962,12 +1983,7 @@ La app te indica cuánto ahorrar, cuánto aportar al mes, en cuánto tiempo y te
                     )
 
                 st.markdown("#### Evolución estimada del ahorro para la entrada")
-                df_entrada = pd.DataFrame(
-                    {
-                        "Año": [m / 12 for m in range(1, len(series_entrada) + 1)],
-                        "Ahorro_estimado_€": series_entrada,
-                    }
-                )
+                df_entrada = series_entrada.to_frame("Ahorro_estimado_€")
                 st.line_chart(df_entrada, x="Año", y="Ahorro_estimado_€")
 
                 st.caption(
@@ -1975,73 +1991,51 @@ La app te indica cuánto ahorrar, cuánto aportar al mes, en cuánto tiempo y te
                     "suponiendo aportaciones constantes y una rentabilidad media estable."
                 )
 
+                if simular_volatilidad_house:
+                    render_monte_carlo(
+                        initial_value=ahorro_actual_entrada,
+                        initial_monthly=mensual_entrada,
+                        final_monthly=mensual_entrada,
+                        years=int(years_house),
+                        annual_return=annual_return_house,
+                        annual_volatility=volatilidad_house_input / 100.0,
+                        goal=objetivo_total_efectivo,
+                        goal_after_tax=apply_tax_house,
+                        n_paths=n_paths_mc_house,
+                        distribution=distribucion_mc_house,
+                    )
+
             else:
                 # === MODO CRECIENTE ===
                 if apply_tax_house:
-                    # Buscamos la aportación final mensual para que el efectivo total sea NETO tras impuestos
-                    def net_final_house_with_final_monthly(F: float):
-                        F_float = float(F)
-                        final_val_sim, _ = simulate_dca_ramp(
-                            initial_monthly=initial_monthly_house,
-                            final_monthly=F_float,
-                            years=int(years_house),
-                            annual_return=annual_return_house,
-                            initial_value=ahorro_actual_entrada,
-                        )
-                        contrib_total_sim = months_house * (initial_monthly_house + F_float) / 2.0
-                        principal_total_sim = ahorro_actual_entrada + contrib_total_sim
-                        gain_sim = max(0.0, final_val_sim - principal_total_sim)
-                        tax_sim = compute_progressive_tax(gain_sim)
-                        net_final_sim = final_val_sim - tax_sim
-                        return net_final_sim, final_val_sim, gain_sim, tax_sim
-
-                    net0, _, _, _ = net_final_house_with_final_monthly(initial_monthly_house)
-                    if net0 >= objetivo_total_efectivo:
-                        final_monthly_house = initial_monthly_house
-                        final_entrada_grow, series_entrada_grow = simulate_dca_ramp(
-                            initial_monthly=initial_monthly_house,
-                            final_monthly=final_monthly_house,
-                            years=int(years_house),
-                            annual_return=annual_return_house,
-                            initial_value=ahorro_actual_entrada,
-                        )
-                        contrib_total = months_house * (initial_monthly_house + final_monthly_house) / 2.0
-                        principal_total_entrada = ahorro_actual_entrada + contrib_total
-                        gain_entrada = max(0.0, final_entrada_grow - principal_total_entrada)
-                        tax_entrada = compute_progressive_tax(gain_entrada)
-                        net_final_entrada = final_entrada_grow - tax_entrada
-                    else:
-                        low = initial_monthly_house
-                        high = max(initial_monthly_house * 3, 5000.0)
-                        final_entrada_grow = 0.0
-                        gain_entrada = 0.0
-                        tax_entrada = 0.0
-                        net_final_entrada = 0.0
-                        series_entrada_grow = []
-                        for _ in range(40):
-                            mid = (low + high) / 2
-                            net_mid, final_mid, gain_mid, tax_mid = net_final_house_with_final_monthly(mid)
-                            if net_mid < objetivo_total_efectivo:
-                                low = mid
-                            else:
-                                high = mid
-                                final_entrada_grow = final_mid
-                                gain_entrada = gain_mid
-                                tax_entrada = tax_mid
-                                net_final_entrada = net_mid
-                        final_monthly_house = int(round(high))
-                        final_entrada_grow, series_entrada_grow = simulate_dca_ramp(
-                            initial_monthly=initial_monthly_house,
-                            final_monthly=final_monthly_house,
-                            years=int(years_house),
-                            annual_return=annual_return_house,
-                            initial_value=ahorro_actual_entrada,
+                    # Aportación final mensual para que el efectivo total sea NETO tras impuestos, en forma cerrada;
+                    # si con la aportación inicial plana ya se llega, no hace falta que crezca
+                    final_monthly_house = int(
+                        round(
+                            max(
+                                float(initial_monthly_house),
+                                required_final_monthly_net(
+                                    goal=objetivo_total_efectivo,
+                                    initial_value=ahorro_actual_entrada,
+                                    initial_monthly=initial_monthly_house,
+                                    years=int(years_house),
+                                    annual_return=annual_return_house,
+                                ),
+                            )
                         )
-                        contrib_total = months_house * (initial_monthly_house + final_monthly_house) / 2.0
-                        principal_total_entrada = ahorro_actual_entrada + contrib_total
-                        gain_entrada = max(0.0, final_entrada_grow - principal_total_entrada)
-                        tax_entrada = compute_progressive_tax(gain_entrada)
-                        net_final_entrada = final_entrada_grow - tax_entrada
+                    )
+                    final_entrada_grow, series_entrada_grow = simulate_dca_ramp(
+                        initial_monthly=initial_monthly_house,
+                        final_monthly=final_monthly_house,
+                        years=int(years_house),
+                        annual_return=annual_return_house,
+                        initial_value=ahorro_actual_entrada,
+                    )
+                    contrib_total = months_house * (initial_monthly_house + final_monthly_house) / 2.0
+                    principal_total_entrada = ahorro_actual_entrada + contrib_total
+                    gain_entrada = max(0.0, final_entrada_grow - principal_total_entrada)
+                    tax_entrada = compute_progressive_tax(gain_entrada)
+                    net_final_entrada = final_entrada_grow - tax_entrada
                 else:
                     # Sin impuestos: objetivo total bruto
                     final_monthly_house, _ = required_growing_monthlies_for_goal(
@@ -2066,37 +2060,6 @@ La app te indica cuánto ahorrar, cuánto aportar al mes, en cuánto tiempo y te
                     tax_entrada = 0.0
                     net_final_entrada = final_entrada_grow
 
-                # Construimos resumen anual de aportaciones
-                resumen_anual_house = []
-                for año in range(1, int(years_house) + 1):
-                    start_idx = (año - 1) * 12
-                    end_idx = año * 12 - 1
-                    if months_house > 1:
-                        start_month = int(
-                            round(
-                                initial_monthly_house
-                                + (final_monthly_house - initial_monthly_house) * (start_idx / (months_house - 1))
-                            )
-                        )
-                        end_month = int(
-                            round(
-                                initial_monthly_house
-                                + (final_monthly_house - initial_monthly_house) * (end_idx / (months_house - 1))
-                            )
-                        )
-                    else:
-                        start_month = final_monthly_house
-                        end_month = final_monthly_house
-                    avg_month = int(round((start_month + end_month) / 2))
-                    resumen_anual_house.append(
-                        {
-                            "Año": año,
-                            "Inicio_€/mes": start_month,
-                            "Fin_€/mes": end_month,
-                            "Media_€/mes": avg_month,
-                        }
-                    )
-
                 st.subheader("📌 Plan de ahorro para la entrada (aportación creciente)")
                 objetivo_texto = "NETOS" if apply_tax_house else "brutos"
                 st.write(
@@ -2107,7 +2070,7 @@ La app te indica cuánto ahorrar, cuánto aportar al mes, en cuánto tiempo y te
                     f"aproximadamente **{final_monthly_house} € al mes** a este objetivo."
                 )
 
-                df_resumen_house = pd.DataFrame(resumen_anual_house)
+                df_resumen_house = ramp_yearly_summary(initial_monthly_house, final_monthly_house, int(years_house))
                 st.markdown("#### Aportaciones aproximadas por año (plan entrada vivienda)")
                 st.dataframe(df_resumen_house)
 
@@ -2125,6 +2088,20 @@ La app te indica cuánto ahorrar, cuánto aportar al mes, en cuánto tiempo y te
                     f"con una rentabilidad anual estimada del {anual_return_house_input:.1f}%."
 )
 
+                if simular_volatilidad_house:
+                    render_monte_carlo(
+                        initial_value=ahorro_actual_entrada,
+                        initial_monthly=initial_monthly_house,
+                        final_monthly=final_monthly_house,
+                        years=int(years_house),
+                        annual_return=annual_return_house,
+                        annual_volatility=volatilidad_house_input / 100.0,
+                        goal=objetivo_total_efectivo,
+                        goal_after_tax=apply_tax_house,
+                        n_paths=n_paths_mc_house,
+                        distribution=distribucion_mc_house,
+                    )
+
 
 # ============================
 # TAB 4: ANÁLISIS DE CARTERA
@@ -2150,7 +2127,8 @@ del universo completo (CSV) y asignándoles un valor en euros.
     )
 
     # Cargamos universo completo desde el CSV grande
-    universe_df = load_universe_csv()
+    version = universe_version()
+    universe_df = load_universe_csv(version)
     if universe_df.empty:
         st.error(
             "No se ha podido cargar el universo de activos desde 'TradeRepublic_Activos_Completo.csv'. "
@@ -2175,24 +2153,53 @@ del universo completo (CSV) y asignándoles un valor en euros.
 
         st.subheader("🔎 Buscar y añadir activos a la cartera de análisis")
 
-        # Desplegable con buscador interno de Streamlit (sin tabla aparte)
-        label_df = universe_df.copy()
-        label_df["Label"] = label_df.apply(
-            lambda r: f"{r.get('Name','')} ({r.get('ISIN','')}) - {r.get('Type','')} {r.get('Region','')}",
-            axis=1,
-        )
-
-        options = ["(elige un activo)"] + label_df["Label"].tolist()
-        selected_label = st.selectbox(
-            "Escribe para buscar por nombre/ISIN y selecciona el activo",
-            options=options,
-            index=0,
-            help="Empieza a escribir y usa el buscador interno del desplegable para filtrar.",
+        # Búsqueda en el servidor: al desplegable solo llega una página de resultados
+        search_index = load_instrument_index(version)
+        col_query, col_page = st.columns([3, 1])
+        with col_query:
+            query = st.text_input(
+                "Busca por nombre o ISIN",
+                key="busqueda_universo",
+                placeholder="p. ej. core msci world, apple, IE00B4L5",
+                help="Palabras del nombre (también a medio escribir o con erratas) o el principio del ISIN.",
+            )
+        # Al cambiar la búsqueda se vuelve a la primera página
+        if st.session_state.get("busqueda_universo_anterior") != query:
+            st.session_state["busqueda_universo_anterior"] = query
+            st.session_state["pagina_busqueda_universo"] = 1
+        results = search_index.search(
+            query,
+            page=st.session_state.get("pagina_busqueda_universo", 1) - 1,
+            page_size=SEARCH_PAGE_SIZE,
         )
+        st.session_state["pagina_busqueda_universo"] = results.page + 1
+        with col_page:
+            st.number_input(
+                "Página",
+                min_value=1,
+                max_value=results.pages,
+                step=1,
+                key="pagina_busqueda_universo",
+            )
 
         selected_row = None
-        if selected_label != "(elige un activo)":
-            selected_row = label_df.loc[label_df["Label"] == selected_label].iloc[0]
+        if not query.strip():
+            st.caption("Escribe para buscar entre los activos del universo.")
+        elif results.total == 0:
+            st.warning(f"Ningún activo coincide con '{query}'.")
+        else:
+            st.caption(
+                f"{results.total:,} resultados · página {results.page + 1} de {results.pages}"
+                + (f" · búsqueda aproximada para: {', '.join(results.corrected)}" if results.corrected else "")
+            )
+            selected_pos = st.selectbox(
+                "Selecciona el activo",
+                options=[-1] + results.rows.tolist(),
+                format_func=lambda pos: "(elige un activo)" if pos < 0 else search_index.labels[pos],
+                index=0,
+            )
+            if selected_pos >= 0:
+                selected_row = universe_df.iloc[selected_pos]
 
         col_add1, col_add2 = st.columns(2)
         with col_add1:
@@ -0,0 +1,102 @@
+"""
+Implementaciones escalares anteriores (bucles mes a mes y diccionarios), copiadas
+de app.py y rebalance_marcos.py antes de pasar al motor de planificador/. Solo se
+usan como referencia en los benchmarks.
+"""
+
+
+# --- app.py: tipo nominal r/12, aportación a final de mes ---
+
+def app_simulate_constant_plan(current_total, monthly_contribution, years, annual_return, extra_savings=0.0):
+    months = int(years * 12)
+    r_m = float(annual_return) / 12.0
+    value = float(current_total) + float(extra_savings)
+    series = []
+    for _ in range(months):
+        value *= (1.0 + r_m)
+        value += float(monthly_contribution)
+        series.append(value)
+    return value, series
+
+
+def app_simulate_dca_ramp(initial_monthly, final_monthly, years, annual_return, initial_value=0.0):
+    months = int(years * 12)
+    r_m = float(annual_return) / 12.0
+    value = float(initial_value)
+    series = []
+    for m in range(months):
+        frac = m / (months - 1) if months > 1 else 1.0
+        contrib = float(initial_monthly) + (float(final_monthly) - float(initial_monthly)) * frac
+        value *= (1.0 + r_m)
+        value += contrib
+        series.append(value)
+    return value, series
+
+
+def app_compute_contribution_plan(holdings, targets, monthly_contribution):
+    C = float(monthly_contribution)
+    if C <= 0 or not holdings:
+        return {a: 0.0 for a in holdings}
+    total1 = max(0.0, float(sum(holdings.values()))) + C
+    raw_contribs = {a: max(0.0, float(targets.get(a, 0.0)) * total1 - float(h)) for a, h in holdings.items()}
+    sum_raw = sum(raw_contribs.values())
+    sum_targets = sum(targets.values())
+    if sum_raw <= 0:
+        if sum_targets <= 0:
+            return {a: C / len(holdings) for a in holdings}
+        return {a: C * (float(targets.get(a, 0.0)) / sum_targets) for a in holdings}
+    if sum_raw >= C:
+        scale = C / sum_raw
+        return {a: raw_contribs[a] * scale for a in holdings}
+    leftover = C - sum_raw
+    contribs = raw_contribs.copy()
+    for a in holdings:
+        if sum_targets <= 0:
+            contribs[a] += leftover / len(holdings)
+        else:
+            contribs[a] += leftover * (float(targets.get(a, 0.0)) / sum_targets)
+    return contribs
+
+
+# --- rebalance_marcos.py: tipo geométrico, aportación al inicio del mes ---
+
+def cli_simulate_constant_plan(current_total, monthly_contribution, years, annual_return, extra_savings=0.0):
+    months = years * 12
+    r_m = (1 + annual_return) ** (1 / 12) - 1
+    value = current_total + extra_savings
+    monthly_values = []
+    for _ in range(months):
+        value += monthly_contribution
+        value *= (1 + r_m)
+        monthly_values.append(value)
+    return value, monthly_values
+
+
+def cli_simulate_dca_ramp(initial_monthly, final_monthly, years, annual_return, initial_value=0.0):
+    months = years * 12
+    monthly_values = []
+    value = initial_value
+    r_m = (1 + annual_return) ** (1 / 12) - 1
+    for m in range(months):
+        if months == 1:
+            contrib = final_monthly
+        else:
+            contrib = initial_monthly + (final_monthly - initial_monthly) * (m / (months - 1))
+        value += contrib
+        value *= (1 + r_m)
+        monthly_values.append(value)
+    return value, monthly_values
+
+
+def cli_compute_contribution_plan(holdings, targets, monthly_contribution):
+    total_after = sum(holdings.values()) + monthly_contribution
+    needed_raw = {a: max(0.0, t * total_after - holdings[a]) for a, t in targets.items()}
+    total_needed = sum(needed_raw.values())
+    if total_needed == 0:
+        return {a: monthly_contribution * targets[a] for a in holdings}
+    contributions = {a: int(round(n / total_needed * monthly_contribution)) for a, n in needed_raw.items()}
+    diff = int(round(monthly_contribution - sum(contributions.values())))
+    if diff != 0:
+        biggest = max(contributions, key=lambda k: contributions[k])
+        contributions[biggest] = contributions[biggest] + diff
+    return contributions
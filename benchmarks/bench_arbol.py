@@ -0,0 +1,56 @@
+"""
+Benchmark: reparto de la aportación por un árbol de objetivos (clase → subclase →
+... → instrumento) con miles de hojas.
+
+Mide la construcción del árbol, la agregación de valores de abajo arriba y el
+reparto de arriba abajo con bandas en cada nivel, y comprueba que se reparte
+toda la aportación.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_arbol
+"""
+
+import itertools
+import time
+
+import numpy as np
+
+from planificador.arbol import TargetTree, tree_contribution
+from planificador.cartera import Portfolio
+
+
+def _random_tree(rng: np.random.Generator, branching: int, depth: int):
+    paths, weights = [], []
+    for d in range(1, depth + 1):
+        for parts in itertools.product(range(branching), repeat=d):
+            paths.append("/".join(f"N{'_'.join(map(str, parts[: i + 1]))}" for i in range(d)))
+            weights.append(rng.uniform(1.0, 10.0))
+    return paths, np.asarray(weights)
+
+
+def main(seed: int = 42) -> None:
+    rng = np.random.default_rng(seed)
+    print(f"{'hojas':>8} {'niveles':>8} | {'árbol ms':>9} {'agregar ms':>11} {'repartir ms':>12}")
+    for branching, depth in ((5, 2), (6, 3), (8, 4), (7, 5)):
+        paths, weights = _random_tree(rng, branching, depth)
+        start = time.perf_counter()
+        tree = TargetTree(paths, weights)
+        t_tree = time.perf_counter() - start
+
+        leaves = tree.names[tree.leaves]
+        values = rng.uniform(0.0, 1_000.0, leaves.size)
+        portfolio = Portfolio.from_arrays(leaves, values, tree.global_weights()[tree.leaves])
+
+        start = time.perf_counter()
+        tree.aggregate(values)
+        t_aggregate = time.perf_counter() - start
+        start = time.perf_counter()
+        plan = tree_contribution(tree, portfolio, 10_000.0, bands=[0.05, 0.03, 0.02])
+        t_plan = time.perf_counter() - start
+        assert np.isclose(plan.asset_contributions.sum(), 10_000.0)
+
+        print(f"{leaves.size:>8,} {depth:>8} | {t_tree * 1e3:>9.2f} {t_aggregate * 1e3:>11.3f} {t_plan * 1e3:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark: backtest de políticas de aportación/rebalanceo, 20 años × 50 activos ×
+cientos de combinaciones de parámetros.
+
+Compara el motor vectorial (todas las políticas a la vez) con simular cada
+política por separado con el reparto y el rebalanceo de la pestaña 1 mes a mes,
+y mide el barrido completo en un solo proceso y repartido en un pool.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_backtest
+"""
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from planificador.backtest import backtest_policies, policy_grid, sweep_policies
+from planificador.cartera import Portfolio, contribution_vector
+from planificador.rebalanceo import rebalance_to_band
+
+
+def backtest_loop(prices: np.ndarray, targets: np.ndarray, policy, initial_value: float) -> float:
+    """Una política, mes a mes, con las funciones de la pestaña 1."""
+    names = np.arange(prices.shape[1]).astype(str)
+    values = targets * initial_value
+    for t in range(prices.shape[0]):
+        if t > 0:
+            values = values * prices[t] / prices[t - 1]
+        values = values + contribution_vector(Portfolio.from_arrays(names, values, targets), policy.monthly_contribution)
+        if policy.rebalance != "none" and t % policy.check_every == 0:
+            values = values + rebalance_to_band(values, targets, policy.band, policy.rebalance).trades
+    return float(values.sum())
+
+
+def main(years: int = 20, n_assets: int = 50, seed: int = 42) -> None:
+    rng = np.random.default_rng(seed)
+    months = years * 12
+    dates = pd.date_range("2005-01-31", periods=months, freq="ME")
+    prices = pd.DataFrame(
+        np.cumprod(1.0 + rng.normal(0.006, 0.05, (months, n_assets)), axis=0) * 100.0,
+        index=dates,
+        columns=[f"ISIN{i:04d}" for i in range(n_assets)],
+    )
+    targets = rng.dirichlet(np.ones(n_assets))
+    policies = policy_grid(
+        contributions=(100, 200, 300, 500, 750, 1000),
+        bands=(0.0025, 0.005, 0.01, 0.02, 0.03, 0.05, 0.075, 0.1),
+        check_every=(1, 2, 3, 6, 12),
+    )
+    print(f"{years} años × {n_assets} activos × {len(policies)} políticas")
+
+    sample = policies[:: max(1, len(policies) // 12)]
+    start = time.perf_counter()
+    loop_values = [backtest_loop(prices.to_numpy(), targets, p, 10_000.0) for p in sample]
+    t_loop = (time.perf_counter() - start) / len(sample)
+    result = backtest_policies(prices, targets, sample, 10_000.0)
+    assert np.allclose(result.terminal_value, loop_values)
+    print(f"  bucle por política:         {t_loop * 1e3:9.1f} ms/política (estimado {t_loop * len(policies):,.1f} s en total)")
+
+    start = time.perf_counter()
+    backtest_policies(prices, targets, policies, 10_000.0)
+    t_vector = time.perf_counter() - start
+    print(f"  vectorial, 1 proceso:       {t_vector:9.2f} s  ({len(policies) / t_vector:,.0f} políticas/s)")
+
+    workers = os.cpu_count() or 1
+    start = time.perf_counter()
+    sweep_policies(prices, targets, policies, 10_000.0, workers=max(2, workers))
+    t_pool = time.perf_counter() - start
+    print(f"  vectorial, pool ({max(2, workers)} procesos): {t_pool:9.2f} s  ({len(policies) / t_pool:,.0f} políticas/s)")
+
+
+if __name__ == "__main__":
+    main()
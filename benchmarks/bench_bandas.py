@@ -0,0 +1,53 @@
+"""
+Benchmark: rebalanceo con bandas de tolerancia frente al rebalanceo completo a los
+pesos objetivo que hacía antes el escenario con ventas de app.py.
+
+Para carteras aleatorias de 10 a 1.000.000 de activos (con una banda del 20% del
+peso medio, para que en todas haya activos fuera de banda) mide el tiempo del rebalanceo
+con bandas (borde y centro) y el volumen negociado (compras + ventas) de cada
+opción, y comprueba que todos los activos quedan dentro de su banda.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_bandas
+"""
+
+import time
+
+import numpy as np
+
+from planificador.rebalanceo import rebalance_to_band
+
+
+def _timed(fn, repeats: int):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeats
+
+
+def main(relative_band: float = 0.2, seed: int = 42) -> None:
+    rng = np.random.default_rng(seed)
+    print(f"Banda ±{relative_band:.0%} del peso medio (1/n) sobre el peso objetivo")
+    print(f"{'activos':>9} | {'borde ms':>9} {'centro ms':>9} | {'volumen borde':>14} {'centro':>14} {'completo':>14}")
+    for n_assets in (10, 100, 1_000, 10_000, 100_000, 1_000_000):
+        targets = rng.dirichlet(np.ones(n_assets))
+        band = relative_band / n_assets
+        values = targets * 100_000.0 * rng.uniform(0.5, 1.5, n_assets)
+        repeats = max(1, 20_000 // n_assets)
+
+        edge, t_edge = _timed(lambda: rebalance_to_band(values, targets, band, "edge"), repeats)
+        centre, t_centre = _timed(lambda: rebalance_to_band(values, targets, band, "centre"), repeats)
+        full = float(np.abs(targets * values.sum() - values).sum())
+
+        for result in (edge, centre):
+            assert abs(result.trades.sum()) < 1e-6 * values.sum()
+            assert np.all(np.abs(result.weights_after - targets) <= band + 1e-9)
+
+        print(
+            f"{n_assets:>9,} | {t_edge * 1e3:>9.3f} {t_centre * 1e3:>9.3f} | "
+            f"{edge.turnover:>12,.0f} € {centre.turnover:>12,.0f} € {full:>12,.0f} €"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: buscador de las pestañas 1 y 4 (índice invertido + ISIN por prefijo)
+frente a filtrar las 13.500 etiquetas con un recorrido completo por consulta, y
+tamaño de lo que se manda al desplegable en cada caso. Para las consultas con
+erratas, índice de trigramas + distancia acotada frente a calcular la distancia
+con todo el vocabulario.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_busqueda
+"""
+
+import time
+
+from planificador.busqueda import SEARCH_PAGE_SIZE, InstrumentIndex, bounded_levenshtein, tokenize
+from planificador.universo import UNIVERSE_FILE, load_universe
+
+QUERIES = ("a", "msci", "msci wor", "core msci world", "apple", "deutsche bank", "IE00B4L5", "US0378331005", "zzzz")
+FUZZY_QUERIES = ("ishres core msci wrld", "siemmens", "deutshe bank", "appel", "mircosoft", "alinaz")
+
+
+def scan_search(texts, query: str) -> list:
+    """Recorrido completo: filas en las que todas las palabras casan como prefijo."""
+    words = tokenize(query)
+    return [i for i, tokens in enumerate(texts) if words and all(any(t.startswith(w) for t in tokens) for w in words)]
+
+
+def main(repeat: int = 200) -> None:
+    universe = load_universe(UNIVERSE_FILE)
+    start = time.perf_counter()
+    index = InstrumentIndex.from_frame(universe)
+    t_build = time.perf_counter() - start
+    print(f"{len(index):,} activos, {len(index.terms):,} palabras; índice construido en {t_build * 1e3:.1f} ms")
+
+    texts = [tokenize(f"{name} {key}") for name, key in zip(universe["Name"], universe["Search_Key"])]
+    all_labels = sum(len(label) for label in index.labels.tolist())
+    print(f"{'consulta':>18} {'resultados':>11} {'índice':>10} {'recorrido':>11}")
+    worst = 0.0
+    for query in QUERIES:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = index.search(query)
+        t_index = (time.perf_counter() - start) / repeat
+        worst = max(worst, t_index)
+        start = time.perf_counter()
+        scan_search(texts, query)
+        t_scan = time.perf_counter() - start
+        print(f"{query:>18} {result.total:>11,} {t_index * 1e3:>7.3f} ms {t_scan * 1e3:>8.1f} ms")
+
+    print(f"{'con erratas':>24} {'resultados':>11} {'trigramas':>10} {'distancia a todo':>17}")
+    for query in FUZZY_QUERIES:
+        start = time.perf_counter()
+        for _ in range(repeat // 10):
+            result = index.search(query)
+        t_index = (time.perf_counter() - start) / (repeat // 10)
+        worst = max(worst, t_index)
+        # Sin índice de trigramas: distancia de cada palabra con erratas a todo el vocabulario
+        start = time.perf_counter()
+        for word in result.corrected:
+            [bounded_levenshtein(word, term, 2) for term in index.terms]
+        t_scan = time.perf_counter() - start
+        print(f"{query:>24} {result.total:>11,} {t_index * 1e3:>7.3f} ms {t_scan * 1e3:>14.1f} ms")
+
+    page = sum(len(label) for label in index.labels[index.search("msci").rows].tolist())
+    print(f"  peor consulta con índice: {worst * 1e3:.3f} ms")
+    print(f"  desplegable: {all_labels / 1e3:,.0f} kB con todas las etiquetas, {page / 1e3:.1f} kB con {SEARCH_PAGE_SIZE} resultados")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark: formatear todas las opciones del selector de activos de la pestaña 1,
+filtrando la tabla por cada ISIN (lo que hacía format_func) frente a las
+etiquetas precalculadas de AssetCatalog.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_catalogo
+"""
+
+import time
+
+import pandas as pd
+
+from planificador.catalogo import AssetCatalog
+from planificador.universo import UNIVERSE_FILE, load_universe
+
+
+def format_with_scans(catalog_df: pd.DataFrame, isins) -> list:
+    """Una búsqueda por filtro sobre toda la columna para cada opción: O(n²)."""
+    labels = []
+    for opt_isin in isins:
+        fila = catalog_df[catalog_df["ISIN"] == opt_isin]
+        labels.append(opt_isin if fila.empty else f"{fila['Nombre'].iloc[0]} ({opt_isin})")
+    return labels
+
+
+def main(sample: int = 1000) -> None:
+    universe = load_universe(UNIVERSE_FILE)
+    catalog_df = pd.DataFrame(
+        {"Nombre": universe["Name"], "ISIN": universe["ISIN"].str.upper(), "Tipo": universe["Type"].astype(str)}
+    ).drop_duplicates(subset="ISIN").reset_index(drop=True)
+    isins = catalog_df["ISIN"].tolist()
+    print(f"{len(isins):,} opciones en el selector")
+
+    start = time.perf_counter()
+    slow = format_with_scans(catalog_df, isins[:sample])
+    t_scan = (time.perf_counter() - start) / sample * len(isins)
+
+    start = time.perf_counter()
+    catalog = AssetCatalog.from_frame(catalog_df)
+    t_build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fast = [catalog.label(isin) for isin in isins]
+    t_label = time.perf_counter() - start
+    assert fast[:sample] == slow
+
+    print(f"  filtro por opción (estimado): {t_scan * 1e3:9.1f} ms por rerun")
+    print(f"  construir AssetCatalog:       {t_build * 1e3:9.1f} ms (una vez por proceso, con su índice de búsqueda)")
+    print(f"  etiquetas del catálogo:       {t_label * 1e3:9.1f} ms por rerun")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark: registro FIFO de lotes con años de compras mensuales.
+
+Construye el registro (30 años de compras mensuales de cada activo), calcula la
+base de coste de una venta en cada activo con los acumulados del registro frente a
+recorrer los lotes uno a uno, y mide la propuesta de ventas con menor impuesto
+para volver a la banda.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_lotes
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from planificador.lotes import LotLedger, lowest_tax_band_rebalance
+
+
+def cost_basis_loop(df: pd.DataFrame, names, values, sales) -> np.ndarray:
+    """FIFO lote a lote, agrupando la tabla de compras por activo."""
+    basis = np.empty(len(names))
+    lots = {name: g.sort_values("Fecha", kind="stable") for name, g in df.groupby("Activo")}
+    for i, name in enumerate(names):
+        g = lots[name]
+        units_total = g["Unidades"].sum()
+        to_sell = sales[i] / values[i] * units_total
+        acc = 0.0
+        for units, cost in zip(g["Unidades"], g["Coste_€"]):
+            take = min(units, to_sell)
+            acc += take / units * cost
+            to_sell -= take
+            if to_sell <= 0:
+                break
+        basis[i] = acc
+    return basis
+
+
+def main(years: int = 30, seed: int = 42) -> None:
+    rng = np.random.default_rng(seed)
+    print(f"{years} años de compras mensuales por activo")
+    print(f"{'activos':>8} {'lotes':>9} | {'registro ms':>11} {'base ms':>9} {'bucle ms':>9} | {'propuesta ms':>12}")
+    for n_assets in (10, 100, 500):
+        months = years * 12
+        names = np.array([f"A{i}" for i in range(n_assets)], dtype=object)
+        dates = np.tile(pd.date_range("1995-01-01", periods=months, freq="MS").to_numpy(), n_assets)
+        prices = np.cumprod(1.0 + rng.normal(0.005, 0.04, (n_assets, months)), axis=1) * 10.0
+        costs = rng.uniform(50.0, 300.0, (n_assets, months))
+        df = pd.DataFrame(
+            {
+                "Activo": np.repeat(names, months),
+                "Fecha": dates,
+                "Unidades": (costs / prices).ravel(),
+                "Coste_€": costs.ravel(),
+            }
+        ).sample(frac=1.0, random_state=seed)
+
+        start = time.perf_counter()
+        ledger = LotLedger.from_frame(df)
+        t_ledger = time.perf_counter() - start
+
+        values = prices[:, -1] * ledger.totals(names)[0]
+        sales = values * rng.uniform(0.0, 0.5, n_assets)
+        start = time.perf_counter()
+        basis = ledger.cost_basis(names, values, sales)
+        t_basis = time.perf_counter() - start
+        start = time.perf_counter()
+        basis_loop = cost_basis_loop(df, names, values, sales)
+        t_loop = time.perf_counter() - start
+        assert np.allclose(basis, basis_loop)
+
+        targets = rng.dirichlet(np.ones(n_assets))
+        start = time.perf_counter()
+        lowest_tax_band_rebalance(ledger, values, targets, 0.2 / n_assets, names)
+        t_proposal = time.perf_counter() - start
+
+        print(
+            f"{n_assets:>8,} {len(ledger):>9,} | {t_ledger * 1e3:>11.2f} {t_basis * 1e3:>9.3f} "
+            f"{t_loop * 1e3:>9.1f} | {t_proposal * 1e3:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
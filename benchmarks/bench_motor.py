@@ -0,0 +1,114 @@
+"""
+Benchmark: motor de planificador/ frente a los bucles escalares anteriores.
+
+Para cada convención (app.py: r/12 y aportación a final de mes; rebalance_marcos.py:
+tipo geométrico y aportación al inicio) compara velocidad y diferencia numérica de:
+
+- una simulación completa (valor final + serie mensual) plan a plan,
+- un lote de planes simulado de una vez con simulate_plans_batch,
+- el reparto de la aportación mensual entre N activos.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_motor
+"""
+
+import random
+import time
+
+import numpy as np
+
+from benchmarks import _legacy
+from planificador.cartera import Portfolio, compute_contribution_plan
+from planificador.simulacion import simulate_dca_ramp, simulate_plans_batch
+
+CONVENTIONS = (
+    ("app.py", _legacy.app_simulate_dca_ramp, "nominal", "end"),
+    ("rebalance_marcos.py", _legacy.cli_simulate_dca_ramp, "geometric", "start"),
+)
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def _max_rel_diff(a, b) -> float:
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    return float(np.max(np.abs(a - b) / np.maximum(1.0, np.abs(a))))
+
+
+def bench_simulation(cases) -> None:
+    for label, legacy_fn, compounding, timing in CONVENTIONS:
+        legacy, t_legacy = _timed(lambda: [legacy_fn(*case) for case in cases])
+        engine, t_engine = _timed(
+            lambda: [
+                simulate_dca_ramp(*case, compounding=compounding, timing=timing)
+                for case in cases
+            ]
+        )
+        first, last, years, rate, pv = (np.array(col) for col in zip(*cases))
+        batch, t_batch = _timed(
+            simulate_plans_batch, pv, first, last, years, rate, False, np.float64, compounding, timing
+        )
+        finals, t_finals = _timed(
+            simulate_plans_batch, pv, first, last, years, rate, True, np.float64, compounding, timing
+        )
+
+        diff_series = max(_max_rel_diff(l[1], e[1]) for l, e in zip(legacy, engine))
+        diff_batch = max(
+            _max_rel_diff(l[1], batch[i, : len(l[1])]) for i, l in enumerate(legacy)
+        )
+        diff_final = _max_rel_diff([l[0] for l in legacy], finals)
+        n = len(cases)
+        print(f"{label}  ({n} planes, compounding={compounding}, timing={timing})")
+        print(f"  bucle escalar:           {t_legacy * 1e3 / n:8.4f} ms/plan")
+        print(f"  motor, plan a plan:      {t_engine * 1e3 / n:8.4f} ms/plan   (x{t_legacy / t_engine:,.1f})")
+        print(f"  motor, lote con serie:   {t_batch * 1e3 / n:8.4f} ms/plan   (x{t_legacy / t_batch:,.1f})")
+        print(f"  motor, solo valor final: {t_finals * 1e3 / n:8.4f} ms/plan   (x{t_legacy / t_finals:,.0f})")
+        print(f"  diferencia relativa máx.: serie {diff_series:.1e}, lote {diff_batch:.1e}, final {diff_final:.1e}")
+
+
+def bench_contribution_plan(rng: random.Random, sizes=(10, 100, 1_000, 10_000), repeats: int = 20) -> None:
+    print(f"Reparto de la aportación mensual ({repeats} repeticiones por tamaño)")
+    for n_assets in sizes:
+        names = [f"A{i}" for i in range(n_assets)]
+        holdings = {a: rng.uniform(0, 10_000) for a in names}
+        weights = [rng.random() for _ in names]
+        total = sum(weights)
+        targets = {a: w / total for a, w in zip(names, weights)}
+        portfolio = Portfolio(holdings, targets)
+        contribution = 0.05 * sum(holdings.values())
+
+        legacy, t_legacy = _timed(
+            lambda: [_legacy.app_compute_contribution_plan(holdings, targets, contribution) for _ in range(repeats)]
+        )
+        engine, t_engine = _timed(
+            lambda: [compute_contribution_plan(portfolio, contribution, method="proportional") for _ in range(repeats)]
+        )
+        diff = max(abs(legacy[0][a] - engine[0][a]) for a in names)
+        print(
+            f"  {n_assets:>6} activos: dict {t_legacy * 1e3 / repeats:8.3f} ms, "
+            f"NumPy {t_engine * 1e3 / repeats:8.3f} ms   (x{t_legacy / t_engine:,.1f}), "
+            f"diferencia máx. {diff:.1e} €"
+        )
+
+
+def main(n_cases: int = 500, seed: int = 42) -> None:
+    rng = random.Random(seed)
+    cases = [
+        (
+            rng.choice([0, 50, 150, 300]),
+            rng.uniform(100, 3_000),
+            rng.randint(1, 50),
+            rng.uniform(-0.02, 0.12),
+            rng.uniform(0, 50_000),
+        )
+        for _ in range(n_cases)
+    ]
+    bench_simulation(cases)
+    bench_contribution_plan(rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Benchmark: proyección de 120 meses con actualización vectorial del estado frente a
+reconstruir la cartera y llamar al plan basado en diccionarios cada mes.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_proyeccion
+"""
+
+import time
+
+import numpy as np
+
+from planificador.cartera import Portfolio, compute_contribution_plan
+from planificador.proyeccion import project_contributions
+
+
+def project_with_dicts(portfolio: Portfolio, monthly_contribution: float, months: int, annual_returns) -> dict:
+    """Lo que habría que hacer sin la proyección: un plan por diccionarios cada mes."""
+    holdings = portfolio.holdings
+    targets = portfolio.targets
+    growth = dict(zip(portfolio.names.tolist(), (1.0 + np.asarray(annual_returns) / 12.0).tolist()))
+    for _ in range(months):
+        plan = compute_contribution_plan(Portfolio(holdings, targets), monthly_contribution)
+        holdings = {a: (holdings[a] + plan[a]) * growth[a] for a in holdings}
+    return holdings
+
+
+def main(months: int = 120, seed: int = 42) -> None:
+    rng = np.random.default_rng(seed)
+    print(f"{months} meses de aportación")
+    print(f"{'activos':>8} | {'diccionarios ms':>16} {'vectorial ms':>13} | {'x':>6}")
+    for n_assets in (10, 100, 1_000, 10_000):
+        targets = rng.dirichlet(np.ones(n_assets))
+        values = targets * 100_000.0 * rng.uniform(0.5, 1.5, n_assets)
+        returns = rng.uniform(0.0, 0.10, n_assets)
+        portfolio = Portfolio.from_arrays([f"A{i}" for i in range(n_assets)], values, targets)
+
+        start = time.perf_counter()
+        final_dicts = project_with_dicts(portfolio, 2_000.0, months, returns)
+        t_dicts = time.perf_counter() - start
+        start = time.perf_counter()
+        result = project_contributions(portfolio, 2_000.0, months, returns)
+        t_vector = time.perf_counter() - start
+
+        assert np.allclose(result.values[-1], list(final_dicts.values()))
+        print(f"{n_assets:>8,} | {t_dicts * 1e3:>16.2f} {t_vector * 1e3:>13.2f} | {t_dicts / t_vector:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark: aportación final de una rampa lineal, solver exacto frente a búsqueda binaria.
+
+Compara el cálculo exacto (planificador.simulacion.solve_ramp_final_monthly, el que
+usa app.py, y rebalance_marcos.required_growing_monthlies_for_goal) con la búsqueda
+binaria de 40 pasos sobre la simulación mes a mes que se usaba antes. Que ambos
+dan la misma aportación lo comprueba tests/test_simulacion.py.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_rampa
+"""
+
+import random
+import time
+
+import rebalance_marcos
+from benchmarks._legacy import cli_simulate_dca_ramp
+from planificador.simulacion import solve_ramp_final_monthly
+
+
+def _simulate_ramp_loop(initial_monthly, final_monthly, years, annual_return, initial_value):
+    """Simulación mes a mes de app.py (tipo nominal r/12, aportación a final de mes)."""
+    months = int(years * 12)
+    r_m = annual_return / 12.0
+    value = initial_value
+    for m in range(months):
+        frac = m / (months - 1) if months > 1 else 1.0
+        value *= 1.0 + r_m
+        value += initial_monthly + (final_monthly - initial_monthly) * frac
+    return value
+
+
+def bisection_app(goal, initial_value, initial_monthly, years, annual_return):
+    """Búsqueda binaria original de app.required_growing_monthlies_for_goal."""
+    if _simulate_ramp_loop(initial_monthly, initial_monthly, years, annual_return, initial_value) >= goal:
+        return int(round(initial_monthly))
+    low = float(initial_monthly)
+    high = max(float(initial_monthly) * 3.0, 5000.0)
+    for _ in range(40):
+        mid = (low + high) / 2.0
+        if _simulate_ramp_loop(initial_monthly, mid, years, annual_return, initial_value) < goal:
+            low = mid
+        else:
+            high = mid
+    return int(round(high))
+
+
+def exact_app(goal, initial_value, initial_monthly, years, annual_return):
+    final_monthly = float(solve_ramp_final_monthly(goal, initial_value, initial_monthly, years, annual_return))
+    return int(round(max(float(initial_monthly), final_monthly)))
+
+
+def bisection_cli(goal, initial_value, initial_monthly, years, annual_return, tax_rate):
+    """Búsqueda binaria original de rebalance_marcos.required_growing_monthlies_for_goal."""
+    months = years * 12
+
+    def net(final_monthly):
+        val, _ = cli_simulate_dca_ramp(initial_monthly, final_monthly, years, annual_return, initial_value)
+        principal = initial_value + months * (initial_monthly + final_monthly) / 2.0
+        return val - tax_rate * max(0.0, val - principal)
+
+    low = 0.0
+    high = max(initial_monthly * 10, 5000.0)
+    for _ in range(30):
+        mid = (low + high) / 2
+        if net(mid) < goal:
+            low = mid
+        else:
+            high = mid
+    return int(round((low + high) / 2))
+
+
+def exact_cli(goal, initial_value, initial_monthly, years, annual_return, tax_rate):
+    final_monthly, _ = rebalance_marcos.required_growing_monthlies_for_goal(
+        current_total=initial_value,
+        objetivo_final=goal,
+        years=years,
+        annual_return=annual_return,
+        initial_monthly=initial_monthly,
+        tax_rate=tax_rate,
+    )
+    return final_monthly
+
+
+def _timed(fn, cases):
+    start = time.perf_counter()
+    for case in cases:
+        fn(*case)
+    return time.perf_counter() - start
+
+
+def main(n_cases: int = 300, seed: int = 42) -> None:
+    rng = random.Random(seed)
+    cases = []
+    for _ in range(n_cases):
+        years = rng.randint(1, 60)
+        initial_monthly = rng.choice([50, 150, 300, 500])
+        goal = rng.uniform(20_000, 1_500_000)
+        cases.append((goal, rng.uniform(0, 50_000), initial_monthly, years, rng.uniform(0.0, 0.10)))
+
+    t_bisec = _timed(bisection_app, cases)
+    t_exact = _timed(exact_app, cases)
+    print(f"app.py  ({n_cases} planes, hasta 60 años)")
+    print(f"  búsqueda binaria: {t_bisec * 1e3 / n_cases:9.3f} ms/plan")
+    print(f"  solver exacto:    {t_exact * 1e3 / n_cases:9.3f} ms/plan   (x{t_bisec / t_exact:,.0f})")
+
+    cli_cases = [case + (rng.choice([0.0, 0.19, 0.26]),) for case in cases]
+    t_bisec = _timed(bisection_cli, cli_cases)
+    t_exact = _timed(exact_cli, cli_cases)
+    print(f"rebalance_marcos.py  ({n_cases} planes, con tipo fijo sobre plusvalías)")
+    print(f"  búsqueda binaria: {t_bisec * 1e3 / n_cases:9.3f} ms/plan")
+    print(f"  solver exacto:    {t_exact * 1e3 / n_cases:9.3f} ms/plan   (x{t_bisec / t_exact:,.0f})")
+
+
+if __name__ == "__main__":
+    main()
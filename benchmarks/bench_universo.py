@@ -0,0 +1,92 @@
+"""
+Benchmark: carga en frío del universo de activos, parseando el CSV como hacía
+app.py frente a leer la caché Feather ya normalizada.
+
+Mide también la normalización del tipo de activo: regla a regla en cada fila
+(el .apply que hacía la pestaña 1 en cada rerun) frente a clasificar solo los
+valores distintos.
+
+Trabaja sobre una copia del CSV en una carpeta temporal para no tocar la caché de
+la app.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_universo
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from planificador.universo import (
+    UNIVERSE_FILE,
+    load_universe,
+    normalize_asset_type,
+    normalize_asset_types,
+    universe_cache_path,
+)
+
+
+def load_universe_legacy(path) -> pd.DataFrame:
+    """La carga de antes: read_csv y limpieza de texto columna a columna en cada arranque."""
+    df = pd.read_csv(path)
+    for col in ["ISIN", "Name", "Search_Key"]:
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.strip()
+    for col in ["Type", "Region", "Country", "ETF_Provider", "ETF_Subtype", "Currency_Name"]:
+        if col not in df.columns:
+            df[col] = ""
+    return df
+
+
+def best_of(fn, repeat: int = 7) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(repeat: int = 7) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / Path(UNIVERSE_FILE).name
+        shutil.copyfile(UNIVERSE_FILE, source)
+        cache = universe_cache_path(source)
+
+        legacy = load_universe_legacy(source)
+        print(f"Universo: {len(legacy):,} filas, {source.stat().st_size / 1e6:.1f} MB de CSV")
+
+        def rebuild():
+            cache.unlink(missing_ok=True)
+            load_universe(source)
+
+        t_legacy = best_of(lambda: load_universe_legacy(source), repeat)
+        t_build = best_of(rebuild, repeat)
+        t_cached = best_of(lambda: load_universe(source), repeat)
+        os.utime(source)  # misma huella, otra fecha: se reaprovecha la caché
+        start = time.perf_counter()
+        load_universe(source)
+        t_touched = time.perf_counter() - start
+
+        cached = load_universe(source)
+        memory = lambda df: df.memory_usage(deep=True).sum() / 1e6
+        print(f"  read_csv + limpieza:            {t_legacy * 1e3:8.1f} ms   ({memory(legacy):.1f} MB en memoria)")
+        print(f"  caché reconstruida (CSV nuevo): {t_build * 1e3:8.1f} ms")
+        print(f"  caché Feather al día:           {t_cached * 1e3:8.1f} ms   ({memory(cached):.1f} MB en memoria)")
+        print(f"  CSV con otra fecha, mismo hash: {t_touched * 1e3:8.1f} ms")
+        print(f"  speedup en frío:                {t_legacy / t_cached:8.1f}×")
+
+        types = legacy["Type"]
+        assert (types.apply(normalize_asset_type) == normalize_asset_types(types).astype(str)).all()
+        t_apply = best_of(lambda: types.apply(normalize_asset_type), repeat)
+        t_unique = best_of(lambda: normalize_asset_types(types), repeat)
+        print(f"  tipo de activo, .apply por fila: {t_apply * 1e3:7.2f} ms")
+        print(f"  tipo de activo, valores únicos:  {t_unique * 1e3:7.2f} ms (y viene ya en la caché)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Motor de cálculo del planificador de cartera.
+
+Funciones vectorizadas con NumPy, sin dependencias de Streamlit, para que las
+puedan usar tanto la app (app.py) como el script de consola (rebalance_marcos.py).
+"""
+
+from planificador.arbol import TargetTree, TreePlan, tree_contribution
+from planificador.backtest import (
+    BacktestResult,
+    RebalancePolicy,
+    backtest_policies,
+    load_price_history,
+    policy_grid,
+    sweep_policies,
+)
+from planificador.busqueda import InstrumentIndex, SearchResult
+from planificador.cache import MemoCache, PLANNING_CACHE, invalidate_planning_cache, memoize
+from planificador.catalogo import AssetCatalog
+from planificador.cartera import (
+    Portfolio,
+    compute_contribution_plan,
+    contribution_vector,
+    grouped_waterfill,
+    waterfill_allocation,
+)
+from planificador.estado import STATE_CACHE, PortfolioState, portfolio_state
+from planificador.fiscalidad import (
+    CAPITAL_GAINS_BRACKETS,
+    INCOME_TAX_BRACKETS,
+    NO_TAX_BRACKETS,
+    compute_salary_net,
+    flat_rate_brackets,
+    progressive_tax,
+)
+from planificador.lotes import LotLedger, TaxAwareRebalance, lowest_tax_band_rebalance
+from planificador.montecarlo import MonteCarloResult, simulate_monte_carlo
+from planificador.objetivos import (
+    required_constant_monthly_net,
+    required_final_monthly_net,
+    solve_affine_net_goal,
+)
+from planificador.ordenes import OrderPlan, plan_orders
+from planificador.proyeccion import ProjectionResult, project_contributions
+from planificador.rebalanceo import RebalanceResult, band_trades, rebalance_to_band
+from planificador.resumen import ramp_yearly_contributions, ramp_yearly_summary
+from planificador.series import MonthlySeries
+from planificador.simulacion import (
+    horizon_months,
+    monthly_rate,
+    ramp_sums,
+    simulate_constant_plan,
+    simulate_constant_plans,
+    simulate_dca_ramp,
+    simulate_dca_ramps,
+    simulate_plans_batch,
+    solve_ramp_final_monthly,
+)
+from planificador.universo import (
+    ASSET_TYPES,
+    load_universe,
+    normalize_asset_type,
+    normalize_asset_types,
+    normalize_universe,
+    universe_version,
+)
+
+__all__ = [
+    "ASSET_TYPES",
+    "AssetCatalog",
+    "BacktestResult",
+    "CAPITAL_GAINS_BRACKETS",
+    "INCOME_TAX_BRACKETS",
+    "InstrumentIndex",
+    "LotLedger",
+    "MemoCache",
+    "MonteCarloResult",
+    "MonthlySeries",
+    "NO_TAX_BRACKETS",
+    "OrderPlan",
+    "PLANNING_CACHE",
+    "Portfolio",
+    "PortfolioState",
+    "ProjectionResult",
+    "RebalancePolicy",
+    "RebalanceResult",
+    "STATE_CACHE",
+    "SearchResult",
+    "TargetTree",
+    "TaxAwareRebalance",
+    "TreePlan",
+    "backtest_policies",
+    "band_trades",
+    "compute_contribution_plan",
+    "compute_salary_net",
+    "contribution_vector",
+    "flat_rate_brackets",
+    "grouped_waterfill",
+    "horizon_months",
+    "invalidate_planning_cache",
+    "load_price_history",
+    "load_universe",
+    "lowest_tax_band_rebalance",
+    "memoize",
+    "monthly_rate",
+    "normalize_asset_type",
+    "normalize_asset_types",
+    "normalize_universe",
+    "plan_orders",
+    "policy_grid",
+    "portfolio_state",
+    "progressive_tax",
+    "project_contributions",
+    "ramp_sums",
+    "ramp_yearly_contributions",
+    "ramp_yearly_summary",
+    "rebalance_to_band",
+    "required_constant_monthly_net",
+    "required_final_monthly_net",
+    "simulate_constant_plan",
+    "simulate_constant_plans",
+    "simulate_dca_ramp",
+    "simulate_dca_ramps",
+    "simulate_monte_carlo",
+    "simulate_plans_batch",
+    "solve_affine_net_goal",
+    "solve_ramp_final_monthly",
+    "sweep_policies",
+    "tree_contribution",
+    "universe_version",
+    "waterfill_allocation",
+]
@@ -0,0 +1,244 @@
+"""
+Objetivos jerárquicos: clase de activo → subclase → instrumento.
+
+El árbol se guarda en arrays (un elemento por nodo, padres antes que hijos):
+padre, profundidad, peso dentro del padre y, para las hojas, el activo de la
+cartera al que corresponden. Además se precalculan los pares (hoja, antecesor),
+de modo que el valor de todos los nodos se agrega de abajo arriba con una sola
+np.bincount, sin recorrer el árbol.
+
+El reparto de la aportación baja nivel a nivel: el dinero de cada nodo se reparte
+entre sus hijos por water-filling (cartera.grouped_waterfill) hacia sus pesos
+dentro del padre, o en proporción a esos pesos si todos los hijos ya están dentro
+de la banda de tolerancia de su nivel. Cada nivel se resuelve para todos los
+nodos a la vez con un water-filling por grupos, así que árboles profundos con
+miles de hojas siguen siendo instantáneos.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from planificador.cartera import Portfolio, grouped_waterfill
+
+PATH_SEPARATOR = "/"
+
+
+class TargetTree:
+    """
+    Árbol de pesos objetivo en arrays alineados por nodo (el nodo 0 es la raíz):
+
+    - labels: ruta completa del nodo ("Renta variable/Europa/ETF X"); "" para la raíz
+    - names: última parte de la ruta (para las hojas, el nombre del activo)
+    - parent: índice del padre (-1 para la raíz)
+    - depth: profundidad (0 para la raíz)
+    - local_weights: peso dentro del padre (0–1, los hermanos suman 1)
+    - is_leaf: si el nodo no tiene hijos
+    """
+
+    __slots__ = ("labels", "names", "parent", "depth", "local_weights", "is_leaf", "_pair_leaf", "_pair_node")
+
+    def __init__(self, paths, weights, separator: str = PATH_SEPARATOR):
+        paths = [PATH_SEPARATOR.join(p.strip() for p in str(path).split(separator) if p.strip()) for path in paths]
+        weights = np.asarray(weights, dtype=np.float64)
+        if len(paths) != weights.shape[0]:
+            raise ValueError("paths y weights deben tener la misma longitud.")
+        given = {}
+        for path, weight in zip(paths, weights.tolist()):
+            if path:
+                given[path] = given.get(path, 0.0) + (weight if np.isfinite(weight) else 0.0)
+        missing = sorted(
+            {path.rsplit(PATH_SEPARATOR, 1)[0] for path in given if PATH_SEPARATOR in path} - set(given)
+        )
+        if missing:
+            raise ValueError(f"Faltan los pesos de los nodos intermedios: {missing}")
+
+        # Padres antes que hijos: por profundidad y, dentro de cada nivel, en el orden dado
+        labels = [""] + sorted(given, key=lambda path: path.count(PATH_SEPARATOR))
+        position = {label: i for i, label in enumerate(labels)}
+        self.labels = np.asarray(labels, dtype=object)
+        self.names = np.asarray([label.rsplit(PATH_SEPARATOR, 1)[-1] for label in labels], dtype=object)
+        self.depth = np.asarray([0] + [label.count(PATH_SEPARATOR) + 1 for label in labels[1:]], dtype=np.int64)
+        self.parent = np.asarray(
+            [-1] + [position.get(label.rsplit(PATH_SEPARATOR, 1)[0], 0) if PATH_SEPARATOR in label else 0
+                    for label in labels[1:]],
+            dtype=np.int64,
+        )
+        raw = np.asarray([1.0] + [max(0.0, given[label]) for label in labels[1:]])
+        self.is_leaf = np.bincount(self.parent[1:], minlength=len(labels)) == 0
+
+        # Pesos dentro del padre: cada grupo de hermanos se normaliza a 1
+        sibling_sum = np.bincount(self.parent[1:], weights=raw[1:], minlength=len(labels))
+        local = np.ones_like(raw)
+        denom = sibling_sum[self.parent[1:]]
+        local[1:] = np.where(denom > 0, raw[1:] / np.where(denom > 0, denom, 1.0), 0.0)
+        self.local_weights = local
+
+        # Pares (hoja, antecesor) incluida la propia hoja: agregación en una sola bincount
+        leaves = np.flatnonzero(self.is_leaf)
+        pair_leaf, pair_node = [leaves], [leaves]
+        leaf, node = leaves, leaves
+        while True:
+            node = self.parent[node]
+            keep = node >= 0
+            if not keep.any():
+                break
+            leaf, node = leaf[keep], node[keep]
+            pair_leaf.append(leaf)
+            pair_node.append(node)
+        self._pair_leaf = np.concatenate(pair_leaf)
+        self._pair_node = np.concatenate(pair_node)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, path_col: str = "Ruta", weight_col: str = "Peso_%") -> "TargetTree":
+        """Árbol a partir de una tabla con una fila por nodo (ruta y peso dentro del padre)."""
+        weights = pd.to_numeric(df[weight_col], errors="coerce").fillna(0.0).to_numpy(dtype=np.float64)
+        return cls(df[path_col].fillna("").astype(str).tolist(), weights)
+
+    @classmethod
+    def from_portfolio(cls, portfolio: Portfolio, group_by=None) -> "TargetTree":
+        """
+        Árbol de dos niveles (grupo → activo) que reproduce los pesos planos de la
+        cartera. Por defecto agrupa por tipo de activo.
+        """
+        groups = np.asarray(portfolio.types if group_by is None else group_by, dtype=object)
+        groups = np.where(pd.Series(groups).fillna("").astype(str).str.strip().to_numpy() == "", "Otros", groups)
+        group_names, codes = np.unique(groups.astype(str), return_inverse=True)
+        group_weights = np.bincount(codes, weights=portfolio.target_weights, minlength=group_names.size)
+        paths = list(group_names) + [f"{g}{PATH_SEPARATOR}{a}" for g, a in zip(group_names[codes], portfolio.names)]
+        return cls(paths, np.concatenate((group_weights, portfolio.target_weights)))
+
+    def __len__(self) -> int:
+        return self.labels.shape[0]
+
+    def __repr__(self) -> str:
+        return f"TargetTree(nodes={len(self) - 1}, leaves={int(self.is_leaf.sum())}, depth={int(self.depth.max())})"
+
+    @property
+    def leaves(self) -> np.ndarray:
+        return np.flatnonzero(self.is_leaf)
+
+    def global_weights(self) -> np.ndarray:
+        """Peso objetivo sobre el total de cada nodo (producto de los pesos de su ruta)."""
+        weights = self.local_weights.copy()
+        for d in range(1, int(self.depth.max()) + 1):
+            level = self.depth == d
+            weights[level] *= weights[self.parent[level]]
+        return weights
+
+    def aggregate(self, leaf_values) -> np.ndarray:
+        """Valor de cada nodo a partir del valor de sus hojas (alineado con self.leaves)."""
+        per_leaf = np.zeros(len(self))
+        per_leaf[self.leaves] = np.asarray(leaf_values, dtype=np.float64)
+        return np.bincount(self._pair_node, weights=per_leaf[self._pair_leaf], minlength=len(self))
+
+    def leaf_positions(self, names) -> np.ndarray:
+        """Posición en `names` del activo de cada hoja (-1 si no está en la cartera)."""
+        index = {str(name): i for i, name in enumerate(np.asarray(names, dtype=object).tolist())}
+        return np.asarray([index.get(name, -1) for name in self.names[self.leaves].tolist()], dtype=np.int64)
+
+
+@dataclass
+class TreePlan:
+    tree: TargetTree
+    values_before: np.ndarray    # valor de cada nodo antes de aportar
+    contributions: np.ndarray    # aportación que recibe cada nodo
+    bands: np.ndarray            # banda de tolerancia de cada nodo (la de su nivel)
+    asset_names: np.ndarray      # activos de la cartera y, al final, los de las hojas que no están en ella
+    asset_contributions: np.ndarray  # aportación de cada activo (alineada con asset_names)
+
+    @property
+    def values_after(self) -> np.ndarray:
+        return self.values_before + self.contributions
+
+    def _local_weights(self, values: np.ndarray) -> np.ndarray:
+        parent_values = values[np.maximum(self.tree.parent, 0)]
+        weights = np.where(parent_values > 0, values / np.where(parent_values > 0, parent_values, 1.0), 0.0)
+        weights[0] = 1.0
+        return weights
+
+    def out_of_band(self, after: bool = True) -> np.ndarray:
+        """Nodos cuyo peso dentro del padre queda fuera de objetivo ± banda."""
+        weights = self._local_weights(self.values_after if after else self.values_before)
+        outside = np.abs(weights - self.tree.local_weights) > self.bands + 1e-9
+        outside[0] = False
+        return outside
+
+    def to_frame(self) -> pd.DataFrame:
+        """Una fila por nodo (sin la raíz): pesos dentro del padre antes/después y aportación."""
+        nodes = slice(1, None)
+        return pd.DataFrame(
+            {
+                "Nodo": self.tree.labels[nodes],
+                "Nivel": self.tree.depth[nodes],
+                "Valor_antes_€": self.values_before[nodes],
+                "Peso_en_padre_antes_%": self._local_weights(self.values_before)[nodes] * 100,
+                "Aportación_€": self.contributions[nodes],
+                "Peso_en_padre_despues_%": self._local_weights(self.values_after)[nodes] * 100,
+                "Peso_en_padre_objetivo_%": self.tree.local_weights[nodes] * 100,
+                "Fuera_de_banda": self.out_of_band()[nodes],
+            }
+        )
+
+
+def tree_contribution(tree: TargetTree, portfolio: Portfolio, monthly_contribution: float, bands=0.0) -> TreePlan:
+    """
+    Reparte la aportación de arriba abajo por el árbol (solo compras).
+
+    En cada nodo, si todos sus hijos están dentro de la banda de su nivel (peso
+    dentro del padre ± banda), el dinero se reparte en proporción a sus pesos
+    objetivo; si alguno está fuera, por water-filling hacia esos pesos.
+
+    bands: banda (0–1) común o una por nivel, empezando por el primer nivel bajo la
+    raíz (0.05, 0.02 = ±5 puntos entre clases y ±2 dentro de cada clase). Los
+    niveles sin banda propia usan la última.
+
+    Las hojas que no corresponden a ningún activo de la cartera cuentan como
+    activos nuevos con valor 0 y se añaden al final de asset_names, de modo que
+    asset_contributions suma toda la aportación.
+    """
+    leaf_pos = tree.leaf_positions(portfolio.names)
+    leaf_values = np.where(leaf_pos >= 0, portfolio.values[np.maximum(leaf_pos, 0)], 0.0)
+    values = tree.aggregate(leaf_values)
+
+    max_depth = int(tree.depth.max())
+    level_bands = np.atleast_1d(np.asarray(bands, dtype=np.float64))
+    per_level = level_bands[np.minimum(np.arange(max_depth + 1) - 1, level_bands.size - 1).clip(0)]
+    node_bands = np.where(tree.depth > 0, per_level[tree.depth], 0.0)
+
+    contributions = np.zeros(len(tree))
+    contributions[0] = max(0.0, float(monthly_contribution))
+    parent_values = values[np.maximum(tree.parent, 0)]
+    local_now = np.where(parent_values > 0, values / np.where(parent_values > 0, parent_values, 1.0), 0.0)
+    for d in range(1, max_depth + 1):
+        level = np.flatnonzero(tree.depth == d)
+        parents = tree.parent[level]
+        budgets = contributions  # presupuesto de cada padre, indexado por nodo
+        target = tree.local_weights[level]
+        gaps = target * (values[parents] + budgets[parents]) - values[level]
+        waterfill = grouped_waterfill(parents, gaps, budgets)
+        # Padres con todos los hijos dentro de banda: reparto proporcional a los pesos objetivo
+        outside = np.abs(local_now[level] - target) > node_bands[level] + 1e-9
+        any_outside = np.bincount(parents, weights=outside, minlength=len(tree)) > 0
+        contributions[level] = np.where(any_outside[parents], waterfill, target * budgets[parents])
+
+    leaves = tree.leaves
+    # Hojas sin activo en la cartera (salvo la raíz de un árbol vacío): activos nuevos al final
+    new = (leaf_pos < 0) & (tree.depth[leaves] > 0)
+    new_names = list(dict.fromkeys(tree.names[leaves][new].tolist()))
+    new_index = {name: len(portfolio) + i for i, name in enumerate(new_names)}
+    leaf_pos = leaf_pos.copy()
+    leaf_pos[new] = [new_index[name] for name in tree.names[leaves][new].tolist()]
+
+    asset_contributions = np.zeros(len(portfolio) + len(new_names))
+    found = leaf_pos >= 0
+    np.add.at(asset_contributions, leaf_pos[found], contributions[leaves][found])
+    return TreePlan(
+        tree=tree,
+        values_before=values,
+        contributions=contributions,
+        bands=node_bands,
+        asset_names=np.concatenate((np.asarray(portfolio.names, dtype=object), np.asarray(new_names, dtype=object))),
+        asset_contributions=asset_contributions,
+    )
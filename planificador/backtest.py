@@ -0,0 +1,257 @@
+"""
+Backtest de políticas de aportación y rebalanceo sobre precios históricos locales.
+
+Los precios se leen de CSV locales identificados por ISIN (los mismos ISIN que el
+universo TradeRepublic_Activos_Completo.csv): o bien una carpeta con un fichero
+<ISIN>.csv por activo (fecha + precio de cierre), o bien un único CSV ancho con
+una columna de fechas y una columna por ISIN. Los precios diarios se pasan a fin
+de mes.
+
+Cada mes se aplican las reglas de la pestaña 1: los activos se revalorizan con su
+precio, la aportación se reparte por water-filling hacia los pesos objetivo y, en
+las políticas con bandas, si algún activo queda fuera de objetivo ± banda se
+rebalancea con ventas hasta el borde o el centro (rebalanceo.band_trades). El
+estado es una matriz (políticas × activos): cada mes es una actualización
+vectorial para todas las políticas a la vez, y los barridos grandes se reparten
+por bloques de políticas entre procesos.
+"""
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from planificador.cartera import grouped_waterfill
+from planificador.rebalanceo import BAND_TARGETS, band_trades
+
+# "none" = solo aportaciones (sin ventas); el resto, como en rebalance_to_band
+POLICY_REBALANCES = ("none",) + BAND_TARGETS
+PRICE_COLUMNS = ("adj close", "adj_close", "close", "cierre", "precio", "price")
+# Con menos políticas que esto, arrancar procesos cuesta más de lo que ahorra
+POOL_MIN_POLICIES = 64
+
+
+@dataclass(frozen=True)
+class RebalancePolicy:
+    monthly_contribution: float     # aportación mensual en €
+    band: float = 0.0               # semiancho de la banda (0–1, 0.02 = ±2 puntos)
+    rebalance: str = "none"         # "none" (solo compras), "edge" o "centre"
+    check_every: int = 1            # meses entre revisiones de la banda
+
+
+def policy_grid(contributions, bands=(0.0,), rebalances=POLICY_REBALANCES, check_every=(1,)) -> list:
+    """Todas las combinaciones de parámetros (las de solo compras no repiten banda ni revisión)."""
+    policies = []
+    for contribution, rebalance in itertools.product(contributions, rebalances):
+        if rebalance == "none":
+            policies.append(RebalancePolicy(float(contribution)))
+            continue
+        for band, every in itertools.product(bands, check_every):
+            policies.append(RebalancePolicy(float(contribution), float(band), rebalance, int(every)))
+    return policies
+
+
+def _read_price_file(path: Path) -> pd.Series:
+    """Serie de precios de un CSV (fecha en la primera columna, precio de cierre)."""
+    df = pd.read_csv(path)
+    dates = pd.to_datetime(df.iloc[:, 0], errors="coerce")
+    lowered = {str(col).strip().lower(): col for col in df.columns[1:]}
+    column = next((lowered[name] for name in PRICE_COLUMNS if name in lowered), None)
+    if column is None:
+        numeric = df.iloc[:, 1:].select_dtypes("number").columns
+        if numeric.empty:
+            raise ValueError(f"'{path}' no tiene ninguna columna de precios")
+        column = numeric[-1]
+    prices = pd.to_numeric(df[column], errors="coerce")
+    return pd.Series(prices.to_numpy(), index=dates).dropna().sort_index()
+
+
+def load_price_history(source, isins=None, monthly: bool = True) -> pd.DataFrame:
+    """
+    Precios históricos (filas = fechas, columnas = ISIN) de una carpeta con un CSV
+    por ISIN o de un único CSV ancho. Con monthly=True se queda con el último
+    precio de cada mes.
+    """
+    source = Path(source)
+    wanted = None if isins is None else [str(isin).strip().upper() for isin in isins]
+    if source.is_dir():
+        files = {path.stem.strip().upper(): path for path in source.glob("*.csv")}
+        keys = sorted(files) if wanted is None else wanted
+        missing = [isin for isin in keys if isin not in files]
+        if missing:
+            raise FileNotFoundError(f"No hay precios en '{source}' para: {', '.join(missing)}")
+        prices = pd.DataFrame({isin: _read_price_file(files[isin]) for isin in keys})
+    else:
+        df = pd.read_csv(source)
+        df.index = pd.to_datetime(df.iloc[:, 0], errors="coerce")
+        prices = df.iloc[:, 1:].apply(pd.to_numeric, errors="coerce")
+        prices.columns = [str(col).strip().upper() for col in prices.columns]
+        if wanted is not None:
+            missing = [isin for isin in wanted if isin not in prices.columns]
+            if missing:
+                raise KeyError(f"No hay precios en '{source}' para: {', '.join(missing)}")
+            prices = prices[wanted]
+    prices = prices[prices.index.notna()].sort_index()
+    if monthly:
+        prices = prices.groupby(prices.index.to_period("M")).last()
+        prices.index = prices.index.to_timestamp(how="end").normalize()
+    return prices
+
+
+def common_history(prices: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tramo en el que todos los activos cotizan: empieza cuando el último activo
+    tiene su primer precio y rellena los huecos con el último precio conocido.
+    """
+    first_dates = prices.apply(pd.Series.first_valid_index)
+    if first_dates.isna().any():
+        raise ValueError(f"Activos sin ningún precio: {', '.join(map(str, first_dates[first_dates.isna()].index))}")
+    return prices.loc[first_dates.max():].ffill()
+
+
+@dataclass
+class BacktestResult:
+    policies: list               # RebalancePolicy de cada fila
+    dates: pd.DatetimeIndex      # meses simulados
+    terminal_value: np.ndarray   # valor final de cada política
+    contributed: np.ndarray      # capital aportado (inicial + aportaciones)
+    turnover: np.ndarray         # € negociados en rebalanceos (compras + ventas), sin las aportaciones
+    tracking_error: np.ndarray   # error de seguimiento anualizado frente a la cartera objetivo
+    mean_deviation: np.ndarray   # media mensual de la desviación máxima respecto al objetivo (0–1)
+    rebalances: np.ndarray       # número de meses con ventas
+
+    def to_frame(self) -> pd.DataFrame:
+        df = pd.DataFrame([{f.name: getattr(p, f.name) for f in fields(RebalancePolicy)} for p in self.policies])
+        df["Aportado_€"] = self.contributed
+        df["Valor_final_€"] = self.terminal_value
+        df["Rotación_€"] = self.turnover
+        df["Tracking_error_%"] = self.tracking_error * 100
+        df["Desviación_media_pp"] = self.mean_deviation * 100
+        df["Rebalanceos"] = self.rebalances
+        return df
+
+    @classmethod
+    def concat(cls, parts: list) -> "BacktestResult":
+        """Une resultados de varios bloques de políticas (mismas fechas)."""
+        return cls(
+            policies=[p for part in parts for p in part.policies],
+            dates=parts[0].dates,
+            **{
+                name: np.concatenate([getattr(part, name) for part in parts])
+                for name in ("terminal_value", "contributed", "turnover", "tracking_error", "mean_deviation", "rebalances")
+            },
+        )
+
+
+def backtest_policies(prices, target_weights, policies, initial_value: float = 0.0, dates=None) -> BacktestResult:
+    """
+    Simula todas las políticas a la vez sobre la matriz de precios (meses × activos,
+    sin huecos; ver common_history).
+
+    El capital inicial se invierte en los pesos objetivo el primer mes. El error de
+    seguimiento es la desviación típica anualizada de la diferencia entre la
+    rentabilidad mensual de la cartera (antes de aportar) y la de la cartera
+    objetivo rebalanceada cada mes.
+    """
+    if isinstance(prices, pd.DataFrame):
+        dates = prices.index if dates is None else dates
+        prices = prices.to_numpy(dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+    if prices.ndim != 2 or prices.shape[0] < 2:
+        raise ValueError("prices debe ser una matriz meses × activos con al menos dos meses")
+    if not np.all(np.isfinite(prices) & (prices > 0)):
+        raise ValueError("prices no puede tener huecos ni precios <= 0 (ver common_history)")
+    for policy in policies:
+        if policy.rebalance not in POLICY_REBALANCES:
+            raise ValueError(f"rebalance debe ser uno de {POLICY_REBALANCES}, no {policy.rebalance!r}")
+
+    months, n = prices.shape
+    targets = np.asarray(target_weights, dtype=np.float64)
+    targets = targets / targets.sum()
+    n_policies = len(policies)
+    contribution = np.array([p.monthly_contribution for p in policies], dtype=np.float64)
+    band = np.array([p.band for p in policies], dtype=np.float64)
+    check_every = np.array([max(1, int(p.check_every)) for p in policies])
+    modes = np.array([p.rebalance for p in policies], dtype=object)
+    groups = np.repeat(np.arange(n_policies), n)
+
+    values = np.tile(targets * float(initial_value), (n_policies, 1))
+    turnover = np.zeros(n_policies)
+    rebalances = np.zeros(n_policies, dtype=np.int64)
+    deviation_sum = np.zeros(n_policies)
+    active_diff = np.zeros((months - 1, n_policies))
+    growth = prices[1:] / prices[:-1]
+
+    for t in range(months):
+        if t > 0:
+            before = values.sum(axis=1)
+            values *= growth[t - 1]
+            portfolio_return = np.where(before > 0, values.sum(axis=1) / np.where(before > 0, before, 1.0) - 1.0, 0.0)
+            active_diff[t - 1] = portfolio_return - (growth[t - 1] - 1.0) @ targets
+
+        # Aportación del mes por water-filling (como contribution_vector), todas las políticas a la vez
+        total = values.sum(axis=1) + contribution
+        gaps = targets * total[:, None] - values
+        values += grouped_waterfill(groups, gaps.ravel(), contribution).reshape(n_policies, n)
+
+        # Revisión de la banda en las políticas con ventas que toca revisar este mes
+        for mode in BAND_TARGETS:
+            rows = np.flatnonzero((modes == mode) & (t % check_every == 0))
+            if rows.size == 0:
+                continue
+            trades, _ = band_trades(values[rows], targets, band[rows], target=mode)
+            traded = np.abs(trades).sum(axis=1)
+            values[rows] += trades
+            turnover[rows] += traded
+            rebalances[rows] += traded > 1e-6
+
+        weights = values / np.maximum(values.sum(axis=1, keepdims=True), 1e-12)
+        deviation_sum += np.abs(weights - targets).max(axis=1)
+
+    return BacktestResult(
+        policies=list(policies),
+        dates=pd.DatetimeIndex(dates) if dates is not None else pd.DatetimeIndex([]),
+        terminal_value=values.sum(axis=1),
+        contributed=float(initial_value) + contribution * months,
+        turnover=turnover,
+        tracking_error=active_diff.std(axis=0) * np.sqrt(12.0),
+        mean_deviation=deviation_sum / months,
+        rebalances=rebalances,
+    )
+
+
+def _backtest_chunk(task) -> BacktestResult:
+    """Un bloque de políticas (función de módulo para poder mandarla a otro proceso)."""
+    prices, dates, targets, policies, initial_value = task
+    return backtest_policies(prices, targets, policies, initial_value, dates=dates)
+
+
+def sweep_policies(
+    prices: pd.DataFrame,
+    target_weights,
+    policies,
+    initial_value: float = 0.0,
+    workers: int | None = None,
+) -> BacktestResult:
+    """
+    Backtest de muchas políticas. A partir de POOL_MIN_POLICIES políticas y con más
+    de un proceso, se reparten en bloques entre un pool de procesos; cada bloque
+    sigue siendo vectorial.
+    """
+    policies = list(policies)
+    workers = workers or os.cpu_count() or 1
+    matrix = prices.to_numpy(dtype=np.float64)
+    if len(policies) < POOL_MIN_POLICIES or workers <= 1:
+        return backtest_policies(matrix, target_weights, policies, initial_value, dates=prices.index)
+    chunks = np.array_split(np.arange(len(policies)), workers)
+    tasks = [
+        (matrix, prices.index, target_weights, [policies[i] for i in chunk], initial_value)
+        for chunk in chunks
+        if chunk.size
+    ]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return BacktestResult.concat(list(pool.map(_backtest_chunk, tasks)))
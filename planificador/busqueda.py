@@ -0,0 +1,291 @@
+"""
+Buscador de instrumentos del universo en el servidor.
+
+En lugar de mandar las 13.500 etiquetas al navegador para que filtre el
+desplegable, se busca aquí y solo se envía una página de resultados:
+
+- Índice invertido por palabra: cada palabra normalizada (minúsculas, sin
+  acentos) de Name y Search_Key apunta a las filas que la contienen. El
+  vocabulario está ordenado y las listas de filas se guardan seguidas en ese
+  orden (formato CSR), así que todas las palabras que empiezan por lo que se ha
+  escrito son un único tramo contiguo: buscar "ishar" mientras se teclea es una
+  búsqueda binaria y un slice.
+- ISIN por prefijo: los ISIN ordenados hacen de trie aplanado; los que empiezan
+  por un prefijo son también un tramo contiguo (dos búsquedas binarias).
+
+- Palabras con erratas: las palabras de la consulta que no son el principio de
+  ninguna palabra del vocabulario ("ishres", "wrld") se buscan por aproximación.
+  Un índice de trigramas del vocabulario descarta casi todas las palabras sin
+  calcular ninguna distancia (filtro de conteo: con k ediciones se pierden como
+  mucho 4k trigramas) y la distancia de edición acotada solo se calcula con las
+  pocas que quedan.
+
+Son candidatas las filas en las que casan todas las palabras de la consulta
+(exactas o como prefijo) o, si no hay ninguna, las que casan con más palabras
+(los nombres del universo no llevan la gestora: "ishares core msci world"
+encuentra "Core MSCI World"). Se ordenan por puntuación (ISIN exacto > prefijo de ISIN > palabras
+exactas > prefijos) y, a igualdad, por nombres más cortos.
+"""
+
+import re
+import unicodedata
+from bisect import bisect_left
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+SEARCH_PAGE_SIZE = 20
+# Columnas del universo que se indexan por palabra además del nombre
+SEARCH_TEXT_COLUMNS = ("Search_Key",)
+# Carácter mayor que cualquiera de los que quedan tras normalizar: fin del tramo de un prefijo
+_PREFIX_END = "\x7f"
+_TOKEN = re.compile(r"[a-z0-9]+")
+# Solo se busca por prefijo de ISIN si la consulta lo parece (país + al menos un carácter más)
+_ISIN_PREFIX = re.compile(r"^[A-Z]{2}[A-Z0-9]{1,10}$")
+
+# Puntuaciones
+ISIN_EXACT_SCORE = 100.0
+ISIN_PREFIX_SCORE = 50.0
+TOKEN_EXACT_SCORE = 2.0
+TOKEN_PREFIX_SCORE = 1.0
+# Palabra aproximada: TOKEN_PREFIX_SCORE / (1 + distancia)
+
+# Búsqueda aproximada: longitud mínima de la palabra y distancia máxima según su longitud
+FUZZY_MIN_LENGTH = 4
+FUZZY_LONG_WORD = 6   # desde esta longitud se admiten 2 ediciones (antes, 1)
+_GRAM_PAD = "$"
+# Trigramas que puede estropear una edición (4 en una transposición)
+_GRAMS_PER_EDIT = 4
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas y sin acentos ni caracteres fuera de ASCII."""
+    return unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii").lower()
+
+
+def tokenize(text: str) -> list:
+    """Palabras (letras y números) del texto normalizado."""
+    return _TOKEN.findall(normalize_text(text))
+
+
+def trigrams(word: str) -> set:
+    """Trigramas de la palabra con un separador a cada lado ("$ab", "abc", ..., "yz$")."""
+    padded = f"{_GRAM_PAD}{word}{_GRAM_PAD}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_levenshtein(a: str, b: str, max_distance: int) -> int:
+    """
+    Distancia de edición entre a y b (inserciones, borrados, sustituciones y
+    transposiciones de dos letras seguidas, que son la errata más común), o
+    max_distance + 1 en cuanto se sabe que la supera: se deja de calcular si dos
+    filas seguidas de la tabla ya la superan.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            if before is not None and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > max_distance and min(previous) > max_distance:
+            return max_distance + 1
+        before, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+
+def _tokenize_column(values: pd.Series) -> pd.Series:
+    """tokenize() para toda una columna con las operaciones de texto de pandas."""
+    normalized = (
+        values.fillna("").astype(str).str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii").str.lower()
+    )
+    return normalized.str.findall(_TOKEN.pattern)
+
+
+@dataclass
+class SearchResult:
+    query: str
+    rows: np.ndarray    # filas del universo en esta página, de más a menos relevante
+    total: int          # resultados en todas las páginas
+    page: int           # página (desde 0)
+    page_size: int
+    corrected: tuple = ()  # palabras de la consulta buscadas por aproximación
+
+    @property
+    def pages(self) -> int:
+        return max(1, -(-self.total // self.page_size))
+
+
+class InstrumentIndex:
+    """
+    Índice de búsqueda sobre las filas del universo (alineado con su orden):
+
+    - terms: vocabulario ordenado; las filas de terms[i] son
+      term_rows[term_offsets[i]:term_offsets[i + 1]]
+    - isin_sorted / isin_rows: ISIN ordenados y la fila de cada uno
+    - labels: etiqueta de cada fila para el selector
+    - n_tokens: palabras de cada nombre (desempate: nombres más cortos antes)
+    - grams / gram_offsets / gram_terms: índice de trigramas del vocabulario, en el
+      mismo formato (las palabras con grams[i] son gram_terms[gram_offsets[i]:...])
+    """
+
+    __slots__ = (
+        "terms", "term_offsets", "term_rows", "isin_sorted", "isin_rows", "labels", "n_tokens",
+        "grams", "gram_offsets", "gram_terms", "term_lengths", "term_gram_counts",
+    )
+
+    def __init__(self, isins, names, texts=(), labels=None):
+        names = pd.Series(np.asarray(names, dtype=object))
+        isins = pd.Series(np.asarray(isins, dtype=object)).fillna("").astype(str).str.strip().str.upper()
+        n = len(names)
+        if len(isins) != n:
+            raise ValueError("isins y names deben tener la misma longitud.")
+        # Nombre y textos adicionales de cada fila (se indexan juntos)
+        text = names.fillna("").astype(str)
+        for extra in texts:
+            text = text + " " + pd.Series(np.asarray(extra, dtype=object)).fillna("").astype(str)
+
+        tokens = _tokenize_column(text)
+        lengths = tokens.str.len().to_numpy(dtype=np.int64)
+        flat = np.asarray([token for row in tokens.tolist() for token in row], dtype=str)
+        row_of = np.repeat(np.arange(n), lengths)
+        # Vocabulario ordenado y pares (palabra, fila) sin repetir, ordenados por palabra y fila
+        terms, term_ids = np.unique(flat, return_inverse=True)
+        stride = max(n, 1)
+        pair_terms, pair_rows = np.divmod(np.unique(term_ids.astype(np.int64) * stride + row_of), stride)
+        self.terms = terms.tolist()
+        self.term_offsets = np.concatenate(([0], np.cumsum(np.bincount(pair_terms, minlength=len(self.terms)))))
+        self.term_rows = pair_rows.astype(np.int64)
+        self.n_tokens = _tokenize_column(names).str.len().to_numpy(dtype=np.int64)
+
+        # Trigramas de cada palabra del vocabulario (sin repetir dentro de la palabra)
+        term_grams = [sorted(trigrams(term)) for term in self.terms]
+        self.term_lengths = np.asarray([len(term) for term in self.terms], dtype=np.int64)
+        self.term_gram_counts = np.asarray([len(g) for g in term_grams], dtype=np.int64)
+        flat_grams = np.asarray([gram for g in term_grams for gram in g], dtype=str)
+        grams, gram_ids = np.unique(flat_grams, return_inverse=True)
+        vocabulary = max(len(self.terms), 1)
+        gram_pairs = gram_ids.astype(np.int64) * vocabulary + np.repeat(np.arange(len(self.terms)), self.term_gram_counts)
+        pair_grams, pair_terms = np.divmod(np.sort(gram_pairs), vocabulary)
+        self.grams = grams.tolist()
+        self.gram_offsets = np.concatenate(([0], np.cumsum(np.bincount(pair_grams, minlength=len(self.grams)))))
+        self.gram_terms = pair_terms.astype(np.int64)
+
+        order = np.argsort(isins.to_numpy(dtype=str), kind="stable")
+        self.isin_sorted = isins.to_numpy(dtype=str)[order].tolist()
+        self.isin_rows = order.astype(np.int64)
+        if labels is None:
+            labels = (names.fillna("").astype(str) + " (" + isins + ")").tolist()
+        self.labels = np.asarray(labels, dtype=object)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, labels=None) -> "InstrumentIndex":
+        """Índice del universo (columnas ISIN, Name y las de SEARCH_TEXT_COLUMNS que haya)."""
+        texts = [df[col].astype(object) for col in SEARCH_TEXT_COLUMNS if col in df.columns]
+        return cls(df["ISIN"], df["Name"], texts, labels=labels)
+
+    def __len__(self) -> int:
+        return self.labels.shape[0]
+
+    def __repr__(self) -> str:
+        return f"InstrumentIndex(rows={len(self)}, terms={len(self.terms)})"
+
+    def _term_range(self, token: str) -> tuple:
+        """Tramo [lo, hi) del vocabulario con las palabras que empiezan por `token`."""
+        return bisect_left(self.terms, token), bisect_left(self.terms, token + _PREFIX_END)
+
+    def _isin_range(self, prefix: str) -> tuple:
+        return bisect_left(self.isin_sorted, prefix), bisect_left(self.isin_sorted, prefix + _PREFIX_END)
+
+    def fuzzy_terms(self, word: str, max_distance: int | None = None) -> list:
+        """
+        Palabras del vocabulario a distancia de edición <= max_distance de `word`,
+        como pares (índice en terms, distancia) de más a menos parecida. Por defecto,
+        1 edición y 2 desde FUZZY_LONG_WORD letras.
+        """
+        if max_distance is None:
+            max_distance = 2 if len(word) >= FUZZY_LONG_WORD else 1
+        grams = trigrams(word)
+        slices = []
+        for gram in grams:
+            i = bisect_left(self.grams, gram)
+            if i < len(self.grams) and self.grams[i] == gram:
+                slices.append(self.gram_terms[self.gram_offsets[i]:self.gram_offsets[i + 1]])
+        if not slices:
+            return []
+        shared = np.bincount(np.concatenate(slices), minlength=len(self.terms))
+        # Filtro de conteo y de longitud: solo las que pueden estar a <= max_distance ediciones
+        # (cada edición estropea como mucho _GRAMS_PER_EDIT trigramas; las palabras sin
+        # ningún trigrama en común no se consideran)
+        needed = np.maximum(np.maximum(len(grams), self.term_gram_counts) - _GRAMS_PER_EDIT * max_distance, 1)
+        candidates = np.flatnonzero(
+            (shared >= needed) & (np.abs(self.term_lengths - len(word)) <= max_distance)
+        )
+        found = []
+        for term_id in candidates.tolist():
+            distance = bounded_levenshtein(word, self.terms[term_id], max_distance)
+            if distance <= max_distance:
+                found.append((term_id, distance))
+        return sorted(found, key=lambda pair: (pair[1], pair[0]))
+
+    def scores(self, query: str) -> np.ndarray:
+        """Puntuación de cada fila para la consulta (0 = no casa)."""
+        return self._scores(query)[0]
+
+    def _scores(self, query: str) -> tuple:
+        n = len(self)
+        score = np.zeros(n)
+        corrected = []
+        tokens = tokenize(query)
+        if tokens:
+            matched = np.zeros(n, dtype=np.int64)
+            for token in dict.fromkeys(tokens):
+                lo, hi = self._term_range(token)
+                hits = np.zeros(n)
+                hits[self.term_rows[self.term_offsets[lo]:self.term_offsets[hi]]] = TOKEN_PREFIX_SCORE
+                if lo < hi and self.terms[lo] == token:
+                    # El vocabulario está ordenado: si la palabra exacta existe es la primera del tramo
+                    hits[self.term_rows[self.term_offsets[lo]:self.term_offsets[lo + 1]]] = TOKEN_EXACT_SCORE
+                elif lo == hi and len(token) >= FUZZY_MIN_LENGTH:
+                    # Ninguna palabra empieza así: probablemente una errata
+                    for term_id, distance in self.fuzzy_terms(token):
+                        rows = self.term_rows[self.term_offsets[term_id]:self.term_offsets[term_id + 1]]
+                        hits[rows] = np.maximum(hits[rows], TOKEN_PREFIX_SCORE / (1 + distance))
+                    if hits.any():
+                        corrected.append(token)
+                matched += hits > 0
+                score += hits
+            # Las que casan con todas las palabras o, si no hay, con el mayor número de ellas
+            score *= matched == matched.max()
+
+        compact = re.sub(r"\s+", "", str(query)).upper()
+        if _ISIN_PREFIX.match(compact):
+            lo, hi = self._isin_range(compact)
+            rows = self.isin_rows[lo:hi]
+            isin_score = np.where(
+                np.asarray(self.isin_sorted[lo:hi], dtype=object) == compact, ISIN_EXACT_SCORE, ISIN_PREFIX_SCORE
+            )
+            score[rows] = np.maximum(score[rows], isin_score)
+        return score, tuple(corrected)
+
+    def search(self, query: str, page: int = 0, page_size: int = SEARCH_PAGE_SIZE) -> SearchResult:
+        """Una página de resultados ordenados por relevancia (vacía si la consulta no tiene texto)."""
+        page_size = max(1, int(page_size))
+        score, corrected = self._scores(query)
+        rows = np.flatnonzero(score > 0)
+        # Más puntuación primero; a igualdad, nombres con menos palabras y luego orden del universo
+        ranked = rows[np.lexsort((rows, self.n_tokens[rows], -score[rows]))]
+        pages = max(1, -(-ranked.size // page_size))
+        page = min(max(0, int(page)), pages - 1)
+        return SearchResult(
+            query=query,
+            rows=ranked[page * page_size:(page + 1) * page_size],
+            total=int(ranked.size),
+            page=page,
+            page_size=page_size,
+            corrected=corrected,
+        )
@@ -0,0 +1,176 @@
+"""
+Caché de memoización compartida por todo el proceso para los cálculos de planificación.
+
+Streamlit vuelve a ejecutar app.py en cada interacción, pero los módulos importados
+se conservan: una caché a nivel de módulo sobrevive a los reruns y se comparte entre
+todas las sesiones (y con las funciones de rebalance_marcos si se usan en el mismo
+proceso). Las claves se construyen con las entradas normalizadas y redondeadas, de
+modo que 150, 150.0 y 150.0000000001 reutilizan el mismo resultado.
+"""
+
+import functools
+import inspect
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+_MISSING = object()
+
+# Decimales con los que se redondean los floats al construir la clave
+DEFAULT_DIGITS = 6
+
+
+def normalize_key(value, digits: int = DEFAULT_DIGITS):
+    """Convierte un argumento en una clave hashable y estable (floats redondeados)."""
+    if value is None or isinstance(value, (bool, str, np.bool_)):
+        return value
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return round(float(value), digits)
+    if isinstance(value, np.ndarray):
+        return ("ndarray", value.shape, np.round(value.astype(float), digits).tobytes())
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), normalize_key(v, digits)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize_key(v, digits) for v in value)
+    return repr(value)
+
+
+class MemoCache:
+    """
+    Caché LRU acotada en número de entradas, segura entre hilos (Streamlit atiende
+    cada sesión en su propio hilo) y con contadores de aciertos/fallos.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        if maxsize <= 0:
+            raise ValueError("maxsize debe ser > 0")
+        self.maxsize = int(maxsize)
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key, default=_MISSING):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, namespace: str | None = None) -> int:
+        """
+        Borra las entradas de un espacio de nombres (una función memoizada) o toda la
+        caché si namespace es None. Devuelve cuántas entradas se han eliminado.
+        """
+        with self._lock:
+            if namespace is None:
+                removed = len(self._data)
+                self._data.clear()
+                return removed
+            keys = [k for k in self._data if k[0] == namespace]
+            for k in keys:
+                del self._data[k]
+            return len(keys)
+
+    def stats(self) -> dict:
+        """Tamaño, aciertos, fallos, expulsiones y tasa de aciertos de la caché."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+# Caché única del proceso para todos los cálculos de planificación
+PLANNING_CACHE = MemoCache(maxsize=4096)
+
+
+def invalidate_planning_cache(namespace: str | None = None) -> int:
+    """Hook de invalidación explícita (p. ej. si cambian los tramos fiscales)."""
+    return PLANNING_CACHE.invalidate(namespace)
+
+
+def _copy_result(value, readonly: bool = False):
+    """
+    Copia de un resultado memoizado: arrays, listas, tuplas y diccionarios se copian
+    (recursivamente) y, con readonly=True, los arrays de la copia se marcan como no
+    escribibles. El resto de valores se comparte tal cual (deben ser inmutables).
+    """
+    if isinstance(value, np.ndarray):
+        value = value.copy()
+        if readonly:
+            value.setflags(write=False)
+        return value
+    if type(value) is list:
+        return [_copy_result(v, readonly) for v in value]
+    if type(value) is tuple:
+        return tuple(_copy_result(v, readonly) for v in value)
+    if type(value) is dict:
+        return {k: _copy_result(v, readonly) for k, v in value.items()}
+    return value
+
+
+def memoize(namespace: str | None = None, cache: MemoCache = PLANNING_CACHE, digits: int = DEFAULT_DIGITS):
+    """
+    Decorador que memoiza una función pura en `cache`.
+
+    La clave es (namespace, argumentos normalizados), con los argumentos por defecto
+    ya aplicados para que las llamadas posicionales y por nombre coincidan. Conviene
+    dar un `namespace` explícito a las funciones definidas en app.py, que Streamlit
+    redefine en cada rerun bajo el módulo '__main__'.
+
+    Los floats de la clave se redondean a `digits` decimales (DEFAULT_DIGITS = 6,
+    también dentro de los arrays): dos llamadas que solo difieren a partir del
+    sexto decimal comparten resultado. La función debe ser insensible a esas
+    diferencias (importes en euros, tipos en tanto por uno).
+
+    La caché guarda su propia copia del resultado (con los arrays de solo lectura)
+    y cada acierto devuelve una copia nueva de arrays, listas y diccionarios: quien
+    llama puede modificar lo que recibe sin alterar la entrada cacheada, y el
+    resultado conserva sus tipos (list, dict, ndarray). Los arrays que devuelve la
+    función en un fallo no se tocan.
+    """
+
+    def decorator(fn):
+        name = namespace or f"{fn.__module__}.{fn.__qualname__}"
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (name, normalize_key(tuple(bound.arguments.items()), digits))
+            cached = cache.get(key)
+            if cached is _MISSING:
+                result = fn(*args, **kwargs)
+                cache.put(key, _copy_result(result, readonly=True))
+                return result
+            return _copy_result(cached)
+
+        wrapper.cache_namespace = name
+        wrapper.cache_invalidate = lambda: cache.invalidate(name)
+        return wrapper
+
+    return decorator
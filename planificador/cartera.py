@@ -0,0 +1,261 @@
+"""
+Cartera y reparto de la aportación mensual entre sus activos.
+
+Versión única para la app y para rebalance_marcos.py. La cartera guarda arrays de
+NumPy alineados (un elemento por activo) y un índice nombre → posición, de modo que
+valor total, pesos y reparto se calculan con operaciones vectoriales incluso con
+miles de líneas.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class Portfolio:
+    """
+    Cartera respaldada por arrays alineados:
+
+    - names: nombre de cada activo (únicos)
+    - values: valor actual en € de cada activo
+    - target_weights: peso objetivo (0–1) de cada activo, sumando ~1
+    - types: tipo de activo (acción, ETF, bono, cripto...), "" si no se conoce
+    - index: diccionario {nombre: posición en los arrays}
+
+    Se puede construir con diccionarios (Portfolio(holdings, targets, asset_types)),
+    directamente con arrays (from_arrays) o con las columnas de un DataFrame
+    (from_frame), sin recorrer filas.
+    """
+
+    __slots__ = ("names", "values", "target_weights", "types", "index")
+
+    def __init__(self, holdings: dict, targets: dict, asset_types: dict | None = None):
+        unknown = set(targets) - set(holdings)
+        if unknown:
+            raise ValueError(f"Hay pesos objetivo para activos que no están en la cartera: {sorted(unknown)}")
+        asset_types = asset_types or {}
+        names = list(holdings)
+        self._assign(
+            names,
+            [float(holdings[a]) for a in names],
+            [float(targets.get(a, 0.0)) for a in names],
+            [asset_types.get(a, "") for a in names],
+        )
+
+    def _assign(self, names, values, target_weights, types) -> None:
+        self.names = np.asarray(names, dtype=object)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.target_weights = np.asarray(target_weights, dtype=np.float64)
+        self.types = np.asarray(types, dtype=object)
+        n = self.names.shape[0]
+        if not (self.values.shape == self.target_weights.shape == self.types.shape == (n,)):
+            raise ValueError("names, values, target_weights y types deben tener la misma longitud.")
+        self.index = {name: i for i, name in enumerate(self.names.tolist())}
+        if len(self.index) != n:
+            raise ValueError("Los nombres de los activos deben ser únicos.")
+
+    @classmethod
+    def from_arrays(cls, names, values, target_weights, types=None) -> "Portfolio":
+        """Cartera a partir de arrays (o listas) ya alineados."""
+        portfolio = cls.__new__(cls)
+        if types is None:
+            types = np.full(len(names), "", dtype=object)
+        portfolio._assign(names, values, target_weights, types)
+        return portfolio
+
+    @classmethod
+    def from_frame(
+        cls,
+        df: pd.DataFrame,
+        name_col: str = "Activo",
+        value_col: str = "Valor_actual_€",
+        target_col: str = "Peso_objetivo_%",
+        type_col: str | None = "Tipo",
+        target_scale: float = 0.01,
+    ) -> "Portfolio":
+        """
+        Cartera a partir de las columnas de un DataFrame (la tabla de la pestaña 1).
+
+        Los pesos se multiplican por `target_scale` (por defecto la columna está en %).
+        Las celdas vacías o no numéricas cuentan como 0. Si un nombre se repite, se
+        queda con los datos de su última fila en la posición de la primera, igual
+        que al rellenar un diccionario fila a fila.
+        """
+        names = df[name_col].astype(str).str.strip()
+        if names.duplicated().any():
+            keep = pd.Series(np.arange(len(df))).groupby(names.to_numpy(), sort=False).last().to_numpy()
+        else:
+            keep = slice(None)
+        values = pd.to_numeric(df[value_col], errors="coerce").fillna(0.0).to_numpy(dtype=np.float64)
+        targets = pd.to_numeric(df[target_col], errors="coerce").fillna(0.0).to_numpy(dtype=np.float64) * target_scale
+        if type_col is not None and type_col in df:
+            types = df[type_col].astype(str).str.strip().to_numpy(dtype=object)
+        else:
+            types = np.full(len(df), "", dtype=object)
+        return cls.from_arrays(names.to_numpy(dtype=object)[keep], values[keep], targets[keep], types[keep])
+
+    def __len__(self) -> int:
+        return self.names.shape[0]
+
+    def __repr__(self) -> str:
+        return f"Portfolio(assets={len(self)}, total={self.total_value():,.2f})"
+
+    @property
+    def holdings(self) -> dict:
+        """Diccionario {activo: valor_actual_€} (se construye al pedirlo)."""
+        return dict(zip(self.names.tolist(), self.values.tolist()))
+
+    @property
+    def targets(self) -> dict:
+        """Diccionario {activo: peso_objetivo} (se construye al pedirlo)."""
+        return dict(zip(self.names.tolist(), self.target_weights.tolist()))
+
+    @property
+    def asset_types(self) -> dict:
+        """Diccionario {activo: tipo} (se construye al pedirlo)."""
+        return dict(zip(self.names.tolist(), self.types.tolist()))
+
+    def total_value(self) -> float:
+        """Valor total actual de la cartera."""
+        return float(self.values.sum())
+
+    def current_weights(self) -> np.ndarray:
+        """Pesos actuales (0–1) de cada activo, alineados con `names`."""
+        total = self.total_value()
+        if total <= 0:
+            return np.zeros_like(self.values)
+        return self.values / total
+
+    def normalized(self) -> "Portfolio":
+        """Copia con los pesos objetivo reescalados para que sumen 1 (si suman algo > 0)."""
+        total = self.target_weights.sum()
+        weights = self.target_weights / total if total > 0 else self.target_weights
+        return Portfolio.from_arrays(self.names, self.values, weights, self.types)
+
+
+CONTRIBUTION_METHODS = ("waterfill", "proportional")
+
+
+def waterfill_allocation(gaps: np.ndarray, budget: float) -> np.ndarray:
+    """
+    Reparto óptimo de `budget` >= 0 entre activos con desfase `gaps` (€ que le faltan
+    a cada uno para su peso objetivo) sin ventas: minimiza Σ (gap_i - x_i)^2 con
+    x_i >= 0 y Σ x_i = budget.
+
+    La solución es x_i = max(0, gap_i - μ): se llena primero el activo más
+    infraponderado hasta igualarlo con el siguiente, y así sucesivamente, hasta un
+    nivel común μ. Con los desfases ordenados de mayor a menor, si se llenan los k
+    primeros μ = (Σ_(j<=k) gap_j - budget) / k, y k es el mayor índice con gap_k > μ.
+    O(n log n) por la ordenación.
+    """
+    gaps = np.asarray(gaps, dtype=np.float64)
+    if gaps.size == 0 or budget <= 0:
+        return np.zeros_like(gaps)
+    ordered = np.sort(gaps)[::-1]
+    counts = np.arange(1, ordered.size + 1)
+    levels = (np.cumsum(ordered) - budget) / counts
+    # La condición gap_k > μ_k se cumple en un prefijo: k = número de posiciones que la cumplen
+    k = max(int(np.count_nonzero(ordered > levels)), 1)
+    return np.maximum(0.0, gaps - levels[k - 1])
+
+
+def grouped_waterfill(groups: np.ndarray, gaps: np.ndarray, budgets: np.ndarray) -> np.ndarray:
+    """
+    Water-filling independiente dentro de cada grupo (ver waterfill_allocation):
+    el grupo g reparte budgets[g] entre sus elementos, x_i = max(0, gap_i - μ_g).
+    Todos los grupos a la vez, con una ordenación y sumas acumuladas por grupo.
+    """
+    groups = np.asarray(groups, dtype=np.int64)
+    gaps = np.asarray(gaps, dtype=np.float64)
+    budgets = np.asarray(budgets, dtype=np.float64)
+    if gaps.size == 0:
+        return np.zeros(0)
+    order = np.lexsort((-gaps, groups))
+    g, ordered = groups[order], gaps[order]
+    starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+    lengths = np.diff(np.r_[starts, g.size])
+    rank = np.arange(g.size) - np.repeat(starts, lengths)
+    cumulative = np.cumsum(ordered)
+    cumulative -= np.repeat(cumulative[starts] - ordered[starts], lengths)
+    levels = (cumulative - budgets[g]) / (rank + 1)
+    # Como en waterfill_allocation, la condición gap > μ se cumple en un prefijo de cada grupo
+    filled = np.maximum(np.add.reduceat((ordered > levels).astype(np.int64), starts), 1)
+    mu = np.empty(budgets.shape[0])
+    mu[g[starts]] = levels[starts + filled - 1]
+    result = np.maximum(0.0, gaps - mu[groups])
+    return np.where(budgets[groups] > 0, result, 0.0)
+
+
+def contribution_vector(
+    portfolio: Portfolio,
+    monthly_contribution: float,
+    method: str = "waterfill",
+) -> np.ndarray:
+    """
+    Aportación a cada activo (array alineado con portfolio.names), ver
+    compute_contribution_plan.
+    """
+    if method not in CONTRIBUTION_METHODS:
+        raise ValueError(f"method debe ser uno de {CONTRIBUTION_METHODS}, no {method!r}")
+    n = len(portfolio)
+    C = float(monthly_contribution)
+
+    if C <= 0 or n == 0:
+        contribs = np.zeros(n)
+    else:
+        holdings = portfolio.values
+        targets = portfolio.target_weights
+        total1 = max(0.0, holdings.sum()) + C
+        sum_targets = targets.sum()
+
+        # Reparto del dinero que no hace falta para cubrir los "ideales"
+        if sum_targets > 0:
+            spread = targets / sum_targets
+        else:
+            spread = np.full(n, 1.0 / n)
+
+        if method == "waterfill":
+            # Mismo nivel de desviación final (en €) para todos los activos que reciben dinero
+            contribs = waterfill_allocation(spread * total1 - holdings, C)
+        else:
+            # 1) Contribuciones "ideales" para acabar justo en los pesos objetivo (nunca vendemos)
+            raw = np.maximum(0.0, targets * total1 - holdings)
+            sum_raw = raw.sum()
+
+            if sum_raw <= 0:
+                # Caso límite: nadie está claramente infraponderado
+                contribs = C * spread
+            elif sum_raw >= C:
+                # 2) Si la suma de "ideales" excede la aportación, escalamos todo
+                contribs = raw * (C / sum_raw)
+            else:
+                # 3) Si nos sobra aportación, repartimos el sobrante según los pesos objetivo
+                contribs = raw + (C - sum_raw) * spread
+
+    return contribs
+
+
+def compute_contribution_plan(
+    portfolio: Portfolio,
+    monthly_contribution: float,
+    rebalance_threshold: float = 0.0,
+    method: str = "waterfill",
+) -> dict:
+    """
+    Reparte la aportación mensual entre los activos de forma que:
+    - Se intente acercar cada activo a su peso objetivo tras la aportación.
+    - Nunca se venden activos (solo compras, contribuciones >= 0).
+
+    method="waterfill" (por defecto) da el reparto que minimiza la desviación
+    cuadrática respecto a los pesos objetivo tras la aportación (ver
+    waterfill_allocation). method="proportional" es el reparto anterior: cubre los
+    "ideales" de cada activo infraponderado escalándolos en proporción si no llega.
+
+    rebalance_threshold se mantiene en la firma por compatibilidad, pero no se usa
+    dentro de esta función (el umbral se aplica luego en la lógica de ventas opcionales).
+
+    Devuelve un diccionario {activo: €}; contribution_vector da el mismo reparto
+    como array alineado con portfolio.names, y ordenes.plan_orders lo convierte en
+    órdenes ejecutables (euros enteros, mínimos por orden, acciones y lotes).
+    """
+    contribs = contribution_vector(portfolio, monthly_contribution, method=method)
+    return dict(zip(portfolio.names.tolist(), contribs.tolist()))
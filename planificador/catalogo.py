@@ -0,0 +1,94 @@
+"""
+Catálogo de activos del selector de la pestaña 1 (activos personalizados +
+universo), indexado por ISIN.
+
+El selector tiene unas 13.500 opciones y Streamlit llama a format_func una vez
+por opción en cada rerun: buscar cada ISIN filtrando la tabla es O(n) por
+opción, O(n²) en total. AssetCatalog guarda las columnas en arrays, un
+diccionario ISIN → fila y las etiquetas "Nombre (ISIN)" ya construidas, de modo
+que formatear una opción o recuperar la fila elegida es O(1). Se construye una
+vez por proceso (la app lo guarda con st.cache_resource) y es de solo lectura.
+La búsqueda por nombre o ISIN (con erratas) usa un InstrumentIndex del catálogo,
+que se construye junto con él: así el objeto compartido no cambia después.
+"""
+
+import numpy as np
+import pandas as pd
+
+from planificador.busqueda import InstrumentIndex, SearchResult
+
+CATALOG_COLUMNS = ("Nombre", "ISIN", "Tipo")
+# Resultados que se enseñan en el selector al buscar
+CATALOG_SEARCH_SIZE = 50
+
+
+def _readonly(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
+
+
+class AssetCatalog:
+    """
+    Activos del catálogo en arrays alineados por fila:
+
+    - isins, names, types: ISIN, nombre y tipo normalizado de cada activo
+    - labels: etiqueta del selector, "Nombre (ISIN)"
+    - search_index: InstrumentIndex sobre ISIN y nombre, para search
+
+    Si un ISIN aparece varias veces se queda la primera fila (los personalizados
+    van antes que el universo).
+    """
+
+    __slots__ = ("isins", "names", "types", "labels", "_index", "search_index")
+
+    def __init__(self, isins, names, types):
+        self.isins = _readonly(np.asarray(isins, dtype=object))
+        self.names = _readonly(np.asarray(names, dtype=object))
+        self.types = _readonly(np.asarray(types, dtype=object))
+        if not (self.isins.shape == self.names.shape == self.types.shape):
+            raise ValueError("isins, names y types deben tener la misma longitud.")
+        self.labels = _readonly(
+            (pd.Series(self.names).astype(str) + " (" + pd.Series(self.isins).astype(str) + ")").to_numpy(dtype=object)
+        )
+        # Recorrido al revés: en los duplicados gana la primera aparición
+        self._index = {isin: i for i, isin in reversed(list(enumerate(self.isins.tolist())))}
+        self.search_index = InstrumentIndex(self.isins, self.names, labels=self.labels)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "AssetCatalog":
+        """Catálogo a partir de una tabla con columnas Nombre, ISIN y Tipo."""
+        return cls(df["ISIN"].tolist(), df["Nombre"].tolist(), df["Tipo"].fillna("").tolist())
+
+    def __len__(self) -> int:
+        return self.isins.shape[0]
+
+    def __contains__(self, isin) -> bool:
+        return isin in self._index
+
+    def __repr__(self) -> str:
+        return f"AssetCatalog(assets={len(self)})"
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    def position(self, isin: str) -> int:
+        """Fila del ISIN en el catálogo (-1 si no está)."""
+        return self._index.get(isin, -1)
+
+    def label(self, isin: str) -> str:
+        """Etiqueta "Nombre (ISIN)" del selector; el propio ISIN si no está en el catálogo."""
+        i = self._index.get(isin)
+        return isin if i is None else self.labels[i]
+
+    def row(self, isin: str) -> dict:
+        """Nombre, ISIN y tipo del activo (KeyError si no está en el catálogo)."""
+        i = self._index[isin]
+        return {"Nombre": self.names[i], "ISIN": self.isins[i], "Tipo": self.types[i]}
+
+    def search(self, query: str, page: int = 0, page_size: int = CATALOG_SEARCH_SIZE) -> SearchResult:
+        """Activos que casan con la búsqueda, por relevancia (ver busqueda.InstrumentIndex)."""
+        return self.search_index.search(query, page=page, page_size=page_size)
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({"Nombre": self.names, "ISIN": self.isins, "Tipo": self.types})
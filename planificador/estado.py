@@ -0,0 +1,139 @@
+"""
+Estado precalculado de la cartera de la pestaña 1.
+
+Streamlit vuelve a ejecutar toda la pestaña en cada interacción, aunque solo se
+haya movido la aportación mensual o el umbral. PortfolioState agrupa todo lo que
+depende únicamente de la tabla de activos (cartera normalizada, valor total,
+pesos actuales y objetivo) y se guarda, con la huella de esa tabla como clave,
+en una caché pequeña propia (STATE_CACHE), aparte de PLANNING_CACHE para que los
+estados y los resultados escalares no se expulsen entre sí. Mientras la tabla no
+cambie, cada rerun solo rehace el último paso (reparto de la aportación y
+escenario con ventas), que además se memoiza dentro del estado por aportación y
+umbral.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from planificador.cache import MemoCache
+from planificador.cartera import Portfolio, contribution_vector
+from planificador.rebalanceo import RebalanceResult, rebalance_to_band
+
+STATE_NAMESPACE = "planificador.estado"
+STATE_COLUMNS = ("Activo", "Valor_actual_€", "Peso_objetivo_%", "Tipo")
+# Resultados del último paso que guarda cada estado (aportaciones/umbrales distintos)
+STATE_RESULTS_MAXSIZE = 32
+# Estados que se guardan a la vez (tablas distintas, de todas las sesiones)
+STATE_CACHE_MAXSIZE = 64
+
+STATE_CACHE = MemoCache(maxsize=STATE_CACHE_MAXSIZE)
+
+
+def state_key(df: pd.DataFrame, columns=STATE_COLUMNS) -> str:
+    """Huella de las columnas de la tabla que definen la cartera (posiciones y objetivos)."""
+    present = [col for col in columns if col in df.columns]
+    hashes = pd.util.hash_pandas_object(df[present], index=False).to_numpy()
+    digest = hashlib.blake2b(hashes.tobytes(), digest_size=16)
+    digest.update("|".join(present).encode())
+    return digest.hexdigest()
+
+
+def _readonly(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
+
+
+class PortfolioState:
+    """
+    Cartera de la tabla con sus vectores precalculados:
+
+    - portfolio: cartera con los pesos objetivo ya normalizados si no sumaban ~100%
+    - target_sum: suma de los pesos objetivo de la tabla (0 = no se puede planificar)
+    - was_normalized: si se han reescalado los pesos objetivo
+    - total, current_weights: valor total y pesos actuales
+
+    Los arrays son de solo lectura: el estado se comparte entre reruns y sesiones.
+    """
+
+    __slots__ = ("key", "portfolio", "target_sum", "was_normalized", "total", "current_weights", "_results", "_lock")
+
+    def __init__(self, portfolio: Portfolio, key: str = ""):
+        self.key = key
+        self.target_sum = float(portfolio.target_weights.sum())
+        self.was_normalized = self.target_sum > 0 and abs(self.target_sum - 1.0) > 0.01
+        if self.was_normalized:
+            portfolio = portfolio.normalized()
+        for array in (portfolio.values, portfolio.target_weights, portfolio.names, portfolio.types):
+            _readonly(array)
+        self.portfolio = portfolio
+        self.total = portfolio.total_value()
+        self.current_weights = _readonly(portfolio.current_weights())
+        self._results: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"PortfolioState(key={self.key[:8]!r}, assets={len(self.portfolio)}, total={self.total:,.2f})"
+
+    def _memo(self, key, compute):
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+        result = compute()
+        with self._lock:
+            self._results[key] = result
+            while len(self._results) > STATE_RESULTS_MAXSIZE:
+                self._results.popitem(last=False)
+        return result
+
+    def contribution(self, monthly_contribution: float) -> np.ndarray:
+        """Reparto de la aportación (ver cartera.contribution_vector)."""
+        monthly_contribution = round(float(monthly_contribution), 6)
+        return self._memo(
+            ("contribution", monthly_contribution),
+            lambda: _readonly(contribution_vector(self.portfolio, monthly_contribution)),
+        )
+
+    def after_contribution(self, monthly_contribution: float) -> tuple:
+        """Total, valores y pesos de cada activo tras aplicar el reparto de la aportación."""
+        monthly_contribution = round(float(monthly_contribution), 6)
+
+        def compute():
+            total = self.total + monthly_contribution
+            values = self.portfolio.values + self.contribution(monthly_contribution)
+            weights = values / total if total > 0 else np.zeros_like(values)
+            return total, _readonly(values), _readonly(weights)
+
+        return self._memo(("after", monthly_contribution), compute)
+
+    def band_rebalance(self, monthly_contribution: float, band: float, target: str = "edge") -> RebalanceResult:
+        """Escenario con ventas (ver rebalanceo.rebalance_to_band) tras aplicar la aportación."""
+        monthly_contribution = round(float(monthly_contribution), 6)
+        band = round(float(band), 9)
+        return self._memo(
+            ("band", monthly_contribution, band, target),
+            lambda: rebalance_to_band(
+                self.after_contribution(monthly_contribution)[1],
+                self.portfolio.target_weights,
+                band,
+                target=target,
+                names=self.portfolio.names,
+            ),
+        )
+
+
+def portfolio_state(df: pd.DataFrame, cache: MemoCache = STATE_CACHE) -> PortfolioState:
+    """
+    Estado de la cartera de la tabla `df` (columnas de la pestaña 1), reutilizando
+    el de la caché si la tabla no ha cambiado desde el rerun anterior.
+    """
+    key = state_key(df)
+    state = cache.get((STATE_NAMESPACE, key), None)
+    if state is None:
+        state = PortfolioState(Portfolio.from_frame(df), key=key)
+        cache.put((STATE_NAMESPACE, key), state)
+    return state
@@ -0,0 +1,83 @@
+"""
+Fiscalidad simplificada (España) sobre plusvalías al vender.
+
+Tramos de la base del ahorro aplicados a toda la ganancia de golpe. Es una
+aproximación educativa, igual que el resto de cálculos de la app.
+"""
+
+import numpy as np
+
+# (límite superior del tramo sobre la plusvalía acumulada, tipo marginal)
+CAPITAL_GAINS_BRACKETS = (
+    (6000.0, 0.19),
+    (50000.0, 0.21),
+    (200000.0, 0.23),
+    (float("inf"), 0.26),
+)
+
+
+def flat_rate_brackets(rate: float):
+    """Tabla de tramos equivalente a un tipo fijo sobre toda la plusvalía."""
+    return ((float("inf"), float(rate)),)
+
+
+# Sin impuestos: el objetivo neto coincide con el bruto
+NO_TAX_BRACKETS = flat_rate_brackets(0.0)
+
+
+# Tramos IRPF aproximados sobre la base general (ejemplo genérico España, puede variar por CCAA)
+INCOME_TAX_BRACKETS = (
+    (12450.0, 0.19),
+    (20200.0, 0.24),
+    (35200.0, 0.30),
+    (60000.0, 0.37),
+    (300000.0, 0.45),
+    (float("inf"), 0.47),
+)
+
+# Cotización del trabajador a la Seguridad Social (~6.35%) y base máxima anual aproximada:
+# por encima de esta cantidad, no aumentan las cotizaciones del trabajador
+SOCIAL_SECURITY_RATE = 0.0635
+SOCIAL_SECURITY_MAX_BASE = 60000.0
+
+
+def progressive_tax(gain, brackets=CAPITAL_GAINS_BRACKETS):
+    """
+    Impuesto progresivo sobre una plusvalía (o un array de plusvalías).
+
+    Las ganancias negativas no tributan. Devuelve un array con la misma forma
+    que la entrada (un escalar 0-d si se pasa un número).
+    """
+    gain = np.maximum(np.asarray(gain, dtype=float), 0.0)
+    tax = np.zeros_like(gain)
+    prev = 0.0
+    for limit, rate in brackets:
+        tax += rate * np.clip(gain - prev, 0.0, limit - prev)
+        prev = limit
+    return tax
+
+
+def compute_salary_net(gross_annual):
+    """
+    Cálculo aproximado de sueldo NETO a partir de BRUTO anual en España.
+
+    - Aplica una cotización de Seguridad Social del trabajador ~6.35% sobre el bruto,
+      con un tope de base anual aproximado (por encima de esa base la cuota ya no aumenta).
+    - Sobre la base después de SS aplica tramos de IRPF aproximados (tipo combinado estatal + autonómico).
+    - NO tiene en cuenta mínimos personales/familiares ni deducciones específicas,
+      así que es una estimación orientativa, no una simulación fiscal exacta.
+
+    Acepta un número o un array de sueldos brutos y devuelve (neto, cotización SS,
+    IRPF, retención total efectiva), como floats o como arrays de la misma forma.
+    Los brutos <= 0 dan todo 0.
+    """
+    gross = np.asarray(gross_annual, dtype=float)
+    positive = gross > 0
+    ss_contrib = np.where(positive, np.minimum(gross, SOCIAL_SECURITY_MAX_BASE) * SOCIAL_SECURITY_RATE, 0.0)
+    # Base para IRPF (simplificada: bruto - SS)
+    irpf = progressive_tax(np.where(positive, gross - ss_contrib, 0.0), INCOME_TAX_BRACKETS)
+    net = np.where(positive, gross - ss_contrib - irpf, 0.0)
+    effective_rate = np.where(positive, 1.0 - net / np.where(positive, gross, 1.0), 0.0)
+    if gross.ndim == 0:
+        return float(net), float(ss_contrib), float(irpf), float(effective_rate)
+    return net, ss_contrib, irpf, effective_rate
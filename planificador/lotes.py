@@ -0,0 +1,287 @@
+"""
+Registro de lotes de compra (FIFO) y coste fiscal de las ventas.
+
+En España las ventas de valores homogéneos se imputan por FIFO: se venden primero
+las participaciones compradas antes. El registro guarda todos los lotes en arrays
+columnares (activo, fecha, unidades, coste) ordenados por activo y fecha, con un
+desplazamiento por activo y sumas acumuladas de unidades y coste. Así la base de
+coste de cualquier venta se obtiene con una búsqueda binaria sobre los acumulados,
+sin recorrer los lotes: años de compras mensuales de cientos de activos se
+resuelven en milisegundos.
+
+El valor actual de cada posición se reparte entre sus unidades (precio = valor /
+unidades), de modo que basta con la tabla de la pestaña 1 y el histórico de
+compras; no hace falta introducir precios.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from planificador.fiscalidad import CAPITAL_GAINS_BRACKETS, progressive_tax
+from planificador.rebalanceo import RebalanceResult, band_edges, rebalance_to_band
+
+LOT_COLUMNS = ("Activo", "Fecha", "Unidades", "Coste_€")
+
+
+class LotLedger:
+    """
+    Lotes de compra en formato columnar:
+
+    - names: activos del registro (únicos) e index {nombre: posición}
+    - dates: fecha de compra de cada lote (datetime64[D])
+    - units: unidades compradas en cada lote
+    - costs: coste total en € de cada lote (con comisiones)
+    - offsets: los lotes del activo i son [offsets[i], offsets[i + 1]), en orden FIFO
+    """
+
+    __slots__ = ("names", "index", "dates", "units", "costs", "offsets", "_cum_units", "_cum_costs")
+
+    def __init__(self, assets, dates, units, costs):
+        assets = pd.Series(assets, dtype=object).astype(str).str.strip().to_numpy(dtype=object)
+        dates = pd.to_datetime(pd.Series(dates), errors="coerce").to_numpy(dtype="datetime64[D]")
+        units = np.asarray(units, dtype=np.float64)
+        costs = np.asarray(costs, dtype=np.float64)
+        if not (assets.shape == dates.shape == units.shape == costs.shape):
+            raise ValueError("assets, dates, units y costs deben tener la misma longitud.")
+        # Los lotes vacíos (sin nombre o sin unidades) no cuentan
+        keep = (assets != "") & np.isfinite(units) & (units > 0)
+        assets, dates, units = assets[keep], dates[keep], units[keep]
+        costs = np.nan_to_num(costs[keep])
+
+        names, codes = np.unique(assets, return_inverse=True)
+        # FIFO: por activo, luego por fecha (sin fecha al final) y, a igual fecha, en el orden dado
+        order = np.lexsort((np.arange(codes.size), np.isnat(dates), dates, codes))
+        self.names = names.astype(object)
+        self.index = {name: i for i, name in enumerate(self.names.tolist())}
+        self.dates = dates[order]
+        self.units = units[order]
+        self.costs = costs[order]
+        self.offsets = np.searchsorted(codes[order], np.arange(names.size + 1))
+        self._cum_units = np.concatenate(([0.0], np.cumsum(self.units)))
+        self._cum_costs = np.concatenate(([0.0], np.cumsum(self.costs)))
+
+    @classmethod
+    def from_frame(
+        cls,
+        df: pd.DataFrame,
+        name_col: str = "Activo",
+        date_col: str = "Fecha",
+        units_col: str = "Unidades",
+        cost_col: str = "Coste_€",
+    ) -> "LotLedger":
+        """Registro a partir de una tabla de compras (una fila por lote)."""
+        return cls(
+            df[name_col].fillna(""),
+            df[date_col],
+            pd.to_numeric(df[units_col], errors="coerce").to_numpy(dtype=np.float64),
+            pd.to_numeric(df[cost_col], errors="coerce").fillna(0.0).to_numpy(dtype=np.float64),
+        )
+
+    def __len__(self) -> int:
+        return self.units.shape[0]
+
+    @property
+    def assets(self) -> np.ndarray:
+        """Nombre del activo de cada lote (alineado con units/costs)."""
+        return np.repeat(self.names, np.diff(self.offsets))
+
+    def with_purchases(self, names, values, amounts, date) -> "LotLedger":
+        """
+        Registro con una compra más de `amounts` € de cada activo en la fecha `date`,
+        al precio actual (valor / unidades; 1 €/unidad si el activo no tiene lotes).
+        """
+        values = np.asarray(values, dtype=np.float64)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        held, _ = self.totals(names)
+        price = np.where((held > 0) & (values > 0), values / np.where(held > 0, held, 1.0), 1.0)
+        bought = amounts > 0
+        return LotLedger(
+            np.concatenate((self.assets, np.asarray(names, dtype=object)[bought])),
+            np.concatenate((self.dates, np.full(int(bought.sum()), np.datetime64(date, "D")))),
+            np.concatenate((self.units, amounts[bought] / price[bought])),
+            np.concatenate((self.costs, amounts[bought])),
+        )
+
+    def __repr__(self) -> str:
+        return f"LotLedger(assets={self.names.size}, lots={len(self)})"
+
+    def _positions(self, names) -> np.ndarray:
+        """Posición en el registro de cada nombre (-1 si no tiene lotes)."""
+        return np.array([self.index.get(str(name).strip(), -1) for name in names], dtype=np.int64)
+
+    def totals(self, names) -> tuple:
+        """Unidades y coste totales de cada activo de `names` (0 si no tiene lotes)."""
+        pos = self._positions(names)
+        found = pos >= 0
+        lo = self.offsets[np.where(found, pos, 0)]
+        hi = self.offsets[np.where(found, pos + 1, 0)]
+        units = np.where(found, self._cum_units[hi] - self._cum_units[lo], 0.0)
+        costs = np.where(found, self._cum_costs[hi] - self._cum_costs[lo], 0.0)
+        return units, costs
+
+    def cost_basis(self, names, values, sales) -> np.ndarray:
+        """
+        Base de coste FIFO de vender `sales` € de cada activo de `names`, valorado
+        ahora en `values` € (todo alineado). Los activos sin lotes tienen base igual
+        a lo vendido (plusvalía 0).
+        """
+        values = np.asarray(values, dtype=np.float64)
+        sales = np.clip(np.asarray(sales, dtype=np.float64), 0.0, values)
+        pos = self._positions(names)
+        found = pos >= 0
+        lo = self.offsets[np.where(found, pos, 0)]
+        hi = self.offsets[np.where(found, pos + 1, 0)]
+        held = self._cum_units[hi] - self._cum_units[lo]
+        has_lots = found & (held > 0) & (values > 0)
+
+        # Unidades vendidas y, sobre los acumulados globales, hasta dónde llegan
+        sold = np.where(has_lots, sales / np.where(has_lots, values, 1.0) * held, 0.0)
+        reach = self._cum_units[lo] + sold
+        k = np.clip(np.searchsorted(self._cum_units, reach, side="left"), lo + 1, np.maximum(hi, lo + 1))
+        # Lotes completos antes de k - 1 y la parte proporcional del lote k - 1
+        lot = np.minimum(k - 1, max(len(self) - 1, 0))
+        lot_units = self.units[lot] if len(self) else np.zeros_like(sold)
+        lot_costs = self.costs[lot] if len(self) else np.zeros_like(sold)
+        partial = (reach - self._cum_units[k - 1]) / np.where(lot_units > 0, lot_units, 1.0) * lot_costs
+        basis = self._cum_costs[k - 1] - self._cum_costs[lo] + partial
+        return np.where(has_lots, basis, sales)
+
+    def realized_gains(self, names, values, sales) -> np.ndarray:
+        """Plusvalía (o minusvalía, si es negativa) FIFO de cada venta."""
+        sales = np.clip(np.asarray(sales, dtype=np.float64), 0.0, np.asarray(values, dtype=np.float64))
+        return sales - self.cost_basis(names, values, sales)
+
+    def sale_tax(self, names, values, sales, brackets=CAPITAL_GAINS_BRACKETS) -> tuple:
+        """
+        Plusvalías por activo e impuesto del conjunto de ventas: las ganancias y
+        pérdidas del mismo año se compensan y el neto pasa por progressive_tax.
+        """
+        gains = self.realized_gains(names, values, sales)
+        return gains, float(progressive_tax(gains.sum(), brackets))
+
+
+@dataclass
+class TaxAwareRebalance:
+    rebalance: RebalanceResult  # operaciones propuestas
+    gains: np.ndarray           # plusvalía FIFO de la venta de cada activo
+    tax: float                  # impuesto del conjunto de ventas
+
+    @property
+    def net_gain(self) -> float:
+        return float(self.gains.sum())
+
+    def to_frame(self) -> pd.DataFrame:
+        df = self.rebalance.to_frame()
+        df["Plusvalía_€"] = self.gains
+        return df
+
+
+def _fifo_segments(ledger, pos: int, price: float, start: float, room: float):
+    """Tramos FIFO (plusvalía por €, €) de un activo entre `start` y `start + room` € vendidos."""
+    if pos < 0 or price <= 0:
+        return [(0.0, room)]
+    lo, hi = ledger.offsets[pos], ledger.offsets[pos + 1]
+    edges = (ledger._cum_units[lo : hi + 1] - ledger._cum_units[lo]) * price
+    amounts = np.clip(edges[1:], start, start + room) - np.clip(edges[:-1], start, start + room)
+    rates = 1.0 - ledger.costs[lo:hi] / (ledger.units[lo:hi] * price)
+    used = amounts > 1e-9
+    return list(zip(rates[used].tolist(), amounts[used].tolist()))
+
+
+def _extra_sales_by_lowest_gain(ledger, names, values, start, room, amount) -> np.ndarray:
+    """
+    Ventas adicionales por `amount` € entre los activos con margen `room` (€ que se
+    pueden vender sin salir de la banda), empezando cada uno tras vender `start` €.
+
+    Por FIFO, cada activo solo puede vender sus lotes en orden. Los tramos de cada
+    activo se agrupan en bloques de plusvalía media por € creciente (envolvente
+    convexa: un lote caro detrás de uno barato se junta con él) y los bloques de
+    todos los activos se venden de menor a mayor plusvalía por €, de modo que las
+    pérdidas se aprovechan primero y las plusvalías grandes se dejan para el final.
+    O(L log L) con L lotes afectados.
+    """
+    extra = np.zeros_like(values)
+    pos = ledger._positions(names)
+    held, _ = ledger.totals(names)
+    price = np.where(held > 0, values / np.where(held > 0, held, 1.0), 0.0)
+
+    blocks = []
+    for i in np.flatnonzero(room > 1e-9):
+        stack = []  # [plusvalía, €] por bloque, con plusvalía media creciente
+        for rate, size in _fifo_segments(ledger, int(pos[i]), float(price[i]), float(start[i]), float(room[i])):
+            gain = rate * size
+            while stack and stack[-1][0] / stack[-1][1] >= gain / size:
+                prev_gain, prev_size = stack.pop()
+                gain, size = gain + prev_gain, size + prev_size
+            stack.append([gain, size])
+        blocks.extend((gain / size, int(i), size) for gain, size in stack)
+
+    remaining = amount
+    for _, i, size in sorted(blocks):
+        if remaining <= 1e-9:
+            break
+        take = min(size, remaining)
+        extra[i] += take
+        remaining -= take
+    return extra
+
+
+def lowest_tax_band_rebalance(
+    ledger: LotLedger,
+    values,
+    target_weights,
+    band: float,
+    names,
+    brackets=CAPITAL_GAINS_BRACKETS,
+    target: str = "edge",
+) -> TaxAwareRebalance:
+    """
+    Ventas con menor impuesto entre las que devuelven la cartera a la banda con la
+    mínima rotación (ver rebalanceo.rebalance_to_band, con el mismo `target`: hasta
+    el borde de la banda o hasta el peso objetivo).
+
+    Las ventas obligatorias (lo que sobra por encima del borde superior, o del
+    objetivo con target="centre") y las compras obligatorias (lo que falta hasta el
+    borde inferior o el objetivo) son fijas. Si las compras necesitan más dinero del
+    que dan esas ventas, el resto se puede vender de cualquier activo que no se
+    compra, sin bajarlo de su borde inferior: se elige, respetando el orden FIFO, lo
+    que menos plusvalía genera por euro. Si sobra dinero de las ventas, no hay nada
+    que elegir y se usa el reparto de rebalance_to_band.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.asarray(target_weights, dtype=np.float64)
+    names = np.asarray(names, dtype=object)
+    base = rebalance_to_band(values, weights, band, target=target, names=names)
+
+    lower, upper = band_edges(values, weights, band)
+    goal = weights * values.sum()
+    over = base.out_of_band & (values > upper)
+    under = base.out_of_band & (values < lower)
+    mandatory_sales = np.where(over, values - (upper if target == "edge" else goal), 0.0)
+    mandatory_buys = np.where(under, (lower if target == "edge" else goal) - values, 0.0)
+    deficit = mandatory_buys.sum() - mandatory_sales.sum()
+    if deficit > 1e-9 * max(1.0, values.sum()):
+        room = np.where(mandatory_buys > 0, 0.0, np.maximum(0.0, values - mandatory_sales - lower))
+        extra = _extra_sales_by_lowest_gain(ledger, names, values, mandatory_sales, room, deficit)
+        sales = mandatory_sales + extra
+        # Si no hay margen suficiente para financiar todas las compras, se compra menos
+        buys = mandatory_buys * min(1.0, sales.sum() / mandatory_buys.sum())
+        candidate = RebalanceResult(
+            names=names,
+            values_before=values,
+            target_weights=weights,
+            trades=buys - sales,
+            out_of_band=base.out_of_band,
+        )
+        # El voraz casi siempre gana al reparto proporcional, pero por FIFO no está
+        # garantizado: nos quedamos con el que menos tributa
+        gains, tax = ledger.sale_tax(names, values, candidate.sells, brackets)
+        base_gains, base_tax = ledger.sale_tax(names, values, base.sells, brackets)
+        if (tax, gains.sum()) <= (base_tax, base_gains.sum()):
+            return TaxAwareRebalance(rebalance=candidate, gains=gains, tax=tax)
+        return TaxAwareRebalance(rebalance=base, gains=base_gains, tax=base_tax)
+
+    gains, tax = ledger.sale_tax(names, values, base.sells, brackets)
+    return TaxAwareRebalance(rebalance=base, gains=gains, tax=tax)
@@ -0,0 +1,144 @@
+"""
+Simulación Monte Carlo de planes de aportación con rentabilidades aleatorias.
+
+Usa los mismos modelos de aportación que la simulación determinista (constante o
+rampa lineal, aportación a final de mes tras capitalizar), pero cada mes la
+rentabilidad se sortea de una distribución configurable con la rentabilidad
+anual esperada y la volatilidad anual indicadas.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from planificador.fiscalidad import progressive_tax
+from planificador.series import DEFAULT_MAX_POINTS, chart_index, year_axis
+from planificador.simulacion import horizon_months
+
+DISTRIBUTIONS = ("normal", "lognormal", "t")
+
+
+@dataclass
+class MonteCarloResult:
+    percentiles: tuple          # percentiles calculados, p. ej. (5, 50, 95)
+    bands: np.ndarray           # (len(percentiles), meses): valor bruto por percentil y mes
+    final_values: np.ndarray    # valor bruto final de cada trayectoria
+    principal_total: float      # capital aportado en total (inicial + aportaciones)
+    goal_probability: float | None = None  # probabilidad de alcanzar el objetivo (si se indicó)
+
+    def band(self, pct: float) -> np.ndarray:
+        """Serie mensual del percentil `pct` (debe ser uno de los calculados)."""
+        return self.bands[self.percentiles.index(pct)]
+
+    def to_frame(self, max_points: int | None = DEFAULT_MAX_POINTS) -> pd.DataFrame:
+        """
+        DataFrame listo para st.line_chart: columna 'Año' y una columna 'P{pct}' por
+        percentil, submuestreado como las series deterministas (ver series.chart_index).
+        """
+        months = self.bands.shape[1]
+        index = slice(None) if max_points is None else chart_index(months, max_points)
+        data = {"Año": year_axis(months, index)}
+        for pct, serie in zip(self.percentiles, self.bands):
+            data[f"P{pct:g}"] = serie[index]
+        return pd.DataFrame(data, copy=False)
+
+
+def _monthly_returns(rng, shape, annual_return, annual_volatility, distribution, t_df):
+    """Sortea rentabilidades mensuales simples con media r/12 y volatilidad σ/√12."""
+    mu = annual_return / 12.0
+    sigma = annual_volatility / np.sqrt(12.0)
+    if distribution == "normal":
+        return rng.normal(mu, sigma, size=shape)
+    if distribution == "lognormal":
+        # Log-rentabilidad normal con la misma media y varianza del factor (1 + R)
+        s2 = np.log1p((sigma / (1.0 + mu)) ** 2)
+        m = np.log1p(mu) - s2 / 2.0
+        return np.expm1(rng.normal(m, np.sqrt(s2), size=shape))
+    # t de Student reescalada para que su desviación típica sea sigma (colas más gruesas)
+    scale = sigma * np.sqrt((t_df - 2.0) / t_df)
+    return mu + scale * rng.standard_t(t_df, size=shape)
+
+
+def simulate_monte_carlo(
+    initial_value: float,
+    initial_monthly: float,
+    final_monthly: float,
+    years: int,
+    annual_return: float,
+    annual_volatility: float,
+    n_paths: int = 10_000,
+    distribution: str = "lognormal",
+    t_df: float = 5.0,
+    goal: float | None = None,
+    goal_after_tax: bool = False,
+    percentiles: tuple = (5, 50, 95),
+    memory_budget_mb: float = 64.0,
+    seed: int | None = None,
+) -> MonteCarloResult:
+    """
+    Simula `n_paths` trayectorias de un plan con aportación lineal entre
+    initial_monthly y final_monthly (iguales = aportación constante).
+
+    La matriz trayectorias × meses nunca se materializa entera: se sortea y se
+    procesa por bloques de meses, con todas las trayectorias a la vez, de forma que
+    cada bloque ocupe como mucho `memory_budget_mb`. Así los percentiles por mes son
+    exactos y 100.000 trayectorias × 720 meses caben en unas decenas de MB.
+
+    Si se indica `goal`, calcula la probabilidad de que el valor final lo alcance
+    (neto de impuestos progresivos sobre la plusvalía si goal_after_tax=True).
+    """
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"distribution debe ser una de {DISTRIBUTIONS}")
+    if distribution == "t" and t_df <= 2:
+        raise ValueError("t_df debe ser > 2 para que la varianza sea finita")
+    months = horizon_months(years)
+    if months <= 0:
+        raise ValueError("years debe ser > 0")
+    n_paths = int(n_paths)
+    if n_paths <= 0:
+        raise ValueError("n_paths debe ser > 0")
+
+    rng = np.random.default_rng(seed)
+    pcts = tuple(percentiles)
+
+    if months > 1:
+        contribs = initial_monthly + (final_monthly - initial_monthly) * np.arange(months) / (months - 1)
+    else:
+        contribs = np.array([float(final_monthly)])
+    principal_total = float(initial_value) + float(contribs.sum())
+
+    # Por bloque hay hasta ~4 matrices float64 de bloque × trayectorias vivas a la vez:
+    # el sorteo, sus temporales y la copia que hace np.percentile al particionar
+    bytes_per_month = 4 * 8 * n_paths
+    block = max(1, int(memory_budget_mb * 1024 * 1024 // bytes_per_month))
+
+    bands = np.empty((len(pcts), months))
+    value = np.full(n_paths, float(initial_value))
+    for start in range(0, months, block):
+        stop = min(months, start + block)
+        growth = _monthly_returns(
+            rng, (stop - start, n_paths), annual_return, annual_volatility, distribution, t_df
+        )
+        growth += 1.0
+        # Recurrencia mes a mes dentro del bloque; 'growth' pasa a guardar los valores
+        for i, m in enumerate(range(start, stop)):
+            value *= growth[i]
+            value += contribs[m]
+            growth[i] = value
+        bands[:, start:stop] = np.percentile(growth, pcts, axis=1)
+
+    goal_probability = None
+    if goal is not None:
+        reached = value
+        if goal_after_tax:
+            reached = value - progressive_tax(value - principal_total)
+        goal_probability = float(np.mean(reached >= goal))
+
+    return MonteCarloResult(
+        percentiles=pcts,
+        bands=bands,
+        final_values=value,
+        principal_total=principal_total,
+        goal_probability=goal_probability,
+    )
@@ -0,0 +1,135 @@
+"""
+Solver de objetivos NETOS de impuestos para los planes de aportación.
+
+En todos los planes de la app el valor final y el capital aportado son funciones
+afines de la aportación que se busca (X = cuota constante o cuota final de la rampa):
+
+    FV(X) = fv_base + fv_slope·X        principal(X) = principal_base + principal_slope·X
+
+La plusvalía también es afín en X y el impuesto es lineal a trozos (un tipo por
+tramo), así que el neto FV - impuesto(plusvalía) es monótono y lineal a trozos en X.
+Basta con localizar el tramo y despejar en forma cerrada, sin búsqueda binaria.
+"""
+
+import numpy as np
+
+from planificador.cache import memoize
+from planificador.fiscalidad import CAPITAL_GAINS_BRACKETS
+from planificador.simulacion import contribution_growth, monthly_rate, ramp_sums
+
+
+def _bracket_table(brackets):
+    """Límites inferior/superior, tipo e impuesto acumulado al inicio de cada tramo.
+
+    Se antepone un tramo (-inf, 0] sin impuesto para las plusvalías negativas.
+    """
+    lows, highs, rates, tax_at_low = [-np.inf], [0.0], [0.0], [0.0]
+    prev, acc = 0.0, 0.0
+    for limit, rate in brackets:
+        lows.append(prev)
+        highs.append(limit)
+        rates.append(rate)
+        tax_at_low.append(acc)
+        if np.isfinite(limit):
+            acc += (limit - prev) * rate
+        prev = limit
+    return (np.array(v, dtype=float)[:, None] for v in (lows, highs, rates, tax_at_low))
+
+
+def solve_affine_net_goal(
+    goal,
+    fv_base,
+    fv_slope,
+    principal_base,
+    principal_slope,
+    brackets=CAPITAL_GAINS_BRACKETS,
+):
+    """
+    Valor de X con el que FV(X) - impuesto(FV(X) - principal(X)) = goal.
+
+    `brackets` es una tabla (límite superior, tipo) como CAPITAL_GAINS_BRACKETS; un
+    tipo fijo t equivale a ((inf, t),). Todos los argumentos aceptan arrays con
+    broadcasting (una solución por posición). Requiere fv_slope > 0 y tipos < 1,
+    con lo que el neto es estrictamente creciente en X y la solución es única.
+    """
+    goal, a, b, p, m = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (goal, fv_base, fv_slope, principal_base, principal_slope))
+    )
+    shape = goal.shape
+    goal, a, b, p, m = (v.ravel()[None, :] for v in (goal, a, b, p, m))
+    lows, highs, rates, tax_at_low = _bracket_table(brackets)
+
+    # Dentro del tramo k: neto = a + b·X - T_k - t_k·(gain(X) - low_k), gain(X) = (a - p) + (b - m)·X
+    low_finite = np.where(np.isfinite(lows), lows, 0.0)
+    x = (goal - a + tax_at_low + rates * ((a - p) - low_finite)) / (b - rates * (b - m))
+
+    # El candidato válido es el que deja la plusvalía dentro de su propio tramo
+    gain = (a - p) + (b - m) * x
+    tol = 1e-9 * np.maximum(1.0, np.abs(gain))
+    valid = (gain >= lows - tol) & (gain <= highs + tol)
+    idx = np.argmax(valid, axis=0)
+    solution = x[idx, np.arange(x.shape[1])]
+    return solution.reshape(shape) if shape else float(solution[0])
+
+
+@memoize()
+def required_constant_monthly_net(
+    goal,
+    initial_value,
+    years,
+    annual_return,
+    brackets=CAPITAL_GAINS_BRACKETS,
+    compounding: str = "nominal",
+    timing: str = "end",
+):
+    """
+    Aportación mensual constante (continua, >= 0) para acabar con `goal` NETO tras
+    vender todo al final. Por defecto con la convención de la app (r/12, aportación
+    a final de mes); ver planificador.simulacion para compounding y timing.
+    """
+    months = np.rint(np.asarray(years, dtype=float) * 12.0)
+    r_m = monthly_rate(annual_return, compounding)
+    growth, s0, _ = ramp_sums(months, r_m)
+    initial_value = np.asarray(initial_value, dtype=float)
+    monthly = solve_affine_net_goal(
+        goal,
+        fv_base=initial_value * growth,
+        fv_slope=contribution_growth(r_m, timing) * s0,
+        principal_base=initial_value,
+        principal_slope=months,
+        brackets=brackets,
+    )
+    return np.maximum(0.0, monthly) if np.ndim(monthly) else max(0.0, monthly)
+
+
+@memoize()
+def required_final_monthly_net(
+    goal,
+    initial_value,
+    initial_monthly,
+    years,
+    annual_return,
+    brackets=CAPITAL_GAINS_BRACKETS,
+    compounding: str = "nominal",
+    timing: str = "end",
+):
+    """
+    Aportación final de una rampa lineal que empieza en `initial_monthly` para acabar
+    con `goal` NETO tras vender todo al final (por defecto, convención de la app).
+    No se acota: un valor por debajo de initial_monthly indica que la cuota plana
+    ya basta.
+    """
+    months = np.maximum(np.rint(np.asarray(years, dtype=float) * 12.0), 1.0)
+    r_m = monthly_rate(annual_return, compounding)
+    growth, s0, slope_sum = ramp_sums(months, r_m)
+    k = contribution_growth(r_m, timing)
+    initial_value = np.asarray(initial_value, dtype=float)
+    initial_monthly = np.asarray(initial_monthly, dtype=float)
+    return solve_affine_net_goal(
+        goal,
+        fv_base=initial_value * growth + k * initial_monthly * (s0 - slope_sum),
+        fv_slope=k * slope_sum,
+        principal_base=initial_value + months * initial_monthly / 2.0,
+        principal_slope=months / 2.0,
+        brackets=brackets,
+    )
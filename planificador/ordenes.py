@@ -0,0 +1,187 @@
+"""
+Órdenes ejecutables a partir del plan de aportación.
+
+El reparto continuo (ver cartera.contribution_vector) da importes en euros con
+decimales. Para ejecutarlo hace falta respetar, por activo:
+
+- un importe mínimo por orden (p. ej. el mínimo de un plan de ahorro),
+- y, si se compra por acciones, el precio y el tamaño de lote (acciones enteras
+  o múltiplos de un lote).
+
+Se redondea primero hacia abajo el plan ideal a incrementos comprables y el dinero
+sobrante se reparte como un voraz que compra, en cada paso, un incremento más del
+activo que más lejos queda de su objetivo. Ese voraz equivale a bajar un "nivel"
+de déficit común: cada activo compra todos sus incrementos cuyo déficit está por
+encima del nivel. Cuando quedan muchos pasos (sobrante grande frente al
+incremento), el nivel hasta el que alcanza el dinero se busca por bisección y esos
+incrementos se compran de una vez; solo los pocos pasos de alrededor del nivel
+pasan por la cola de prioridad (heap). Así el coste depende del número de activos
+y no de sobrante / incremento.
+"""
+
+import heapq
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from planificador.cartera import Portfolio, contribution_vector
+
+# Sin precio, los importes se compran en múltiplos de este incremento (€)
+DEFAULT_EURO_STEP = 1.0
+# Con más pasos pendientes que esto por activo, se compran de una vez (ver _steps_above)
+_BULK_STEPS_PER_ASSET = 4
+
+
+@dataclass
+class OrderPlan:
+    names: np.ndarray       # nombre de cada activo (alineado con la cartera)
+    amounts: np.ndarray     # importe de la orden en € (0 = sin orden)
+    units: np.ndarray       # acciones/participaciones compradas (NaN si el activo no tiene precio)
+    ideal: np.ndarray       # reparto continuo de partida en €
+    leftover: float         # dinero que no se ha podido invertir respetando mínimos y lotes
+
+    @property
+    def invested(self) -> float:
+        return float(self.amounts.sum())
+
+    def to_frame(self, only_orders: bool = True) -> pd.DataFrame:
+        """Tabla de órdenes (por defecto solo los activos con importe > 0)."""
+        df = pd.DataFrame(
+            {
+                "Activo": self.names,
+                "Ideal_€": self.ideal,
+                "Unidades": self.units,
+                "Importe_orden_€": self.amounts,
+            }
+        )
+        return df[self.amounts > 0].reset_index(drop=True) if only_orders else df
+
+
+def _per_asset(value, n: int, default: float) -> np.ndarray:
+    """Escalar o array → array de n elementos (None/NaN se sustituyen por `default`)."""
+    if value is None:
+        return np.full(n, default, dtype=np.float64)
+    arr = np.broadcast_to(np.asarray(value, dtype=np.float64), (n,)).copy()
+    arr[~np.isfinite(arr)] = default
+    return arr
+
+
+def _steps_above(level: float, gaps: np.ndarray, cost: np.ndarray, step: np.ndarray):
+    """
+    Lo que el voraz compra a cada activo mientras su déficit sea >= `level`: el
+    primer incremento cuesta `cost` (el mínimo si aún no tiene orden) y los
+    siguientes `step`. Devuelve el importe por activo.
+    """
+    after_first = np.floor((gaps - cost - level) / step) + 1.0
+    count = np.where(gaps >= level, 1.0 + np.maximum(0.0, after_first), 0.0)
+    return np.where(count > 0, cost + (count - 1.0) * step, 0.0)
+
+
+def _bulk_steps(gaps: np.ndarray, cost: np.ndarray, step: np.ndarray, budget: float) -> np.ndarray:
+    """
+    Incrementos que compra el voraz antes de que el siguiente no quepa en `budget`:
+    los de déficit por encima del nivel más bajo cuyo importe total cabe (bisección).
+    """
+    hi = float(gaps.max())
+    if _steps_above(hi, gaps, cost, step).sum() > budget + 1e-9:
+        return np.zeros_like(gaps)
+    lo = float(gaps.min()) - budget - 1.0  # aquí el importe supera el presupuesto
+    for _ in range(200):
+        mid = (lo + hi) / 2.0
+        if mid <= lo or mid >= hi:
+            break
+        if _steps_above(mid, gaps, cost, step).sum() > budget + 1e-9:
+            lo = mid
+        else:
+            hi = mid
+    return _steps_above(hi, gaps, cost, step)
+
+
+def plan_orders(
+    portfolio: Portfolio,
+    budget: float,
+    prices=None,
+    lot_sizes=None,
+    min_tickets=None,
+    euro_step: float = DEFAULT_EURO_STEP,
+    method: str = "waterfill",
+) -> OrderPlan:
+    """
+    Convierte la aportación `budget` en órdenes ejecutables.
+
+    - prices: precio por acción de cada activo; NaN/None = se compra por importe
+      (en múltiplos de `euro_step`), como en un plan de ahorro.
+    - lot_sizes: acciones por lote (1 = acciones enteras; 0.1 = fracciones de 0,1...).
+    - min_tickets: importe mínimo de cada orden en € (0 = sin mínimo).
+
+    Todos aceptan un escalar o un array alineado con portfolio.names. El reparto de
+    partida es contribution_vector(portfolio, budget, method=method).
+    """
+    n = len(portfolio)
+    budget = max(0.0, float(budget))
+    prices = _per_asset(prices, n, np.nan) if prices is not None else np.full(n, np.nan)
+    has_price = np.isfinite(prices) & (prices > 0)
+    lots = _per_asset(lot_sizes, n, 1.0)
+    lots[lots <= 0] = 1.0
+    min_tickets = np.maximum(_per_asset(min_tickets, n, 0.0), 0.0)
+
+    # Incremento comprable de cada activo en € y tamaño de la primera orden (el mínimo, redondeado arriba)
+    step = np.where(has_price, np.where(has_price, prices, 1.0) * lots, float(euro_step))
+    first = np.maximum(np.ceil(min_tickets / step - 1e-9), 1.0) * step
+
+    ideal = contribution_vector(portfolio, budget, method=method)
+
+    # 1) Plan ideal redondeado hacia abajo a incrementos; lo que no llega al mínimo se descarta
+    amounts = np.floor(ideal / step + 1e-9) * step
+    amounts[amounts < first - 1e-9] = 0.0
+    remaining = budget - amounts.sum()
+
+    # 2) Voraz: un incremento más para el activo con mayor déficit respecto a su objetivo
+    targets = portfolio.target_weights
+    spread = targets / targets.sum() if targets.sum() > 0 else np.full(n, 1.0 / max(n, 1))
+    total_after = max(0.0, portfolio.total_value()) + budget
+    gaps = spread * total_after - portfolio.values - amounts
+
+    live = np.ones(n, dtype=bool)  # activos cuyos incrementos aún pueden caber
+    while remaining > 1e-9:
+        cost = np.where(amounts > 0, step, first)
+        live &= cost <= remaining + 1e-9
+        if not live.any():
+            break
+        # 2a) Muchos pasos pendientes: los que van antes del primero que no cabe, de una vez
+        many_steps = _BULK_STEPS_PER_ASSET * int(live.sum()) * float(step[live].min())
+        if remaining > many_steps:
+            bulk = np.zeros(n)
+            bulk[live] = _bulk_steps(gaps[live], cost[live], step[live], remaining)
+            amounts += bulk
+            gaps -= bulk
+            remaining -= bulk.sum()
+
+        # 2b) El resto, de incremento en incremento
+        heap = [(-gaps[i], i) for i in np.flatnonzero(live)]
+        heapq.heapify(heap)
+        while heap and remaining > 1e-9:
+            neg_gap, i = heapq.heappop(heap)
+            cost_i = step[i] if amounts[i] > 0 else first[i]
+            if cost_i > remaining + 1e-9:
+                # Los incrementos de este activo ya no caben: el presupuesto solo puede bajar
+                live[i] = False
+                if remaining > many_steps:
+                    break  # aún quedan muchos pasos para los demás: otra vez de una vez
+                continue
+            amounts[i] += cost_i
+            gaps[i] -= cost_i
+            remaining -= cost_i
+            heapq.heappush(heap, (neg_gap + cost_i, i))
+        else:
+            break
+
+    units = np.where(has_price, amounts / np.where(has_price, prices, 1.0), np.nan)
+    return OrderPlan(
+        names=portfolio.names,
+        amounts=amounts,
+        units=units,
+        ideal=ideal,
+        leftover=max(0.0, remaining),
+    )
@@ -0,0 +1,136 @@
+"""
+Proyección mes a mes del plan de aportación (solo compras).
+
+Repite el reparto de la pestaña 1 durante 12–120 meses: cada mes se reparte la
+aportación con water-filling (cartera.waterfill_allocation) sobre el estado actual
+y después cada activo crece con su propia rentabilidad esperada. El estado son
+arrays alineados con los activos y cada mes es una actualización vectorial, sin
+reconstruir la cartera ni pasar por diccionarios.
+
+La aportación puede ser fija o crecer linealmente hasta una aportación final, como
+la rampa de las pestañas 2 y 3.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from planificador.cartera import Portfolio, waterfill_allocation
+from planificador.simulacion import _ramp_contributions, monthly_rate
+
+MIN_PROJECTION_MONTHS = 12
+MAX_PROJECTION_MONTHS = 120
+
+
+@dataclass
+class ProjectionResult:
+    names: np.ndarray            # nombre de cada activo
+    target_weights: np.ndarray   # peso objetivo (0–1) de cada activo
+    contributions: np.ndarray    # (meses, activos): aportación de cada mes a cada activo
+    values: np.ndarray           # (meses, activos): valor tras aportar y crecer cada mes
+    max_deviation: np.ndarray    # (meses,): desviación máxima |peso - objetivo| tras aportar
+    band: float                  # semiancho de la banda de tolerancia (0–1)
+
+    @property
+    def months(self) -> int:
+        return self.contributions.shape[0]
+
+    @property
+    def first_buy_month(self) -> np.ndarray:
+        """Primer mes (1, 2, ...) en el que se compra cada activo; 0 si no se compra nunca."""
+        bought = self.contributions > 0
+        return np.where(bought.any(axis=0), bought.argmax(axis=0) + 1, 0)
+
+    @property
+    def in_band(self) -> np.ndarray:
+        """Para cada mes, si tras aportar todos los activos quedan dentro de la banda."""
+        return self.max_deviation <= self.band + 1e-12
+
+    @property
+    def band_entry_month(self) -> int:
+        """Primer mes en el que la cartera entra en la banda de tolerancia; 0 si no entra."""
+        inside = self.in_band
+        return int(inside.argmax()) + 1 if inside.any() else 0
+
+    def to_frame(self) -> pd.DataFrame:
+        """Resumen por activo: primera compra, total aportado y peso final."""
+        final = self.values[-1]
+        total = final.sum()
+        return pd.DataFrame(
+            {
+                "Activo": self.names,
+                "Primera_compra_mes": self.first_buy_month,
+                "Aportado_total_€": self.contributions.sum(axis=0),
+                "Valor_final_€": final,
+                "Peso_final_%": final / total * 100 if total > 0 else np.zeros_like(final),
+                "Peso_objetivo_%": self.target_weights * 100,
+            }
+        )
+
+    def monthly_frame(self) -> pd.DataFrame:
+        """Evolución mensual: aportación, valor total y desviación máxima (en puntos)."""
+        return pd.DataFrame(
+            {
+                "Mes": np.arange(1, self.months + 1),
+                "Aportación_€": self.contributions.sum(axis=1),
+                "Valor_total_€": self.values.sum(axis=1),
+                "Desviación_máx_pp": self.max_deviation * 100,
+                "En_banda": self.in_band,
+            }
+        )
+
+
+def project_contributions(
+    portfolio: Portfolio,
+    monthly_contribution: float,
+    months: int,
+    annual_returns=0.0,
+    final_contribution: float | None = None,
+    band: float = 0.0,
+    compounding: str = "nominal",
+) -> ProjectionResult:
+    """
+    Proyecta `months` meses de aportaciones solo de compra.
+
+    - annual_returns: rentabilidad anual esperada, un escalar o un valor por activo
+      (alineado con portfolio.names).
+    - final_contribution: si se indica, la aportación sube linealmente desde
+      `monthly_contribution` hasta ella; si no, es fija.
+    - band: semiancho de la banda de tolerancia en tanto por uno (0.02 = ±2 puntos).
+    """
+    months = int(months)
+    if months <= 0:
+        raise ValueError("months debe ser > 0")
+    n = len(portfolio)
+    first = float(monthly_contribution)
+    last = first if final_contribution is None else float(final_contribution)
+    schedule = np.maximum(0.0, _ramp_contributions(first, last, months))
+    growth = 1.0 + np.broadcast_to(monthly_rate(annual_returns, compounding), (n,))
+
+    targets = portfolio.target_weights
+    sum_targets = targets.sum()
+    spread = targets / sum_targets if sum_targets > 0 else np.full(n, 1.0 / max(n, 1))
+
+    values = np.maximum(0.0, portfolio.values.astype(np.float64))
+    contributions = np.zeros((months, n))
+    path = np.empty((months, n))
+    max_deviation = np.empty(months)
+    for m in range(months):
+        budget = schedule[m]
+        total = values.sum() + budget
+        contribution = waterfill_allocation(spread * total - values, budget)
+        values = values + contribution
+        max_deviation[m] = np.abs(values / total - targets).max() if total > 0 and n else 0.0
+        contributions[m] = contribution
+        values *= growth
+        path[m] = values
+
+    return ProjectionResult(
+        names=portfolio.names,
+        target_weights=targets,
+        contributions=contributions,
+        values=path,
+        max_deviation=max_deviation,
+        band=max(0.0, float(band)),
+    )
@@ -0,0 +1,161 @@
+"""
+Rebalanceo con bandas de tolerancia y mínima rotación.
+
+Cada activo tiene una banda [objetivo - umbral, objetivo + umbral] alrededor de su
+peso objetivo. Solo se opera con los activos que están fuera de su banda y solo
+hasta el borde de la banda (o hasta el objetivo, si se prefiere el centro). Las
+compras se financian con las ventas, sin dinero nuevo:
+
+1. Ventas y compras obligatorias: lo mínimo para que cada activo fuera de banda
+   vuelva a ella (borde o centro).
+2. Si las ventas superan a las compras, el sobrante se reparte entre los activos
+   que no se venden en proporción a su margen hasta el borde superior (y, si no
+   cabe, se vende menos); si faltan ventas, se venden activos que no se compran en
+   proporción a su margen hasta el borde inferior (y, si no basta, se compra menos).
+
+La rotación resultante (compras + ventas) es 2·max(ventas, compras) obligatorias,
+la mínima posible para que todo quede dentro de banda. Todo son operaciones
+vectoriales sobre los desfases: O(n).
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+BAND_TARGETS = ("edge", "centre")
+
+
+@dataclass
+class RebalanceResult:
+    names: np.ndarray           # nombre de cada activo
+    values_before: np.ndarray   # valor de partida en €
+    target_weights: np.ndarray  # peso objetivo (0–1)
+    trades: np.ndarray          # operación en € (> 0 compra, < 0 venta)
+    out_of_band: np.ndarray     # True si el activo estaba fuera de su banda
+
+    @property
+    def values_after(self) -> np.ndarray:
+        return self.values_before + self.trades
+
+    @property
+    def weights_before(self) -> np.ndarray:
+        total = self.values_before.sum()
+        return self.values_before / total if total > 0 else np.zeros_like(self.values_before)
+
+    @property
+    def weights_after(self) -> np.ndarray:
+        total = self.values_after.sum()
+        return self.values_after / total if total > 0 else np.zeros_like(self.values_before)
+
+    @property
+    def sells(self) -> np.ndarray:
+        return np.maximum(0.0, -self.trades)
+
+    @property
+    def buys(self) -> np.ndarray:
+        return np.maximum(0.0, self.trades)
+
+    @property
+    def turnover(self) -> float:
+        """Volumen total negociado (compras + ventas) en €."""
+        return float(np.abs(self.trades).sum())
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                "Activo": self.names,
+                "Valor_antes_€": self.values_before,
+                "Peso_antes_%": self.weights_before * 100,
+                "Peso_objetivo_%": self.target_weights * 100,
+                "Fuera_de_banda": self.out_of_band,
+                "Venta_€": self.sells,
+                "Compra_€": self.buys,
+                "Valor_final_€": self.values_after,
+                "Peso_final_%": self.weights_after * 100,
+            }
+        )
+
+
+def _spread(amount: np.ndarray, room: np.ndarray) -> np.ndarray:
+    """Reparte `amount` (uno por fila) en proporción a `room` sin superar el margen de nadie."""
+    total_room = room.sum(axis=-1, keepdims=True)
+    active = (amount > 0) & (total_room > 0)
+    return room * np.where(active, np.minimum(1.0, amount / np.where(active, total_room, 1.0)), 0.0)
+
+
+def band_edges(values, target_weights, band: float):
+    """Bordes inferior y superior (en €) de la banda objetivo ± band de cada activo."""
+    total = float(np.sum(values))
+    weights = np.asarray(target_weights, dtype=np.float64)
+    band = max(0.0, float(band))
+    return np.maximum(0.0, weights - band) * total, (weights + band) * total
+
+
+def band_trades(values, target_weights, band, target: str = "edge"):
+    """
+    Operaciones de rebalance_to_band para muchas carteras a la vez: `values` es
+    (..., activos), con una cartera por fila, y `band` un escalar o una banda por
+    fila. Devuelve (operaciones, máscara de activos fuera de banda), con la forma de
+    `values`. Todo son operaciones vectoriales por filas.
+    """
+    if target not in BAND_TARGETS:
+        raise ValueError(f"target debe ser uno de {BAND_TARGETS}, no {target!r}")
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.asarray(target_weights, dtype=np.float64)
+    band = np.maximum(0.0, np.asarray(band, dtype=np.float64))
+    if band.ndim:
+        band = band.reshape(band.shape + (1,) * (values.ndim - band.ndim))
+
+    total = values.sum(axis=-1, keepdims=True)
+    lower = np.maximum(0.0, weights - band) * total
+    upper = (weights + band) * total
+    # Tolerancia numérica: un activo justo en el borde está dentro de la banda
+    eps = 1e-9 * np.maximum(1.0, np.abs(total))
+    over = values > upper + eps
+    under = values < lower - eps
+
+    # 1) Operaciones obligatorias hasta el borde (o el centro) de la banda
+    goal = weights * total
+    sell_to = upper if target == "edge" else goal
+    buy_to = lower if target == "edge" else goal
+    trades = np.where(over, sell_to - values, 0.0) + np.where(under, buy_to - values, 0.0)
+
+    # 2) Cuadrar ventas y compras sin sacar a nadie de su banda
+    imbalance = -trades.sum(axis=-1, keepdims=True)  # > 0: sobra dinero de las ventas; < 0: faltan ventas
+    after = values + trades
+    surplus = np.where(imbalance > eps, imbalance, 0.0)
+    extra = _spread(surplus, np.where(over, 0.0, np.maximum(0.0, upper - after)))
+    trades += extra
+    # Lo que no cabe en los demás se queda sin vender
+    trades += _spread(surplus - extra.sum(axis=-1, keepdims=True), np.where(over, -trades, 0.0))
+
+    shortfall = np.where(imbalance < -eps, -imbalance, 0.0)
+    extra = _spread(shortfall, np.where(under, 0.0, np.maximum(0.0, after - lower)))
+    trades -= extra
+    # Si no hay suficiente para vender, se compra menos
+    trades -= _spread(shortfall - extra.sum(axis=-1, keepdims=True), np.where(under, trades, 0.0))
+    return trades, over | under
+
+
+def rebalance_to_band(values, target_weights, band: float, target: str = "edge", names=None) -> RebalanceResult:
+    """
+    Operaciones de mínima rotación para dejar todos los activos dentro de
+    objetivo ± band (pesos en tanto por uno, band = 0.02 para ±2 puntos).
+
+    target="edge" lleva los activos fuera de banda solo hasta el borde más cercano;
+    target="centre", hasta su peso objetivo. La suma de operaciones es 0 (las
+    compras se pagan con las ventas).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.asarray(target_weights, dtype=np.float64)
+    if names is None:
+        names = np.arange(values.shape[0]).astype(str)
+    trades, out_of_band = band_trades(values, weights, band, target)
+    return RebalanceResult(
+        names=np.asarray(names, dtype=object),
+        values_before=values,
+        target_weights=weights,
+        trades=trades,
+        out_of_band=out_of_band,
+    )
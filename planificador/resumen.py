@@ -0,0 +1,59 @@
+"""
+Resumen anual de las aportaciones de una rampa lineal.
+
+Una sola pasada con arrays (un elemento por año) produce la tabla que muestran las
+pestañas de la app y que imprime el script de consola: aportación al inicio y al
+final de cada año, media, y opcionalmente el sueldo de referencia para que esa
+media suponga un porcentaje del sueldo neto.
+"""
+
+import numpy as np
+import pandas as pd
+
+from planificador.fiscalidad import compute_salary_net
+
+SUMMARY_COLUMNS = ("Año", "Inicio_€/mes", "Fin_€/mes", "Media_€/mes")
+SALARY_COLUMNS = ("Sueldo_bruto_necesario_€/año", "Sueldo_neto_estimado_€/año", "Retención_total_aprox_%")
+
+
+def ramp_yearly_contributions(initial_monthly, final_monthly, years: int):
+    """
+    Arrays (año, inicio, fin, media) en euros enteros de una rampa lineal de
+    `years` años que va de initial_monthly a final_monthly.
+
+    El inicio y el fin de cada año son las aportaciones de su primer y último mes,
+    redondeadas; la media es la semisuma redondeada de ambas.
+    """
+    years = int(years)
+    months = years * 12
+    year = np.arange(1, years + 1)
+    if months > 1:
+        first_month = (year - 1) * 12
+        last_month = np.minimum(year * 12 - 1, months - 1)
+        slope = (float(final_monthly) - float(initial_monthly)) / (months - 1)
+        start = np.rint(float(initial_monthly) + slope * first_month).astype(np.int64)
+        end = np.rint(float(initial_monthly) + slope * last_month).astype(np.int64)
+    else:
+        start = end = np.full(years, int(round(final_monthly)), dtype=np.int64)
+    avg = np.rint((start + end) / 2.0).astype(np.int64)
+    return year, start, end, avg
+
+
+def ramp_yearly_summary(initial_monthly, final_monthly, years: int, salary_share: float = 0.0) -> pd.DataFrame:
+    """
+    Tabla por año (columnas SUMMARY_COLUMNS) de una rampa lineal de aportaciones.
+
+    Si salary_share > 0 (fracción del sueldo, 0.2 = 20%), añade las SALARY_COLUMNS:
+    sueldo bruto anual para que la media mensual × 12 sea esa fracción, su neto
+    estimado y la retención total en %. Los años sin aportación quedan a 0.
+    """
+    year, start, end, avg = ramp_yearly_contributions(initial_monthly, final_monthly, years)
+    table = pd.DataFrame(dict(zip(SUMMARY_COLUMNS, (year, start, end, avg))))
+
+    if salary_share > 0:
+        gross = np.where(avg > 0, avg * 12 / float(salary_share), 0.0)
+        net, _, _, effective_rate = compute_salary_net(gross)
+        table[SALARY_COLUMNS[0]] = np.rint(gross).astype(np.int64)
+        table[SALARY_COLUMNS[1]] = np.rint(net).astype(np.int64)
+        table[SALARY_COLUMNS[2]] = np.round(effective_rate * 100.0, 1)
+    return table
@@ -0,0 +1,54 @@
+"""
+Sensibilidad de la aportación necesaria a la rentabilidad y al plazo.
+
+Calcula de una sola pasada vectorizada la aportación mensual que exige un objetivo
+para toda una rejilla (rentabilidad × años), con los mismos modelos que la app:
+aportación constante o rampa lineal, con o sin impuestos progresivos al final.
+"""
+
+import numpy as np
+import pandas as pd
+
+from planificador.fiscalidad import CAPITAL_GAINS_BRACKETS, NO_TAX_BRACKETS
+from planificador.objetivos import required_constant_monthly_net, required_final_monthly_net
+
+DEFAULT_RETURNS = np.arange(0.02, 0.1001, 0.005)
+DEFAULT_YEARS = np.arange(5, 41)
+
+
+def required_monthly_grid(
+    goal: float,
+    initial_value: float,
+    returns=DEFAULT_RETURNS,
+    years=DEFAULT_YEARS,
+    initial_monthly: float | None = None,
+    apply_tax: bool = False,
+) -> pd.DataFrame:
+    """
+    Aportación necesaria para llegar a `goal` en cada combinación de rentabilidad
+    anual (0.07 = 7%) y horizonte en años.
+
+    Con initial_monthly=None el plan es de aportación constante y el valor es esa
+    cuota; si se indica, el plan es una rampa lineal desde initial_monthly y el
+    valor es la cuota final (nunca menor que la inicial). Con apply_tax=True el
+    objetivo es NETO de impuestos progresivos sobre la plusvalía.
+
+    Devuelve un DataFrame en formato largo con columnas
+    'Rentabilidad_%', 'Años' y 'Aportación_€/mes' (redondeada a euros).
+    """
+    rates, horizons = np.meshgrid(np.asarray(returns, dtype=float), np.asarray(years, dtype=float), indexing="ij")
+    brackets = CAPITAL_GAINS_BRACKETS if apply_tax else NO_TAX_BRACKETS
+
+    if initial_monthly is None:
+        monthly = required_constant_monthly_net(goal, initial_value, horizons, rates, brackets=brackets)
+    else:
+        final = required_final_monthly_net(goal, initial_value, initial_monthly, horizons, rates, brackets=brackets)
+        monthly = np.maximum(float(initial_monthly), final)
+
+    return pd.DataFrame(
+        {
+            "Rentabilidad_%": np.round(rates.ravel() * 100.0, 2),
+            "Años": horizons.ravel().astype(int),
+            "Aportación_€/mes": np.rint(monthly.ravel()),
+        }
+    )
@@ -0,0 +1,92 @@
+"""
+Series mensuales compactas para las simulaciones.
+
+Una serie es un único array contiguo de NumPy (float64 por defecto, float32 si se
+pide) con el valor al final de cada mes. Las vistas anuales y el submuestreo para
+los gráficos son slices del mismo array, sin copias, y las tablas para
+st.line_chart se construyen directamente a partir de esas vistas.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+# Por encima de este número de puntos, los gráficos pasan a resolución anual (o más gruesa)
+DEFAULT_MAX_POINTS = 120
+
+
+def chart_index(months: int, max_points: int = DEFAULT_MAX_POINTS):
+    """
+    Posiciones (0-based) de los meses que se dibujan en un gráfico de `months` meses.
+
+    Si caben, todos los meses; si no, el último mes de cada año (o de cada bloque de
+    varios años) como slice, que aplicado a un array es una vista sin copia. Solo si
+    el horizonte no es múltiplo del paso se devuelve un array de índices que añade
+    el último mes, para que el gráfico siempre termine en el valor final.
+    """
+    if months <= max_points:
+        return slice(None)
+    step = 12 * math.ceil(months / (12 * max_points))
+    if months % step == 0:
+        return slice(step - 1, None, step)
+    return np.append(np.arange(step - 1, months, step), months - 1)
+
+
+def year_axis(months: int, index=slice(None)) -> np.ndarray:
+    """Eje X en años (mes 1 = 1/12) para las posiciones `index` de una serie mensual."""
+    return (np.arange(1, months + 1, dtype=float) / 12.0)[index]
+
+
+class MonthlySeries:
+    """Valores mes a mes (mes 1..n) de un plan, respaldados por un array de NumPy."""
+
+    __slots__ = ("values",)
+
+    def __init__(self, values, dtype=np.float64):
+        self.values = np.ascontiguousarray(values, dtype=dtype)
+
+    def __len__(self) -> int:
+        return self.values.shape[0]
+
+    def __getitem__(self, item):
+        return self.values[item]
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None or np.dtype(dtype) == self.values.dtype:
+            return self.values.copy() if copy else self.values
+        return self.values.astype(dtype)
+
+    def __repr__(self) -> str:
+        return f"MonthlySeries(months={len(self)}, dtype={self.values.dtype})"
+
+    @property
+    def monthly(self) -> np.ndarray:
+        """Vista (sin copia) de los valores mensuales."""
+        return self.values
+
+    @property
+    def yearly(self) -> np.ndarray:
+        """Vista (sin copia) del valor al cierre de cada año completo."""
+        return self.values[11::12]
+
+    @property
+    def final(self) -> float:
+        """Último valor de la serie (NaN si está vacía)."""
+        return float(self.values[-1]) if len(self) else float("nan")
+
+    def downsample(self, max_points: int = DEFAULT_MAX_POINTS):
+        """(eje en años, valores) con como mucho ~max_points puntos, ver chart_index."""
+        index = chart_index(len(self), max_points)
+        return year_axis(len(self), index), self.values[index]
+
+    def to_frame(self, value_name: str, max_points: int | None = DEFAULT_MAX_POINTS) -> pd.DataFrame:
+        """
+        DataFrame listo para st.line_chart: columna 'Año' y la columna `value_name`.
+        Con max_points=None se devuelven todos los meses.
+        """
+        if max_points is None:
+            axis, values = year_axis(len(self)), self.values
+        else:
+            axis, values = self.downsample(max_points)
+        return pd.DataFrame({"Año": axis, value_name: values}, copy=False)
@@ -0,0 +1,321 @@
+"""
+Simulación vectorizada de planes de aportación.
+
+Las convenciones son parámetros explícitos de cada función:
+
+- compounding="nominal": tipo mensual annual_return / 12 (la app);
+  compounding="geometric": (1 + annual_return)^(1/12) - 1 (rebalance_marcos.py).
+- timing="end": se capitaliza el mes y después se suma la aportación (la app);
+  timing="start": se aporta al inicio del mes y capitaliza ese mismo mes
+  (rebalance_marcos.py).
+
+Una aportación constante es una rampa con aportación inicial = final.
+"""
+
+import numpy as np
+
+from planificador.series import MonthlySeries
+
+COMPOUNDINGS = ("nominal", "geometric")
+TIMINGS = ("end", "start")
+
+# Si n·r_m es menor que esto, las sumas geométricas se evalúan por su serie de
+# Taylor en r_m (la fórmula cerrada pierde precisión por cancelación)
+_SMALL_RATE_HORIZON = 1e-3
+
+
+def horizon_months(years):
+    """
+    Meses de un horizonte de `years` años, redondeados al mes más cercano (medio
+    mes, al par). Es el redondeo de todos los simuladores; acepta arrays.
+    """
+    months = np.rint(np.asarray(years, dtype=float) * 12.0).astype(np.int64)
+    return int(months) if months.ndim == 0 else months
+
+
+def ramp_sums(months, monthly_rate):
+    """
+    Sumas que fijan el valor final de una rampa lineal de n meses (g = 1 + r_m):
+
+      growth    = g^n
+      s0        = Σ g^k                     (k = 0..n-1)
+      slope_sum = Σ (j / (n-1))·g^(n-1-j)    (j = 0..n-1) = (s0 - n) / (r_m·(n-1))
+
+    de modo que FV = pv·growth + first·s0 + (last - first)·slope_sum. El valor final
+    es afín en la aportación final, que es lo que permite despejarla directamente.
+    Acepta escalares o arrays (con broadcasting).
+    """
+    n = np.asarray(months, dtype=float)
+    r_m = np.asarray(monthly_rate, dtype=float)
+    small = np.abs(n * r_m) < _SMALL_RATE_HORIZON
+    r_safe = np.where(small, 1.0, r_m)
+
+    log_g = np.log1p(r_m)
+    growth = np.exp(n * log_g)
+
+    # Serie de Taylor: Σ_k C(k, j) = C(n, j+1)  =>  s0 = n + C(n,2)·r + ..., U = C(n,2) + C(n,3)·r + ...
+    c2 = n * (n - 1.0) / 2.0
+    c3 = c2 * (n - 2.0) / 3.0
+    c4 = c3 * (n - 3.0) / 4.0
+    c5 = c4 * (n - 4.0) / 5.0
+    s0_small = n + r_m * (c2 + r_m * (c3 + r_m * c4))
+    u_small = c2 + r_m * (c3 + r_m * (c4 + r_m * c5))
+
+    s0_exact = np.expm1(n * np.where(small, 0.0, log_g)) / r_safe
+    s0 = np.where(small, s0_small, s0_exact)
+    # U = Σ (n-1-k)·g^k = (s0 - n) / r_m
+    u = np.where(small, u_small, (s0_exact - n) / r_safe)
+
+    # Con un único mes solo se aporta la cuota final
+    slope_sum = np.where(n > 1, u / np.maximum(n - 1.0, 1.0), s0)
+    return growth, s0, slope_sum
+
+
+def monthly_rate(annual_return, compounding: str = "nominal"):
+    """Tipo mensual equivalente a `annual_return` según la convención de capitalización."""
+    annual_return = np.asarray(annual_return, dtype=float)
+    if compounding == "nominal":
+        return annual_return / 12.0
+    if compounding == "geometric":
+        return np.expm1(np.log1p(annual_return) / 12.0)
+    raise ValueError(f"compounding debe ser uno de {COMPOUNDINGS}, no {compounding!r}")
+
+
+def contribution_growth(r_m, timing: str = "end"):
+    """
+    Factor que multiplica la parte de las aportaciones en el valor final: 1 si se
+    aporta a final de mes, (1 + r_m) si se aporta al inicio (capitaliza un mes más).
+    """
+    if timing == "end":
+        return np.ones_like(np.asarray(r_m, dtype=float))
+    if timing == "start":
+        return 1.0 + np.asarray(r_m, dtype=float)
+    raise ValueError(f"timing debe ser uno de {TIMINGS}, no {timing!r}")
+
+
+def _ramp_final_values(pv, first, last, months, r_m, timing="end"):
+    """Valor final en forma cerrada (O(1) por plan) de una rampa lineal de aportaciones."""
+    growth, s0, slope_sum = ramp_sums(months, r_m)
+    final = pv * growth + contribution_growth(r_m, timing) * (first * s0 + (last - first) * slope_sum)
+    return np.where(months > 0, final, pv)
+
+
+def solve_ramp_final_monthly(
+    goal,
+    initial_value,
+    initial_monthly,
+    years,
+    annual_return,
+    compounding: str = "nominal",
+    timing: str = "end",
+):
+    """
+    Aportación mensual final exacta para que una rampa lineal que empieza en
+    `initial_monthly` alcance `goal` (bruto) al cabo de `years` años.
+
+    Como FV = base + final·slope_sum, la solución es (goal - base) / slope_sum, sin
+    búsqueda binaria. No se acota el resultado: por debajo de initial_monthly
+    significa que con una rampa descendente (o plana) ya basta. Acepta arrays.
+    """
+    months = np.maximum(horizon_months(years), 1)
+    r_m = monthly_rate(annual_return, compounding)
+    growth, s0, slope_sum = ramp_sums(months, r_m)
+    k = contribution_growth(r_m, timing)
+    base = np.asarray(initial_value, dtype=float) * growth + k * np.asarray(initial_monthly, dtype=float) * (s0 - slope_sum)
+    return (np.asarray(goal, dtype=float) - base) / (k * slope_sum)
+
+
+def _ramp_contributions(first: float, last: float, months: int) -> np.ndarray:
+    """Aportación de cada mes de una rampa lineal; con un único mes se aporta 'last'."""
+    if months == 1:
+        return np.array([last], dtype=float)
+    return first + (last - first) * np.arange(months, dtype=float) / (months - 1)
+
+
+def simulate_dca_ramp(
+    initial_monthly: float,
+    final_monthly: float,
+    years: int,
+    annual_return: float,
+    initial_value: float = 0.0,
+    compounding: str = "nominal",
+    timing: str = "end",
+    with_series: bool = True,
+    dtype=np.float64,
+):
+    """
+    Simula un plan con aportaciones que crecen linealmente de initial_monthly a
+    final_monthly durante 'years' años, con rentabilidad anual constante.
+
+    El valor final sale en forma cerrada. La serie mensual (solo si with_series=True)
+    se obtiene sin bucles resolviendo la recurrencia v_m = g·v_(m-1) + c_m: con
+    F_m = g^(m+1), v_m = F_m·(pv + k·Σ_(j<=m) c_j / F_j), siendo k el factor de
+    contribution_growth. Se calcula en float64 y se guarda en `dtype`.
+
+    Devuelve:
+    - valor final
+    - MonthlySeries con el valor estimado mes a mes (None si with_series=False)
+    """
+    months = horizon_months(years)
+    pv = float(initial_value)
+    if months <= 0:
+        return pv, (MonthlySeries(np.empty(0), dtype=dtype) if with_series else None)
+
+    r_m = float(monthly_rate(annual_return, compounding))
+    value = float(_ramp_final_values(pv, float(initial_monthly), float(final_monthly), months, r_m, timing))
+    if not with_series:
+        return value, None
+
+    factors = np.cumprod(np.full(months, 1.0 + r_m))
+    contribs = _ramp_contributions(float(initial_monthly), float(final_monthly), months)
+    k = float(contribution_growth(r_m, timing))
+    series = factors * (pv + k * np.cumsum(contribs / factors))
+    return value, MonthlySeries(series, dtype=dtype)
+
+
+def simulate_constant_plan(
+    current_total: float,
+    monthly_contribution: float,
+    years: int,
+    annual_return: float,
+    extra_savings: float = 0.0,
+    compounding: str = "nominal",
+    timing: str = "end",
+    with_series: bool = True,
+    dtype=np.float64,
+):
+    """
+    Simula un plan con aportación mensual constante partiendo de current_total +
+    extra_savings. Mismo resultado que una rampa plana (ver simulate_dca_ramp).
+    """
+    return simulate_dca_ramp(
+        initial_monthly=monthly_contribution,
+        final_monthly=monthly_contribution,
+        years=years,
+        annual_return=annual_return,
+        initial_value=float(current_total) + float(extra_savings),
+        compounding=compounding,
+        timing=timing,
+        with_series=with_series,
+        dtype=dtype,
+    )
+
+
+def simulate_plans_batch(
+    initial_value,
+    initial_monthly,
+    final_monthly,
+    years,
+    annual_return,
+    final_only: bool = False,
+    dtype=np.float64,
+    compounding: str = "nominal",
+    timing: str = "end",
+):
+    """
+    Simula muchos planes a la vez. Todos los argumentos aceptan escalares o arrays
+    (se hace broadcasting entre ellos) y cada posición es un plan distinto:
+
+    - initial_value: valor inicial de la cartera (€)
+    - initial_monthly / final_monthly: aportación del primer y del último mes;
+      entre medias crece linealmente (iguales = aportación constante)
+    - years: horizonte en años (puede ser distinto en cada plan)
+    - annual_return: rentabilidad anual (0.07 = 7%)
+    - compounding / timing: convenciones de capitalización y de aportación
+
+    Con final_only=True devuelve solo el array 1-D de valores finales, calculado en
+    forma cerrada sin recorrer los meses. Si no, devuelve una matriz
+    (n_planes, max_meses) con el valor mes a mes; en los planes con horizonte más
+    corto, los meses posteriores a su final quedan enmascarados como NaN.
+    """
+    pv, first, last, years_arr, rate = np.broadcast_arrays(
+        np.asarray(initial_value, dtype=float),
+        np.asarray(initial_monthly, dtype=float),
+        np.asarray(final_monthly, dtype=float),
+        np.asarray(years, dtype=float),
+        np.asarray(annual_return, dtype=float),
+    )
+    pv, first, last = pv.ravel(), first.ravel(), last.ravel()
+    months = np.maximum(horizon_months(years_arr.ravel()), 0)
+    r_m = monthly_rate(rate.ravel(), compounding)
+    if timing not in TIMINGS:
+        raise ValueError(f"timing debe ser uno de {TIMINGS}, no {timing!r}")
+
+    if final_only:
+        return _ramp_final_values(pv, first, last, months, r_m, timing).astype(dtype, copy=False)
+
+    n_plans = pv.shape[0]
+    max_months = int(months.max()) if n_plans else 0
+    values = np.full((n_plans, max_months), np.nan, dtype=dtype)
+    if max_months == 0:
+        return values
+
+    # Pendiente de la rampa por mes; con un único mes se aporta directamente 'last'
+    step = np.where(months > 1, (last - first) / np.maximum(months - 1, 1), 0.0)
+    first_eff = np.where(months == 1, last, first)
+    growth = 1.0 + r_m
+
+    value = pv.copy()
+    for m in range(max_months):
+        if timing == "start":
+            value += first_eff + step * m
+            value *= growth
+        else:
+            value *= growth
+            value += first_eff + step * m
+        values[:, m] = value
+
+    # Máscara de horizontes mixtos: fuera del plan no hay valor
+    values[np.arange(max_months)[None, :] >= months[:, None]] = np.nan
+    return values
+
+
+def simulate_constant_plans(
+    current_total,
+    monthly_contribution,
+    years,
+    annual_return,
+    extra_savings=0.0,
+    final_only: bool = False,
+    dtype=np.float64,
+    compounding: str = "nominal",
+    timing: str = "end",
+):
+    """Versión por lotes de simulate_constant_plan, con los mismos argumentos en forma de arrays."""
+    initial_value = np.asarray(current_total, dtype=float) + np.asarray(extra_savings, dtype=float)
+    return simulate_plans_batch(
+        initial_value=initial_value,
+        initial_monthly=monthly_contribution,
+        final_monthly=monthly_contribution,
+        years=years,
+        annual_return=annual_return,
+        final_only=final_only,
+        dtype=dtype,
+        compounding=compounding,
+        timing=timing,
+    )
+
+
+def simulate_dca_ramps(
+    initial_monthly,
+    final_monthly,
+    years,
+    annual_return,
+    initial_value=0.0,
+    final_only: bool = False,
+    dtype=np.float64,
+    compounding: str = "nominal",
+    timing: str = "end",
+):
+    """Versión por lotes de simulate_dca_ramp, con los mismos argumentos en forma de arrays."""
+    return simulate_plans_batch(
+        initial_value=initial_value,
+        initial_monthly=initial_monthly,
+        final_monthly=final_monthly,
+        years=years,
+        annual_return=annual_return,
+        final_only=final_only,
+        dtype=dtype,
+        compounding=compounding,
+        timing=timing,
+    )
@@ -0,0 +1,208 @@
+"""
+Carga del universo de activos (TradeRepublic_Activos_Completo.csv) con caché en disco.
+
+Parsear el CSV (unas 13.500 filas) y limpiar sus columnas de texto cuesta más que
+todo lo demás del arranque de la app. La primera vez se guarda la tabla ya
+normalizada en un fichero Feather junto al CSV, con las columnas repetitivas
+(tipo, región, país, proveedor...) como categorías; los arranques siguientes
+leen ese fichero por columnas, sin parsear nada, en pocos milisegundos.
+
+La tabla incluye ya el tipo de activo normalizado a las categorías de la app
+(columna Tipo, ver normalize_asset_types), que así también sale de la caché.
+
+La caché guarda en sus metadatos el tamaño, la fecha de modificación y la huella
+(blake2b) del CSV del que sale: si el CSV cambia se reconstruye sola. Si solo
+cambia la fecha (copiado, checkout) pero no el contenido, se reaprovecha. Si
+pyarrow no está instalado o no se puede escribir en la carpeta, se lee el CSV
+como siempre.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+UNIVERSE_FILE = "TradeRepublic_Activos_Completo.csv"
+UNIVERSE_CACHE_SUFFIX = ".cache.feather"
+# Subir al cambiar la normalización, para que se rehagan las cachés ya escritas
+UNIVERSE_CACHE_VERSION = "2"
+# Columnas de texto libre (una por activo): se quedan como texto limpio
+UNIVERSE_TEXT_COLUMNS = ("ISIN", "Name", "Search_Key")
+# Columnas que la app espera aunque el CSV no las traiga
+UNIVERSE_REQUIRED_COLUMNS = ("Type", "Region", "Country", "ETF_Provider", "ETF_Subtype", "Currency_Name")
+# Columna con el tipo de activo de la app calculado a partir de Type
+UNIVERSE_TYPE_COLUMN = "Tipo"
+
+# Tipos de activo de la app y palabras del tipo original que llevan a cada uno. Se
+# prueban en este orden: gana la primera regla con alguna palabra contenida en el
+# tipo (en minúsculas); si ninguna casa, "Otro".
+ASSET_TYPES = ("ETF", "Acción", "Bono", "Derivado", "Criptomoneda", "Fondo", "Otro")
+ASSET_TYPE_RULES = (
+    ("ETF", ("etf", "index fund", "fund", "fonds")),
+    ("Acción", ("stock", "share", "equity", "aktion", "acción", "acciones")),
+    ("Bono", ("bond", "renta fija", "obligat")),
+    ("Criptomoneda", ("crypto", "bitcoin", "btc", "eth")),
+    ("Derivado", ("derivative", "option", "future", "warrant")),
+    ("Fondo", ("fund", "sicav", "fond")),
+)
+
+_META_PREFIX = b"planificador.universo."
+
+
+def universe_cache_path(source) -> Path:
+    """Fichero de caché de un CSV: el mismo nombre con el sufijo .cache.feather."""
+    source = Path(source)
+    return source.with_name(source.name + UNIVERSE_CACHE_SUFFIX)
+
+
+def universe_version(source=UNIVERSE_FILE) -> str:
+    """
+    Versión del CSV (tamaño y fecha de modificación), para usarla como clave de las
+    cachés que dependen del universo; "" si no existe.
+    """
+    try:
+        stat = Path(source).stat()
+    except OSError:
+        return ""
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def _file_digest(path: Path) -> str:
+    return hashlib.blake2b(path.read_bytes(), digest_size=16).hexdigest()
+
+
+def normalize_asset_type(raw_type) -> str:
+    """Tipo de activo de la app para un tipo del CSV ("" si viene vacío)."""
+    if not raw_type:
+        return ""
+    s = str(raw_type).strip().lower()
+    for asset_type, keywords in ASSET_TYPE_RULES:
+        if any(keyword in s for keyword in keywords):
+            return asset_type
+    return "Otro"
+
+
+def normalize_asset_types(raw_types) -> pd.Series:
+    """
+    normalize_asset_type para toda una columna: cada valor distinto se clasifica una
+    sola vez (el CSV solo tiene un puñado) y la columna se traduce por sus códigos.
+    Devuelve una columna categórica con las categorías de ASSET_TYPES (y "").
+    """
+    raw_types = pd.Series(raw_types)
+    codes, uniques = pd.factorize(raw_types, use_na_sentinel=True)
+    categories = ASSET_TYPES + ("",)
+    # Un código por valor distinto y, al final, el de los vacíos (código -1 de factorize)
+    lookup = np.asarray(
+        [categories.index(normalize_asset_type(value)) for value in list(uniques) + [np.nan]],
+        dtype=np.int64,
+    )
+    return pd.Series(
+        pd.Categorical.from_codes(lookup[codes], categories=list(categories)),
+        index=raw_types.index,
+        name=UNIVERSE_TYPE_COLUMN,
+    )
+
+
+def normalize_universe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Limpia la tabla leída del CSV: texto sin espacios sobrantes en las columnas de
+    texto libre, columnas esperadas siempre presentes, el resto de columnas de
+    texto como categorías y el tipo de activo de la app en la columna Tipo.
+    """
+    df = df.copy()
+    for col in UNIVERSE_TEXT_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.strip()
+    for col in UNIVERSE_REQUIRED_COLUMNS:
+        if col not in df.columns:
+            df[col] = ""
+    for col in df.columns:
+        if col not in UNIVERSE_TEXT_COLUMNS and pd.api.types.is_string_dtype(df[col]):
+            df[col] = df[col].astype("category")
+    df[UNIVERSE_TYPE_COLUMN] = normalize_asset_types(df["Type"])
+    return df
+
+
+def _read_cache(cache: Path, stat: os.stat_result, source: Path):
+    """
+    (tabla, huella): la tabla es None si la caché no corresponde al CSV actual; la
+    huella del CSV, si ha habido que calcularla.
+    """
+    import pyarrow.feather as feather
+
+    table = feather.read_table(cache, memory_map=False)
+    meta = {
+        key[len(_META_PREFIX):].decode(): value.decode()
+        for key, value in (table.schema.metadata or {}).items()
+        if key.startswith(_META_PREFIX)
+    }
+    if meta.get("version") != UNIVERSE_CACHE_VERSION:
+        return None, None
+    if meta.get("size") == str(stat.st_size) and meta.get("mtime_ns") == str(stat.st_mtime_ns):
+        return table, None
+    # Ha cambiado la fecha: solo se reconstruye si también ha cambiado el contenido
+    digest = _file_digest(source)
+    return (table if meta.get("digest") == digest else None), digest
+
+
+def _write_cache(df: pd.DataFrame, cache: Path, stat: os.stat_result, digest: str) -> None:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    meta = dict(table.schema.metadata or {})
+    for key, value in (
+        ("version", UNIVERSE_CACHE_VERSION),
+        ("size", stat.st_size),
+        ("mtime_ns", stat.st_mtime_ns),
+        ("digest", digest),
+    ):
+        meta[_META_PREFIX + key.encode()] = str(value).encode()
+    # Se escribe aparte y se renombra: nunca queda una caché a medias
+    tmp = cache.with_name(f"{cache.name}.{os.getpid()}.tmp")
+    try:
+        feather.write_feather(table.replace_schema_metadata(meta), tmp, compression="uncompressed")
+        os.replace(tmp, cache)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def load_universe(source=UNIVERSE_FILE, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Universo de activos normalizado (ver normalize_universe), desde la caché Feather
+    si está al día o desde el CSV, reconstruyendo la caché en ese caso.
+    """
+    source = Path(source)
+    stat = source.stat()
+    if not use_cache:
+        return normalize_universe(pd.read_csv(source))
+    try:
+        import pyarrow  # noqa: F401  (la caché es opcional)
+    except ImportError:
+        return normalize_universe(pd.read_csv(source))
+
+    cache = universe_cache_path(source)
+    digest = None
+    if cache.exists():
+        try:
+            table, digest = _read_cache(cache, stat, source)
+        except Exception:
+            table = None  # caché corrupta o de otra versión de pyarrow: se rehace
+        if table is not None:
+            df = table.to_pandas()
+            if digest is not None:
+                # Mismo contenido con otra fecha: se actualizan los metadatos
+                try:
+                    _write_cache(df, cache, stat, digest)
+                except OSError:
+                    pass
+            return df
+
+    df = normalize_universe(pd.read_csv(source))
+    try:
+        _write_cache(df, cache, stat, digest or _file_digest(source))
+    except OSError:
+        pass  # carpeta de solo lectura: se sigue sin caché
+    return df
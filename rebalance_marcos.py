@@ -1,87 +1,44 @@
+import argparse
+import json
 import math
-from dataclasses import dataclass
-from typing import Dict, List, Tuple
-
-
-@dataclass
-class Portfolio:
-    holdings: Dict[str, float]        # valor actual en € por activo
-    targets: Dict[str, float]         # porcentaje objetivo (0–1) por activo
-    asset_types: Dict[str, str] | None = None  # tipo de activo (acción, ETF, bono, cripto, etc.)
-
-    def total_value(self) -> float:
-        return sum(self.holdings.values())
-
-    def current_weights(self) -> Dict[str, float]:
-        total = self.total_value()
-        if total == 0:
-            return {k: 0.0 for k in self.holdings}
-        return {k: v / total for k, v in self.holdings.items()}
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from planificador import simulacion
+from planificador.backtest import common_history, load_price_history, policy_grid, sweep_policies
+from planificador.cache import memoize
+from planificador.cartera import Portfolio
+from planificador.fiscalidad import NO_TAX_BRACKETS, flat_rate_brackets
+from planificador.objetivos import required_constant_monthly_net, required_final_monthly_net
+from planificador.ordenes import plan_orders
+from planificador.resumen import ramp_yearly_contributions
+from planificador.series import MonthlySeries
+
+# Convenciones de este script: tipo mensual geométrico y aportación al inicio del mes
+COMPOUNDING = "geometric"
+TIMING = "start"
 
 
 def compute_contribution_plan(
     portfolio: Portfolio,
     monthly_contribution: float,
     rebalance_threshold: float = 0.0,
-) -> Dict[str, float]:
+) -> Dict[str, int]:
     """Devuelve cuánto deberías aportar este mes a cada activo
     para acercarte a los porcentajes objetivo, usando SOLO aportación
-    (no venta), con la opción de usar un umbral de rebalanceo.
+    (no venta), en euros enteros. Se reparte la aportación redondeada al
+    euro, de modo que el plan suma exactamente round(monthly_contribution);
+    los euros que sobran al redondear cada activo van, uno a uno, al activo
+    que más lejos queda de su objetivo.
     """
-    holdings = portfolio.holdings
-    targets = portfolio.targets
-
-    if set(holdings.keys()) != set(targets.keys()):
-        raise ValueError("Las claves de holdings y targets deben coincidir.")
-
-    total_before = portfolio.total_value()
-    total_after = total_before + monthly_contribution
-
-    current_w = portfolio.current_weights()
-
-    needed_raw: Dict[str, float] = {}
-    for asset, target_w in targets.items():
-        target_value = target_w * total_after
-        current_value = holdings[asset]
-
-        if rebalance_threshold > 0:
-            curr_weight = current_w.get(asset, 0.0)
-            diff = abs(curr_weight - target_w)
-            if diff < rebalance_threshold:
-                needed = max(0.0, target_value - current_value)
-            else:
-                needed = max(0.0, target_value - current_value)
-        else:
-            needed = max(0.0, target_value - current_value)
-
-        needed_raw[asset] = needed
-
-    total_needed = sum(needed_raw.values())
-
-    if total_needed == 0:
-        return {
-            asset: monthly_contribution * targets[asset]
-            for asset in holdings
-        }
-
-    contributions: Dict[str, float] = {}
-    for asset, needed in needed_raw.items():
-        if total_needed == 0:
-            share = 0.0
-        else:
-            share = needed / total_needed
-        contributions[asset] = share * monthly_contribution
-
-    contributions = {
-        asset: int(round(amount)) for asset, amount in contributions.items()
-    }
-
-    diff = int(round(monthly_contribution - sum(contributions.values())))
-    if diff != 0:
-        biggest = max(contributions, key=lambda k: contributions[k])
-        contributions[biggest] = contributions[biggest] + diff
-
-    return contributions
+    ordenes = plan_orders(portfolio, round(monthly_contribution), euro_step=1.0)
+    return {asset: int(round(amount)) for asset, amount in zip(ordenes.names.tolist(), ordenes.amounts.tolist())}
 
 
 def simulate_dca_ramp(
@@ -90,7 +47,7 @@ def simulate_dca_ramp(
     years: int,
     annual_return: float,
     initial_value: float = 0.0,
-) -> Tuple[float, List[float]]:
+) -> Tuple[float, MonthlySeries]:
     """Simula un plan donde:
       - Empiezas aportando `initial_monthly` €/mes
       - Terminas aportando `final_monthly` €/mes tras N años
@@ -98,29 +55,21 @@ def simulate_dca_ramp(
       - Rentabilidad anual constante
       - Devuelve: valor final y serie mensual de valores
     """
-    months = years * 12
-    if months <= 0:
+    if years * 12 <= 0:
         raise ValueError("years debe ser > 0")
-
-    monthly_values: List[float] = []
-    value = initial_value
-    r_m = (1 + annual_return) ** (1 / 12) - 1
-
-    for m in range(months):
-        if months == 1:
-            contrib = final_monthly
-        else:
-            contrib = initial_monthly + (final_monthly - initial_monthly) * (m / (months - 1))
-
-        value += contrib
-        value *= (1 + r_m)
-
-        monthly_values.append(value)
-
-    return value, monthly_values
+    return simulacion.simulate_dca_ramp(
+        initial_monthly,
+        final_monthly,
+        years,
+        annual_return,
+        initial_value=initial_value,
+        compounding=COMPOUNDING,
+        timing=TIMING,
+    )
 
 
 # === Funciones utilitarias para uso en Streamlit/app ===
+@memoize()
 def required_constant_monthly_for_goal(
     current_total: float,
     objetivo_final: float,
@@ -147,44 +96,17 @@ def required_constant_monthly_for_goal(
     if not (0.0 <= tax_rate <= 1.0):
         raise ValueError("tax_rate debe estar entre 0 y 1")
 
-    months = years * 12
-
-    def net_final_with_monthly(C: float) -> float:
-        """Calcula el patrimonio neto al final (después de impuestos sobre plusvalías)
-        utilizando una aportación mensual constante C.
-        """
-        C_int = int(round(C))
-        if C_int < 0:
-            C_int = 0
-        final_value, _ = simulate_constant_plan(
-            current_total=current_total,
-            monthly_contribution=C_int,
-            years=years,
-            annual_return=annual_return,
-            extra_savings=extra_savings,
-        )
-        principal_total = current_total + extra_savings + C_int * months
-        gain = max(0.0, final_value - principal_total)
-        tax = tax_rate * gain
-        net_final = final_value - tax
-        return net_final
-
-    # Si con 0 €/mes ya se alcanza el objetivo neto, no hace falta aportar
-    if net_final_with_monthly(0.0) >= objetivo_final:
-        return 0
-
-    # Búsqueda binaria sobre la aportación mensual necesaria
-    low = 0.0
-    high = max(objetivo_final / max(months, 1) * 2, 5000.0)
-    for _ in range(40):
-        mid = (low + high) / 2
-        net_val = net_final_with_monthly(mid)
-        if net_val < objetivo_final:
-            low = mid
-        else:
-            high = mid
-
-    return int(round(high))
+    monthly = required_constant_monthly_net(
+        objetivo_final,
+        current_total + extra_savings,
+        years,
+        annual_return,
+        brackets=flat_rate_brackets(tax_rate),
+        compounding=COMPOUNDING,
+        timing=TIMING,
+    )
+    # Menor aportación entera con la que se alcanza el objetivo neto
+    return max(0, math.ceil(monthly - 1e-9))
 
 
 def simulate_constant_plan(
@@ -193,27 +115,25 @@ def simulate_constant_plan(
     years: int,
     annual_return: float,
     extra_savings: float = 0.0,
-) -> Tuple[float, List[float]]:
+) -> Tuple[float, MonthlySeries]:
     """Simula un plan de aportaciones mensuales constantes, partiendo de un valor
     inicial (cartera + ahorros extra) y devolviendo el valor final y la serie
     mensual de valores.
     """
     if years <= 0:
         raise ValueError("years debe ser > 0")
-    months = years * 12
-    r_m = (1 + annual_return) ** (1 / 12) - 1
-
-    value = current_total + extra_savings
-    monthly_values: List[float] = []
-
-    for _ in range(months):
-        value += monthly_contribution
-        value *= (1 + r_m)
-        monthly_values.append(value)
-
-    return value, monthly_values
+    return simulacion.simulate_constant_plan(
+        current_total,
+        monthly_contribution,
+        years,
+        annual_return,
+        extra_savings=extra_savings,
+        compounding=COMPOUNDING,
+        timing=TIMING,
+    )
 
 
+@memoize()
 def required_growing_monthlies_for_goal(
     current_total: float,
     objetivo_final: float,
@@ -225,8 +145,10 @@ def required_growing_monthlies_for_goal(
 ) -> Tuple[int, List[Dict[str, int]]]:
     """Calcula una aportación mensual creciente (lineal) para alcanzar un objetivo.
 
-    Mantiene `initial_monthly` como aportación inicial y busca por búsqueda binaria
-    la aportación mensual final necesaria para aproximarse al objetivo.
+    Mantiene `initial_monthly` como aportación inicial y despeja de forma exacta la
+    aportación mensual final necesaria: el valor final de la rampa es afín en ella,
+    FV = base + final_monthly * pendiente, con dos sumas geométricas precalculadas
+    (sin búsqueda binaria ni simulaciones mes a mes).
 
     Tiene en cuenta opcionalmente un tipo impositivo `tax_rate` (0–1) sobre las
     plusvalías al final, asumiendo que se vende todo al final del periodo.
@@ -243,62 +165,266 @@ def required_growing_monthlies_for_goal(
     if not (0.0 <= tax_rate <= 1.0):
         raise ValueError("tax_rate debe estar entre 0 y 1")
 
-    months_total = years * 12
-
-    def net_final_con_final_monthly(final_monthly: float) -> float:
-        """Calcula el patrimonio neto al final (después de impuestos sobre plusvalías)
-        para una aportación mensual final dada en un esquema lineal creciente.
-        """
-        val, _ = simulate_dca_ramp(
-            initial_monthly=initial_monthly,
-            final_monthly=final_monthly,
-            years=years,
-            annual_return=annual_return,
-            initial_value=current_total + extra_savings,
-        )
-        # Suma de aportaciones en una rampa lineal: media * número de meses
-        contrib_total = months_total * (initial_monthly + final_monthly) / 2.0
-        principal_total = current_total + extra_savings + contrib_total
-        gain = max(0.0, val - principal_total)
-        tax = tax_rate * gain
-        net_final = val - tax
-        return net_final
-
-    # Búsqueda binaria sobre la aportación mensual final
-    low = 0.0
-    high = max(initial_monthly * 10, 5000.0)
-    for _ in range(30):
-        mid = (low + high) / 2
-        net_val = net_final_con_final_monthly(mid)
-        if net_val < objetivo_final:
-            low = mid
-        else:
-            high = mid
-
-    final_monthly_aprox = int(round((low + high) / 2))
-
-    # Construimos un resumen por año con aportaciones aproximadas
-    resumen_anual: List[Dict[str, int]] = []
-    for año in range(1, years + 1):
-        start_idx = (año - 1) * 12
-        end_idx = año * 12 - 1
-        if end_idx >= months_total:
-            end_idx = months_total - 1
-        if months_total > 1:
-            start_month = int(round(initial_monthly + (final_monthly_aprox - initial_monthly) * (start_idx / (months_total - 1))))
-            end_month = int(round(initial_monthly + (final_monthly_aprox - initial_monthly) * (end_idx / (months_total - 1))))
-        else:
-            start_month = final_monthly_aprox
-            end_month = final_monthly_aprox
-        avg_month = int(round((start_month + end_month) / 2))
-        resumen_anual.append({
-            "year": año,
-            "start": start_month,
-            "end": end_month,
-            "avg": avg_month,
-        })
+    final_monthly = required_final_monthly_net(
+        objetivo_final,
+        current_total + extra_savings,
+        initial_monthly,
+        years,
+        annual_return,
+        brackets=flat_rate_brackets(tax_rate),
+        compounding=COMPOUNDING,
+        timing=TIMING,
+    )
+    # Se acota a >= 0, igual que hacía la búsqueda binaria
+    final_monthly = max(0.0, final_monthly)
+    final_monthly_aprox = int(round(final_monthly))
+
+    # Resumen por año con aportaciones aproximadas (enteros)
+    resumen_anual: List[Dict[str, int]] = [
+        {"year": int(año), "start": int(inicio), "end": int(fin), "avg": int(media)}
+        for año, inicio, fin, media in zip(*ramp_yearly_contributions(initial_monthly, final_monthly_aprox, years))
+    ]
 
     return final_monthly_aprox, resumen_anual
+
+
+# === Rebalanceo por lotes de todas las carteras guardadas (sin preguntas) ===
+PORTFOLIOS_FILE = "carteras.json"
+# Con menos carteras que esto, arrancar procesos cuesta más de lo que ahorra
+POOL_MIN_PORTFOLIOS = 2000
+ORDER_COLUMNS = ["Cartera", "Activo", "Tipo", "Valor_actual_€", "Peso_actual_%", "Peso_objetivo_%", "Importe_orden_€"]
+
+
+def _to_float(value) -> float:
+    """Celda numérica de carteras.json → float (vacía o no numérica cuenta como 0, como en la app)."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return number if math.isfinite(number) else 0.0
+
+
+def portfolio_from_records(records: List[dict]) -> Portfolio:
+    """Cartera a partir de las filas guardadas por la app en carteras.json.
+
+    Ignora las filas sin nombre y, si los pesos objetivo no suman ~100%, los
+    normaliza, igual que la pestaña 1.
+    """
+    holdings: Dict[str, float] = {}
+    targets: Dict[str, float] = {}
+    asset_types: Dict[str, str] = {}
+    for row in records:
+        nombre = str(row.get("Activo", "")).strip()
+        if not nombre:
+            continue
+        holdings[nombre] = _to_float(row.get("Valor_actual_€"))
+        targets[nombre] = _to_float(row.get("Peso_objetivo_%")) / 100.0
+        asset_types[nombre] = str(row.get("Tipo", "")).strip()
+    portfolio = Portfolio(holdings=holdings, targets=targets, asset_types=asset_types)
+    suma_targets = float(portfolio.target_weights.sum())
+    if suma_targets <= 0:
+        raise ValueError("los pesos objetivo no pueden ser todos cero")
+    if abs(suma_targets - 1.0) > 0.01:
+        portfolio = portfolio.normalized()
+    return portfolio
+
+
+def plan_saved_portfolio(task: Tuple[str, List[dict], float, float]) -> Tuple[str, list, str]:
+    """Órdenes del mes para una cartera guardada.
+
+    Recibe (nombre, filas, aportación, importe mínimo por orden) y devuelve
+    (nombre, filas de órdenes, mensaje de error o ""). Es una función de módulo para
+    que se pueda mandar a otros procesos.
+    """
+    nombre, records, monthly_contribution, min_ticket = task
+    try:
+        portfolio = portfolio_from_records(records)
+        ordenes = plan_orders(portfolio, monthly_contribution, min_tickets=min_ticket, euro_step=1.0)
+    except (ValueError, TypeError, AttributeError) as exc:
+        return nombre, [], str(exc)
+    pesos = portfolio.current_weights() * 100.0
+    rows = [
+        (nombre, portfolio.names[i], portfolio.types[i], float(portfolio.values[i]), float(pesos[i]),
+         float(portfolio.target_weights[i] * 100.0), float(ordenes.amounts[i]))
+        for i in np.flatnonzero(ordenes.amounts > 0)
+    ]
+    return nombre, rows, ""
+
+
+def load_saved_portfolios(path: str) -> Dict[str, List[dict]]:
+    """Lee carteras.json: {nombre de la cartera: filas de la tabla de la pestaña 1}."""
+    with open(path, "r", encoding="utf-8") as f:
+        portfolios = json.load(f)
+    if not isinstance(portfolios, dict):
+        raise ValueError(f"'{path}' debe contener un diccionario {{nombre: filas}}")
+    return portfolios
+
+
+def iter_saved_portfolios(
+    portfolios: Dict[str, List[dict]] | str,
+    default_contribution: float,
+    contributions: Dict[str, float] | None = None,
+    min_ticket: float = 0.0,
+) -> Iterator[Tuple[str, List[dict], float, float]]:
+    """Genera, sobre la marcha, una tarea por cartera con su aportación del mes.
+
+    `portfolios` es el diccionario de load_saved_portfolios o la ruta de carteras.json.
+    """
+    contributions = contributions or {}
+    if not isinstance(portfolios, dict):
+        portfolios = load_saved_portfolios(portfolios)
+    for nombre, records in portfolios.items():
+        aportacion = _to_float(contributions.get(nombre, default_contribution))
+        yield nombre, records if isinstance(records, list) else [], aportacion, min_ticket
+
+
+def batch_rebalance(
+    tasks: Iterable[Tuple[str, List[dict], float, float]],
+    workers: int | None = None,
+    n_tasks: int | None = None,
+) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """Ejecuta el planificador sobre todas las tareas y junta las órdenes en una tabla.
+
+    Usa un pool de procesos si hay al menos POOL_MIN_PORTFOLIOS carteras y más de un
+    proceso disponible; si no, las procesa en este mismo proceso. Devuelve la tabla
+    de órdenes (columnas ORDER_COLUMNS) y un diccionario {cartera: error} con las que
+    no se han podido planificar. Las tareas se consumen sobre la marcha y las órdenes
+    se acumulan según llegan los resultados, sin guardar antes todas las tareas ni
+    todos los resultados; `n_tasks` (el número de tareas, si se conoce) solo sirve
+    para decidir si merece la pena el pool y el tamaño de sus lotes.
+    """
+    rows: list = []
+    errores: Dict[str, str] = {}
+
+    def collect(results) -> None:
+        for nombre, filas, error in results:
+            if error:
+                errores[nombre] = error
+            rows.extend(filas)
+
+    workers = workers or os.cpu_count() or 1
+    if n_tasks is not None and n_tasks >= POOL_MIN_PORTFOLIOS and workers > 1:
+        chunksize = max(1, n_tasks // (workers * 8))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            collect(pool.map(plan_saved_portfolio, tasks, chunksize=chunksize))
+    else:
+        collect(map(plan_saved_portfolio, tasks))
+    return pd.DataFrame.from_records(rows, columns=ORDER_COLUMNS), errores
+
+
+def write_orders(orders: pd.DataFrame, path: str) -> None:
+    """Guarda la tabla de órdenes en CSV o, si la extensión es .parquet, en Parquet."""
+    if path.lower().endswith(".parquet"):
+        orders.to_parquet(path, index=False)
+    else:
+        orders.to_csv(path, index=False)
+
+
+def batch_cli(args: argparse.Namespace) -> int:
+    contributions: Dict[str, float] = {}
+    if args.aportaciones:
+        with open(args.aportaciones, "r", encoding="utf-8") as f:
+            contributions = json.load(f)
+
+    start = time.perf_counter()
+    portfolios = load_saved_portfolios(args.carteras)
+    n_portfolios = len(portfolios)
+    tasks = iter_saved_portfolios(portfolios, args.aportacion, contributions, args.minimo_orden)
+    orders, errores = batch_rebalance(tasks, workers=args.procesos, n_tasks=n_portfolios)
+    write_orders(orders, args.salida)
+    elapsed = time.perf_counter() - start
+
+    for nombre, error in errores.items():
+        print(f"Cartera '{nombre}' omitida: {error}", file=sys.stderr)
+    ritmo = n_portfolios / elapsed if elapsed > 0 else float("inf")
+    print(
+        f"{n_portfolios - len(errores)}/{n_portfolios} carteras planificadas, {len(orders)} órdenes "
+        f"({orders['Importe_orden_€'].sum():,.0f} €) → '{args.salida}'"
+    )
+    print(f"Tiempo: {elapsed:.2f} s ({ritmo:,.0f} carteras/s)")
+    return 1 if errores else 0
+
+
+def _float_list(text: str) -> List[float]:
+    """'100, 300,500' → [100.0, 300.0, 500.0]"""
+    return [float(part) for part in text.replace(";", ",").split(",") if part.strip()]
+
+
+def backtest_cli(args: argparse.Namespace) -> int:
+    with open(args.carteras, "r", encoding="utf-8") as f:
+        records = json.load(f).get(args.cartera)
+    if not records:
+        print(f"No existe la cartera '{args.cartera}' en '{args.carteras}'.", file=sys.stderr)
+        return 1
+    df = pd.DataFrame(records)
+    df = df[df.get("ISIN", pd.Series("", index=df.index)).astype(str).str.strip().ne("")]
+    if df.empty:
+        print(f"La cartera '{args.cartera}' no tiene ningún activo con ISIN.", file=sys.stderr)
+        return 1
+    portfolio = Portfolio.from_frame(df.assign(Activo=df["ISIN"].astype(str).str.strip().str.upper()))
+
+    prices = common_history(load_price_history(args.precios, isins=portfolio.names))
+    policies = policy_grid(
+        _float_list(args.aportaciones),
+        bands=[band / 100.0 for band in _float_list(args.bandas)],
+        check_every=[int(every) for every in _float_list(args.revisiones)],
+    )
+    initial_value = portfolio.total_value() if args.capital_inicial is None else args.capital_inicial
+
+    start = time.perf_counter()
+    result = sweep_policies(prices, portfolio.target_weights, policies, initial_value, workers=args.procesos)
+    elapsed = time.perf_counter() - start
+
+    df_result = result.to_frame()
+    write_orders(df_result, args.salida)
+    print(
+        f"{len(policies)} políticas × {prices.shape[1]} activos × {prices.shape[0]} meses "
+        f"({prices.index[0]:%Y-%m} a {prices.index[-1]:%Y-%m}) → '{args.salida}'"
+    )
+    print(f"Tiempo: {elapsed:.2f} s ({len(policies) / elapsed if elapsed > 0 else float('inf'):,.0f} políticas/s)")
+    print(df_result.sort_values("Valor_final_€", ascending=False).head(10).to_string(index=False))
+    return 0
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Planificador de aportaciones. Sin argumentos arranca el asistente interactivo."
+    )
+    subparsers = parser.add_subparsers(dest="comando")
+    lote = subparsers.add_parser(
+        "lote",
+        help="Calcula las órdenes del mes de todas las carteras guardadas y las escribe en un fichero.",
+    )
+    lote.add_argument("--carteras", default=PORTFOLIOS_FILE, help="Fichero de carteras guardadas (por defecto carteras.json).")
+    lote.add_argument("--aportacion", type=float, default=0.0, help="Aportación mensual (€) de las carteras sin una propia.")
+    lote.add_argument("--aportaciones", help="JSON {cartera: aportación €} con la aportación de cada cartera.")
+    lote.add_argument("--minimo-orden", type=float, default=0.0, help="Importe mínimo por orden (€).")
+    lote.add_argument("--salida", default="ordenes.csv", help="Fichero de salida (.csv o .parquet).")
+    lote.add_argument("--procesos", type=int, default=None, help="Procesos a usar (por defecto, todos los núcleos).")
+
+    backtest = subparsers.add_parser(
+        "backtest",
+        help="Compara políticas de solo aportación y de rebalanceo con bandas sobre precios históricos.",
+    )
+    backtest.add_argument("--precios", required=True, help="Carpeta con un <ISIN>.csv por activo o CSV con una columna por ISIN.")
+    backtest.add_argument("--cartera", required=True, help="Nombre de la cartera guardada (usa sus ISIN y pesos objetivo).")
+    backtest.add_argument("--carteras", default=PORTFOLIOS_FILE, help="Fichero de carteras guardadas (por defecto carteras.json).")
+    backtest.add_argument("--aportaciones", default="300", help="Aportaciones mensuales (€) a probar, separadas por comas.")
+    backtest.add_argument("--bandas", default="1,2,5", help="Bandas de tolerancia (puntos) a probar, separadas por comas.")
+    backtest.add_argument("--revisiones", default="1,3,12", help="Meses entre revisiones de la banda, separados por comas.")
+    backtest.add_argument("--capital-inicial", type=float, default=None, help="Capital inicial (€); por defecto, el valor actual de la cartera.")
+    backtest.add_argument("--salida", default="backtest.csv", help="Fichero de resultados (.csv o .parquet).")
+    backtest.add_argument("--procesos", type=int, default=None, help="Procesos a usar (por defecto, todos los núcleos).")
+    args = parser.parse_args(argv)
+
+    if args.comando == "lote":
+        return batch_cli(args)
+    if args.comando == "backtest":
+        return backtest_cli(args)
+    interactive_cli()
+    return 0
+
+
 def interactive_cli():
     print("¡Bienvenido/a! Este script te ayuda a planificar tus aportaciones mensuales para acercar tu cartera a los porcentajes objetivo mediante nuevas inversiones, y te permite simular planes de aportación creciente con diferentes escenarios de rentabilidad.")
     print()
@@ -388,9 +514,8 @@ def interactive_cli():
     total = portfolio.total_value()
     print(f"Valor total actual: {total:,.2f} €")
     print("Pesos actuales por activo:")
-    pesos_actuales = portfolio.current_weights()
-    for asset in holdings:
-        print(f"  {asset:15s}: {pesos_actuales[asset]*100:6.2f} %")
+    for asset, peso in zip(portfolio.names, portfolio.current_weights()):
+        print(f"  {asset:15s}: {peso*100:6.2f} %")
     print("Pesos objetivo por activo:")
     for asset in targets:
         print(f"  {asset:15s}: {targets[asset]*100:6.2f} %")
@@ -435,14 +560,18 @@ def interactive_cli():
 
         modo = input("¿Quieres aportaciones constantes (c) o crecientes cada año (g)? ").strip().lower()
         if modo == "c":
-            r_m = (1 + annual_return) ** (1 / 12) - 1
-            months = years * 12
-            valor_inicial_futuro = portfolio.total_value() * (1 + r_m) ** months
-            objetivo_aportes = objetivo_final - valor_inicial_futuro
-            if objetivo_aportes <= 0:
+            C = required_constant_monthly_net(
+                objetivo_final,
+                portfolio.total_value(),
+                years,
+                annual_return,
+                brackets=NO_TAX_BRACKETS,
+                compounding=COMPOUNDING,
+                timing=TIMING,
+            )
+            if C <= 0:
                 print("Con lo que ya tienes y esa rentabilidad, no haría falta aportar (o bastaría con 0 €/mes).")
             else:
-                C = objetivo_aportes * r_m / ((1 + r_m) ** months - 1)
                 C_rounded = int(round(C))
                 print(f"\nPara alcanzar {objetivo_final:,.2f} € en {years} años con una rentabilidad anual del {annual_return_input:.2f}%,")
                 print(f"deberías aportar aproximadamente {C_rounded:d} € al mes de forma constante.")
@@ -460,50 +589,21 @@ def interactive_cli():
                 except ValueError:
                     print("Por favor, introduce un número válido (ejemplo: 150).")
 
-            def valor_final_con_final_monthly(final_monthly: float) -> float:
-                val, _ = simulate_dca_ramp(
-                    initial_monthly=initial_monthly,
-                    final_monthly=final_monthly,
-                    years=years,
-                    annual_return=annual_return,
-                    initial_value=portfolio.total_value(),
-                )
-                return val
-
-            low = 0.0
-            high = max(initial_monthly * 10, 5000.0)
-            for _ in range(30):
-                mid = (low + high) / 2
-                val = valor_final_con_final_monthly(mid)
-                if val < objetivo_final:
-                    low = mid
-                else:
-                    high = mid
-            final_monthly_aprox = int(round((low + high) / 2))
-            final_value, monthly_values = simulate_dca_ramp(
-                initial_monthly=initial_monthly,
-                final_monthly=final_monthly_aprox,
+            final_monthly_aprox, resumen_anual = required_growing_monthlies_for_goal(
+                current_total=portfolio.total_value(),
+                objetivo_final=objetivo_final,
                 years=years,
                 annual_return=annual_return,
-                initial_value=portfolio.total_value(),
+                initial_monthly=initial_monthly,
             )
             print(f"\nPara alcanzar aproximadamente {objetivo_final:,.2f} € en {years} años con rentabilidad anual del {annual_return_input:.2f}% y aportaciones crecientes,")
             print(f"deberías empezar aportando {int(round(initial_monthly))} € al mes y terminar aportando {final_monthly_aprox} € al mes.")
             print("\nTabla de aportaciones aproximadas por año:")
-            months_per_year = 12
-            for año in range(1, years + 1):
-                start_idx = (año - 1) * months_per_year
-                end_idx = año * months_per_year - 1
-                if end_idx >= len(monthly_values):
-                    end_idx = len(monthly_values) - 1
-                # Aportación mensual al principio y al final del año (aprox)
-                start_month = int(round(initial_monthly + (final_monthly_aprox - initial_monthly) * (start_idx / (years * 12 - 1)))) if years*12 > 1 else final_monthly_aprox
-                end_month = int(round(initial_monthly + (final_monthly_aprox - initial_monthly) * (end_idx / (years * 12 - 1)))) if years*12 > 1 else final_monthly_aprox
-                avg_month = int(round((start_month + end_month) / 2))
-                print(f"Año {año:2d}: inicio ~{start_month} €, fin ~{end_month} €, media ~{avg_month} € / mes")
+            for fila in resumen_anual:
+                print(f"Año {fila['year']:2d}: inicio ~{fila['start']} €, fin ~{fila['end']} €, media ~{fila['avg']} € / mes")
         else:
             print("Modo no reconocido. Por favor, elige 'c' para constante o 'g' para creciente.")
 
 
 if __name__ == "__main__":
-    interactive_cli()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,57 @@
+"""
+Objetivos jerárquicos: el reparto por el árbol no pierde dinero y las hojas sin
+activo en la cartera se tratan como activos nuevos.
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from planificador.arbol import TargetTree, tree_contribution
+from planificador.cartera import Portfolio
+
+
+def _random_portfolio(rng, n):
+    names = [f"A{i}" for i in range(n)]
+    return Portfolio(
+        {name: rng.choice([0.0, rng.uniform(100, 20_000)]) for name in names},
+        {name: rng.uniform(1, 30) for name in names},
+        {name: rng.choice(["ETF", "Acción", "Bono"]) for name in names},
+    )
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_asset_plan_sums_to_contribution(seed):
+    rng = random.Random(seed)
+    portfolio = _random_portfolio(rng, rng.randint(2, 8))
+    contribution = rng.uniform(50, 5_000)
+    tree = TargetTree.from_portfolio(portfolio)
+
+    plan = tree_contribution(tree, portfolio, contribution, bands=[rng.choice([0.0, 0.05]), 0.02])
+    assert plan.asset_names.tolist() == portfolio.names.tolist()
+    assert plan.asset_contributions.sum() == pytest.approx(contribution)
+    assert np.all(plan.asset_contributions >= -1e-9)
+
+
+def test_leaves_without_asset_are_new_assets():
+    portfolio = Portfolio({"ETF X": 6_000.0, "ETF Y": 4_000.0}, {"ETF X": 0.5, "ETF Y": 0.5})
+    tree = TargetTree(
+        ["RV", "RF", "RV/ETF X", "RV/ETF Y", "RF/Bono Z", "RF/Bono W"],
+        [70, 30, 50, 50, 50, 50],
+    )
+    plan = tree_contribution(tree, portfolio, 1_000.0)
+
+    assert plan.asset_names.tolist() == ["ETF X", "ETF Y", "Bono Z", "Bono W"]
+    assert plan.asset_contributions.sum() == pytest.approx(1_000.0)
+    # La renta fija está vacía y muy por debajo de su 30 %: se lleva toda la aportación
+    assert plan.asset_contributions[2:].sum() == pytest.approx(1_000.0)
+
+
+def test_from_portfolio_reproduces_flat_weights():
+    rng = random.Random(3)
+    portfolio = _random_portfolio(rng, 6)
+    tree = TargetTree.from_portfolio(portfolio)
+    leaf_weights = tree.global_weights()[tree.leaves]
+    positions = tree.leaf_positions(portfolio.names)
+    assert leaf_weights == pytest.approx(portfolio.target_weights[positions] / portfolio.target_weights.sum())
@@ -0,0 +1,100 @@
+"""
+Backtest vectorial de políticas frente a una simulación de una política cada vez
+con las funciones de la pestaña 1.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from planificador.backtest import (
+    backtest_policies,
+    common_history,
+    load_price_history,
+    policy_grid,
+    sweep_policies,
+)
+from planificador.cartera import Portfolio, contribution_vector
+from planificador.rebalanceo import rebalance_to_band
+
+
+def _random_prices(seed, months=48, n=4):
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0.006, 0.045, size=(months - 1, n))
+    start = rng.uniform(20, 200, size=n)
+    return np.vstack([start, start * np.cumprod(1.0 + returns, axis=0)])
+
+
+def _single_policy(prices, targets, policy, initial_value):
+    """Una política, mes a mes, con Portfolio, contribution_vector y rebalance_to_band."""
+    names = [f"A{i}" for i in range(prices.shape[1])]
+    targets = np.asarray(targets) / np.sum(targets)
+    values = targets * initial_value
+    turnover, rebalances, deviations = 0.0, 0, []
+    for t in range(prices.shape[0]):
+        if t > 0:
+            values = values * prices[t] / prices[t - 1]
+        portfolio = Portfolio.from_arrays(names, values, targets)
+        values = values + contribution_vector(portfolio, policy.monthly_contribution)
+        if policy.rebalance != "none" and t % policy.check_every == 0:
+            result = rebalance_to_band(values, targets, policy.band, target=policy.rebalance)
+            values = result.values_after
+            turnover += result.turnover
+            rebalances += result.turnover > 1e-6
+        deviations.append(np.abs(values / values.sum() - targets).max())
+    return values.sum(), turnover, rebalances, np.mean(deviations)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_vectorized_backtest_matches_single_policy_loop(seed):
+    prices = _random_prices(seed)
+    targets = [0.4, 0.3, 0.2, 0.1]
+    policies = policy_grid([0.0, 250.0, 1_000.0], bands=[0.0, 0.02, 0.05], check_every=[1, 3, 12])
+    result = backtest_policies(prices, targets, policies, initial_value=10_000.0)
+
+    assert len(result.policies) == len(policies)
+    assert result.contributed == pytest.approx([10_000.0 + p.monthly_contribution * 48 for p in policies])
+    for i, policy in enumerate(policies):
+        terminal, turnover, rebalances, deviation = _single_policy(prices, targets, policy, 10_000.0)
+        assert result.terminal_value[i] == pytest.approx(terminal, rel=1e-9)
+        assert result.turnover[i] == pytest.approx(turnover, rel=1e-9, abs=1e-6)
+        assert result.rebalances[i] == rebalances
+        assert result.mean_deviation[i] == pytest.approx(deviation, rel=1e-9, abs=1e-12)
+
+
+def test_buy_and_hold_has_no_tracking_error_when_it_stays_on_target():
+    # Todos los activos con la misma rentabilidad: la cartera nunca se desvía
+    prices = np.outer(np.linspace(100, 180, 36), np.ones(3))
+    result = backtest_policies(prices, [0.5, 0.3, 0.2], policy_grid([0.0, 100.0], rebalances=("none",)), 3_000.0)
+    assert result.tracking_error == pytest.approx([0.0, 0.0], abs=1e-12)
+    assert result.mean_deviation == pytest.approx([0.0, 0.0], abs=1e-12)
+    assert result.terminal_value[0] == pytest.approx(3_000.0 * 1.8)
+
+
+def test_sweep_in_blocks_matches_one_block():
+    prices = pd.DataFrame(_random_prices(9), index=pd.date_range("2018-01-31", periods=48, freq="ME"))
+    policies = policy_grid([100.0, 500.0], bands=[0.01, 0.03], check_every=[1, 6])
+    whole = backtest_policies(prices, [0.25] * 4, policies, 5_000.0)
+    parts = sweep_policies(prices, [0.25] * 4, policies, 5_000.0, workers=1)
+    assert parts.terminal_value == pytest.approx(whole.terminal_value)
+    assert list(whole.dates) == list(prices.index)
+    assert len(whole.to_frame()) == len(policies)
+
+
+def test_price_folder_and_wide_csv_give_the_same_history(tmp_path):
+    dates = pd.date_range("2020-01-01", "2020-06-30", freq="D")
+    rng = np.random.default_rng(0)
+    folder = tmp_path / "precios"
+    folder.mkdir()
+    wide = {"Fecha": dates}
+    for isin, start in (("IE00B4L5Y983", 3), ("LU0290358497", 0)):
+        price = 100 * np.cumprod(1 + rng.normal(0, 0.01, size=dates.size))
+        price[:start * 30] = np.nan  # el segundo activo empieza a cotizar más tarde
+        pd.DataFrame({"Date": dates, "Close": price}).dropna().to_csv(folder / f"{isin}.csv", index=False)
+        wide[isin] = price
+    pd.DataFrame(wide).to_csv(tmp_path / "precios.csv", index=False)
+
+    from_folder = common_history(load_price_history(folder))
+    from_csv = common_history(load_price_history(tmp_path / "precios.csv"))
+    pd.testing.assert_frame_equal(from_folder, from_csv, check_freq=False, check_names=False)
+    assert len(from_folder) == 4 and not from_folder.isna().any().any()
@@ -0,0 +1,79 @@
+"""
+Buscador de instrumentos: orden por relevancia (ISIN exacto > prefijo de ISIN >
+palabras) y paginación.
+"""
+
+import numpy as np
+import pytest
+
+from planificador.busqueda import InstrumentIndex
+
+ISINS = ["IE00B4L5Y983", "IE00B4L5Y984", "LU0000000001", "DE0007236101", "US0378331005"]
+NAMES = [
+    "iShares Core MSCI World",
+    "iShares Core MSCI World Acc",
+    "Tracker IE00B4L5Y983 Replica",
+    "Siemens",
+    "Apple",
+]
+
+
+@pytest.fixture
+def index():
+    return InstrumentIndex(ISINS, NAMES)
+
+
+def test_exact_isin_ranks_above_prefix_and_token_matches(index):
+    result = index.search("IE00B4L5Y983")
+    # Fila 0: ISIN exacto; fila 2: solo lleva el ISIN como palabra del nombre
+    assert result.rows.tolist() == [0, 2]
+
+    # Prefijo de ISIN por encima de la palabra del nombre que empieza igual
+    result = index.search("ie00b4l5")
+    assert result.rows.tolist() == [0, 1, 2]
+    scores = index.scores("ie00b4l5")
+    assert scores[0] == scores[1] > scores[2] > 0
+
+
+def test_token_matches_prefer_exact_words_and_shorter_names(index):
+    assert index.search("world").rows.tolist() == [0, 1]
+    assert index.search("sie").rows.tolist() == [3]
+    # Todas las palabras tienen que casar
+    assert index.search("msci acc").rows.tolist() == [1]
+
+
+@pytest.mark.parametrize("query", ["", "   ", "zzzz qqqq"])
+def test_empty_result_still_has_one_page(index, query):
+    result = index.search(query, page=3)
+    assert result.total == 0
+    assert result.pages == 1
+    assert result.page == 0
+    assert result.rows.size == 0
+
+
+def test_pages_cover_every_result_once():
+    n = 45
+    index = InstrumentIndex([f"IE{i:010d}" for i in range(n)], [f"Fondo {i}" for i in range(n)])
+    first = index.search("fondo", page_size=20)
+    assert (first.total, first.pages) == (n, 3)
+    rows = np.concatenate([index.search("fondo", page=p, page_size=20).rows for p in range(first.pages)])
+    assert sorted(rows.tolist()) == list(range(n))
+    # Página fuera de rango: la última
+    assert index.search("fondo", page=10, page_size=20).page == 2
+
+
+def test_typos_are_found_and_reported_as_corrected(index):
+    result = index.search("ishres wrld")
+    assert result.rows.tolist() == [0, 1]
+    assert result.corrected == ("ishres", "wrld")
+    # Un prefijo de una palabra existente no es una errata
+    assert index.search("ishar").corrected == ()
+    assert index.search("aple").corrected == ("aple",)
+    # Palabras de menos de FUZZY_MIN_LENGTH letras no se corrigen
+    assert index.search("apl").total == 0
+
+
+def test_fuzzy_terms_respect_the_edit_distance(index):
+    terms = {index.terms[term_id]: distance for term_id, distance in index.fuzzy_terms("siemnes")}
+    assert terms == {"siemens": 1}  # transposición
+    assert index.fuzzy_terms("sxemxns", max_distance=1) == []
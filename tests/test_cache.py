@@ -0,0 +1,89 @@
+"""
+Caché de memoización: LRU acotada, contadores, invalidación por espacio de
+nombres y copias de los resultados mutables.
+"""
+
+import numpy as np
+import pytest
+
+from planificador.cache import MemoCache, memoize, normalize_key
+
+
+def test_lru_evicts_least_recently_used():
+    cache = MemoCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    # Leer "a" la convierte en la más reciente: la siguiente expulsada es "b"
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert len(cache) == 2
+    assert cache.get("b", None) is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_hit_and_miss_counters():
+    cache = MemoCache(maxsize=4)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("a")
+    cache.get("x", None)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"], stats["maxsize"]) == (2, 1, 1, 4)
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+
+
+def test_invalidate_namespace_and_all():
+    cache = MemoCache()
+    cache.put(("f", 1), "f1")
+    cache.put(("f", 2), "f2")
+    cache.put(("g", 1), "g1")
+    assert cache.invalidate("f") == 2
+    assert cache.get(("f", 1), None) is None
+    assert cache.get(("g", 1)) == "g1"
+    assert cache.invalidate() == 1
+    assert len(cache) == 0
+
+
+def test_maxsize_must_be_positive():
+    with pytest.raises(ValueError):
+        MemoCache(maxsize=0)
+
+
+def test_memoize_rounds_floats_in_key():
+    cache = MemoCache()
+    calls = []
+
+    @memoize("test.doble", cache=cache)
+    def doble(x, factor=2.0):
+        calls.append(x)
+        return x * factor
+
+    assert doble(150) == doble(150.0) == doble(150.0000000001) == doble(x=150, factor=2)
+    assert len(calls) == 1
+    assert normalize_key(0.1234564) != normalize_key(0.1234566)
+    assert doble.cache_invalidate() == 1
+
+
+def test_memoize_hands_out_independent_mutable_results():
+    cache = MemoCache()
+
+    @memoize("test.resultados", cache=cache)
+    def resultados(n):
+        return np.arange(float(n)), [{"n": n}]
+
+    array, rows = resultados(3)
+    # El array devuelto en el fallo es el de la función, sin tocar
+    assert array.flags.writeable
+    array[0] = 99.0
+    rows[0]["n"] = -1
+    rows.append({})
+
+    again, again_rows = resultados(3)
+    assert isinstance(again_rows, list) and isinstance(again_rows[0], dict)
+    assert again.tolist() == [0.0, 1.0, 2.0]
+    assert again_rows == [{"n": 3}]
+    # Cada acierto recibe su propia copia, modificable
+    again[0] = 7.0
+    assert resultados(3)[0][0] == 0.0
@@ -0,0 +1,89 @@
+"""
+Reparto de la aportación solo con compras (water-filling).
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from planificador.cartera import (
+    Portfolio,
+    compute_contribution_plan,
+    contribution_vector,
+    grouped_waterfill,
+    waterfill_allocation,
+)
+
+
+def _random_gaps(rng, n):
+    return np.array([rng.choice([rng.uniform(-5_000, 5_000), 0.0, 1_000.0]) for _ in range(n)])
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_waterfill_is_optimal(seed):
+    rng = random.Random(seed)
+    gaps = _random_gaps(rng, rng.randint(1, 12))
+    budget = rng.choice([0.0, rng.uniform(1, 500), rng.uniform(1_000, 50_000)])
+
+    x = waterfill_allocation(gaps, budget)
+    assert np.all(x >= 0)
+    assert x.sum() == pytest.approx(budget, abs=1e-6)
+    if budget > 0:
+        # Condiciones de optimalidad: los que reciben dinero acaban con el mismo
+        # desfase μ y ninguno de los demás tiene un desfase mayor que μ
+        receives = x > 1e-9
+        left = gaps - x
+        mu = left[receives].max()
+        assert left[receives] == pytest.approx(np.full(receives.sum(), mu), abs=1e-6)
+        assert np.all(left[~receives] <= mu + 1e-6)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_waterfill_beats_random_feasible_plans(seed):
+    rng = np.random.default_rng(seed)
+    gaps = rng.uniform(-1_000, 3_000, size=8)
+    budget = 2_500.0
+    best = np.sum((gaps - waterfill_allocation(gaps, budget)) ** 2)
+    for weights in rng.dirichlet(np.ones(gaps.size), size=200):
+        assert best <= np.sum((gaps - weights * budget) ** 2) + 1e-6
+
+
+def test_grouped_waterfill_matches_per_group():
+    rng = random.Random(7)
+    groups = np.array([rng.randint(0, 3) for _ in range(30)])
+    gaps = _random_gaps(rng, groups.size)
+    budgets = np.array([0.0, 150.0, 3_000.0, 40_000.0])
+
+    result = grouped_waterfill(groups, gaps, budgets)
+    for g, budget in enumerate(budgets):
+        members = groups == g
+        assert result[members] == pytest.approx(waterfill_allocation(gaps[members], budget), abs=1e-6)
+
+
+@pytest.mark.parametrize("method", ["waterfill", "proportional"])
+@pytest.mark.parametrize("seed", range(10))
+def test_contribution_plan_sums_to_contribution(seed, method):
+    rng = random.Random(seed)
+    names = [f"A{i}" for i in range(rng.randint(1, 8))]
+    portfolio = Portfolio(
+        {name: rng.choice([0.0, rng.uniform(10, 30_000)]) for name in names},
+        {name: rng.uniform(0, 40) for name in names},
+    )
+    contribution = rng.uniform(1, 3_000)
+
+    plan = compute_contribution_plan(portfolio, contribution, method=method)
+    assert list(plan) == names
+    assert sum(plan.values()) == pytest.approx(contribution)
+    assert min(plan.values()) >= 0
+    assert contribution_vector(portfolio, contribution, method=method) == pytest.approx(list(plan.values()))
+
+
+def test_waterfill_levels_final_weights():
+    # Tres activos muy infraponderados: todos acaban con el mismo déficit frente a su objetivo
+    portfolio = Portfolio({"A": 9_000.0, "B": 0.0, "C": 500.0, "D": 500.0}, {"A": 0.25, "B": 0.25, "C": 0.25, "D": 0.25})
+    plan = contribution_vector(portfolio, 1_000.0)
+    after = portfolio.values + plan
+    goal = 0.25 * after.sum()
+    assert plan[0] == 0.0
+    assert goal - after[1:] == pytest.approx(np.full(3, goal - after[1]))
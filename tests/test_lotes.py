@@ -0,0 +1,109 @@
+"""
+Registro de lotes FIFO: base de coste frente a un recorrido lote a lote y
+propuesta de rebalanceo con menos impuestos.
+"""
+
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from planificador.fiscalidad import progressive_tax
+from planificador.lotes import LotLedger, lowest_tax_band_rebalance
+from planificador.rebalanceo import band_edges, rebalance_to_band
+
+
+def _random_ledger(rng, names):
+    rows = []
+    for name in names:
+        for _ in range(rng.randint(0, 8)):
+            units = rng.uniform(0.5, 50)
+            rows.append(
+                (
+                    name,
+                    pd.Timestamp("2015-01-01") + pd.Timedelta(days=rng.randint(0, 3000)),
+                    units,
+                    units * rng.uniform(5, 40),
+                )
+            )
+    df = pd.DataFrame(rows, columns=["Activo", "Fecha", "Unidades", "Coste_€"])
+    return df, LotLedger.from_frame(df)
+
+
+def _naive_cost_basis(df, name, value, sale):
+    """Base de coste FIFO recorriendo los lotes del activo uno a uno."""
+    # No se puede vender más de lo que vale la posición
+    sale = min(sale, value)
+    lots = df[df["Activo"] == name].sort_values("Fecha", kind="stable")
+    held = lots["Unidades"].sum()
+    if lots.empty or held <= 0 or value <= 0:
+        return sale
+    to_sell = sale / value * held
+    basis = 0.0
+    for units, cost in zip(lots["Unidades"], lots["Coste_€"]):
+        take = min(units, to_sell)
+        basis += cost * take / units
+        to_sell -= take
+        if to_sell <= 0:
+            break
+    return basis
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_cost_basis_matches_lot_by_lot_fifo(seed):
+    rng = random.Random(seed)
+    names = [f"A{i}" for i in range(5)]
+    df, ledger = _random_ledger(rng, names)
+    values = np.array([rng.uniform(0, 20_000) for _ in names])
+    sales = np.array([rng.choice([0.0, rng.uniform(0, v), v, v * 2]) for v in values])
+
+    basis = ledger.cost_basis(names, values, sales)
+    expected = [_naive_cost_basis(df, n, v, s) for n, v, s in zip(names, values, sales)]
+    assert basis == pytest.approx(expected, rel=1e-9, abs=1e-6)
+
+
+def test_sale_tax_nets_gains_and_losses():
+    df = pd.DataFrame(
+        {
+            "Activo": ["A", "A", "B"],
+            "Fecha": ["2020-01-01", "2021-01-01", "2020-06-01"],
+            "Unidades": [10.0, 10.0, 10.0],
+            "Coste_€": [100.0, 300.0, 500.0],
+        }
+    )
+    ledger = LotLedger.from_frame(df)
+    # A vale 20 €/unidad: vender 10 unidades usa el primer lote (coste 100)
+    # B vale 30 €/unidad: vender 5 unidades cuesta 250 y se venden por 150
+    gains, tax = ledger.sale_tax(["A", "B", "C"], [400.0, 300.0, 100.0], [200.0, 150.0, 50.0])
+    assert gains == pytest.approx([100.0, -100.0, 0.0])
+    assert tax == pytest.approx(float(progressive_tax(0.0)))
+
+
+@pytest.mark.parametrize("target", ["edge", "centre"])
+@pytest.mark.parametrize("seed", range(15))
+def test_lowest_tax_band_rebalance_keeps_band_and_turnover(seed, target):
+    rng = random.Random(seed)
+    names = [f"A{i}" for i in range(6)]
+    _, ledger = _random_ledger(rng, names)
+    values = np.array([rng.uniform(100, 20_000) for _ in names])
+    weights = np.array([rng.uniform(0.05, 1.0) for _ in names])
+    weights /= weights.sum()
+    band = rng.choice([0.01, 0.02, 0.05])
+
+    base = rebalance_to_band(values, weights, band, target=target, names=names)
+    proposal = lowest_tax_band_rebalance(ledger, values, weights, band, names, target=target)
+    result = proposal.rebalance
+
+    # Mismo destino: no mueve más dinero que el rebalanceo de mínima rotación
+    assert result.turnover <= base.turnover + 1e-6
+    assert result.trades.sum() == pytest.approx(0.0, abs=1e-6)
+    # Ningún activo que el rebalanceo deja dentro de su banda queda fuera
+    lower, upper = band_edges(values, weights, band)
+    tol = 1e-6 * values.sum()
+    in_band_base = (base.values_after >= lower - tol) & (base.values_after <= upper + tol)
+    after = result.values_after
+    assert np.all((after[in_band_base] >= lower[in_band_base] - tol) & (after[in_band_base] <= upper[in_band_base] + tol))
+    # Y nunca paga más impuestos que las ventas del rebalanceo de referencia
+    _, base_tax = ledger.sale_tax(names, values, base.sells)
+    assert proposal.tax <= base_tax + 1e-6
@@ -0,0 +1,95 @@
+"""
+Órdenes ejecutables: importes en incrementos comprables, mínimos por orden y
+todo el presupuesto invertido salvo lo que ya no cabe en ningún incremento.
+"""
+
+import heapq
+import random
+
+import numpy as np
+import pytest
+
+import rebalance_marcos
+from planificador.cartera import Portfolio, contribution_vector
+from planificador.ordenes import plan_orders
+
+
+def _random_case(rng):
+    n = rng.randint(1, 10)
+    names = [f"A{i}" for i in range(n)]
+    portfolio = Portfolio(
+        {name: rng.choice([0.0, rng.uniform(10, 30_000)]) for name in names},
+        {name: rng.uniform(0, 40) for name in names},
+    )
+    prices = np.array([rng.choice([np.nan, rng.uniform(1, 400)]) for _ in names])
+    lots = np.array([rng.choice([1.0, 0.1, 5.0]) for _ in names])
+    min_ticket = rng.choice([0.0, 25.0, 100.0])
+    euro_step = rng.choice([1.0, 0.01, 10.0])
+    budget = rng.choice([rng.uniform(0, 200), rng.uniform(200, 5_000), rng.uniform(10_000, 200_000)])
+    return portfolio, budget, prices, lots, min_ticket, euro_step
+
+
+def _greedy_orders(portfolio, budget, prices, lots, min_ticket, euro_step):
+    """Referencia: el sobrante se reparte de incremento en incremento, siempre al activo con más déficit."""
+    has_price = np.isfinite(prices)
+    step = np.where(has_price, np.nan_to_num(prices) * lots, euro_step)
+    first = np.maximum(np.ceil(min_ticket / step - 1e-9), 1.0) * step
+    ideal = contribution_vector(portfolio, budget)
+    amounts = np.floor(ideal / step + 1e-9) * step
+    amounts[amounts < first - 1e-9] = 0.0
+    remaining = budget - amounts.sum()
+    spread = portfolio.target_weights / portfolio.target_weights.sum()
+    gaps = spread * (portfolio.total_value() + budget) - portfolio.values - amounts
+    heap = [(-gaps[i], i) for i in range(len(portfolio))]
+    heapq.heapify(heap)
+    while heap and remaining > 1e-9:
+        neg_gap, i = heapq.heappop(heap)
+        cost = step[i] if amounts[i] > 0 else first[i]
+        if cost > remaining + 1e-9:
+            continue
+        amounts[i] += cost
+        remaining -= cost
+        heapq.heappush(heap, (neg_gap + cost, i))
+    return amounts
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_orders_respect_steps_minimums_and_budget(seed):
+    rng = random.Random(seed)
+    portfolio, budget, prices, lots, min_ticket, euro_step = _random_case(rng)
+
+    plan = plan_orders(portfolio, budget, prices=prices, lot_sizes=lots, min_tickets=min_ticket, euro_step=euro_step)
+    amounts = plan.amounts
+    has_price = np.isfinite(prices)
+    step = np.where(has_price, np.nan_to_num(prices) * lots, euro_step)
+
+    assert np.all(amounts >= 0)
+    assert amounts.sum() + plan.leftover == pytest.approx(budget, abs=1e-6)
+    # Múltiplos del incremento de cada activo (acciones por lotes o euros)
+    steps_bought = amounts / step
+    assert steps_bought == pytest.approx(np.round(steps_bought), rel=1e-9, abs=1e-6)
+    assert plan.units[has_price] == pytest.approx(amounts[has_price] / prices[has_price])
+    # Ninguna orden por debajo del mínimo
+    assert np.all((amounts == 0) | (amounts >= min_ticket - 1e-6))
+    # Lo que sobra no alcanza para ningún incremento más
+    first = np.maximum(np.ceil(min_ticket / step - 1e-9), 1.0) * step
+    next_cost = np.where(amounts > 0, step, first)
+    assert plan.leftover < next_cost.min() + 1e-6
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_orders_match_step_by_step_greedy(seed):
+    rng = random.Random(seed)
+    case = _random_case(rng)
+    portfolio, budget, prices, lots, min_ticket, euro_step = case
+
+    plan = plan_orders(portfolio, budget, prices=prices, lot_sizes=lots, min_tickets=min_ticket, euro_step=euro_step)
+    assert plan.amounts == pytest.approx(_greedy_orders(*case), abs=1e-6)
+
+
+def test_cli_plan_sums_to_rounded_contribution():
+    portfolio = Portfolio({"A": 1_000.0, "B": 250.0, "C": 0.0}, {"A": 0.5, "B": 0.3, "C": 0.2})
+    for contribution in (0.4, 0.5, 100.6, 333.3, 1_000.0):
+        plan = rebalance_marcos.compute_contribution_plan(portfolio, contribution)
+        assert sum(plan.values()) == round(contribution)
+        assert all(isinstance(amount, int) and amount >= 0 for amount in plan.values())
@@ -0,0 +1,59 @@
+"""
+Proyección de varios meses del plan solo de compras frente a repetir el plan de
+un mes con la cartera reconstruida cada mes.
+"""
+
+import numpy as np
+import pytest
+
+from planificador.cartera import Portfolio, compute_contribution_plan
+from planificador.proyeccion import project_contributions
+
+
+def _month_by_month(holdings, targets, schedule, annual_returns):
+    holdings = dict(holdings)
+    contributions, values = [], []
+    for budget in schedule:
+        plan = compute_contribution_plan(Portfolio(holdings, targets), budget)
+        holdings = {name: (value + plan[name]) * (1 + annual_returns[name] / 12) for name, value in holdings.items()}
+        contributions.append(list(plan.values()))
+        values.append(list(holdings.values()))
+    return np.array(contributions), np.array(values)
+
+
+@pytest.mark.parametrize("final_contribution", [None, 900.0])
+def test_projection_matches_repeated_monthly_plan(final_contribution):
+    holdings = {"ETF World": 12_000.0, "ETF EM": 500.0, "Bonos": 0.0, "Oro": 3_000.0}
+    targets = {"ETF World": 0.6, "ETF EM": 0.15, "Bonos": 0.15, "Oro": 0.10}
+    annual_returns = {"ETF World": 0.07, "ETF EM": 0.08, "Bonos": 0.03, "Oro": 0.0}
+    months = 36
+
+    result = project_contributions(
+        Portfolio(holdings, targets),
+        300.0,
+        months,
+        annual_returns=list(annual_returns.values()),
+        final_contribution=final_contribution,
+        band=0.02,
+    )
+    last = 300.0 if final_contribution is None else final_contribution
+    schedule = [300.0 + (last - 300.0) * m / (months - 1) for m in range(months)]
+    contributions, values = _month_by_month(holdings, targets, schedule, annual_returns)
+
+    assert result.months == months
+    assert result.contributions.sum(axis=1) == pytest.approx(schedule)
+    assert result.contributions == pytest.approx(contributions, abs=1e-6)
+    assert result.values == pytest.approx(values, rel=1e-9)
+
+
+def test_first_buy_and_band_entry_months():
+    # RF vacía y muy por debajo de su objetivo: recibe todo hasta igualar a RV (10 meses)
+    portfolio = Portfolio({"RV": 10_000.0, "RF": 0.0}, {"RV": 0.5, "RF": 0.5})
+    result = project_contributions(portfolio, 1_000.0, 24, band=0.05)
+
+    assert result.first_buy_month.tolist() == [11, 1]
+    # Sin crecimiento, RF llega a 45 % (borde de la banda) tras 8.182 € aportados: en el mes 9
+    assert result.band_entry_month == 9
+    assert not result.in_band[:8].any() and result.in_band[8:].all()
+    with pytest.raises(ValueError):
+        project_contributions(portfolio, 1_000.0, 0)
@@ -0,0 +1,79 @@
+"""
+Rebalanceo con bandas: sin operaciones si todo está en banda y, si no, la mínima
+rotación que devuelve todos los activos a su banda.
+"""
+
+import numpy as np
+import pytest
+
+from planificador.rebalanceo import band_edges, band_trades, rebalance_to_band
+
+
+def _random_portfolio(rng, n):
+    values = rng.uniform(0, 20_000, size=n) * (rng.uniform(size=n) > 0.15)
+    weights = rng.dirichlet(np.ones(n))
+    return values, weights
+
+
+def test_no_trades_when_everything_is_in_band():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        weights = rng.dirichlet(np.ones(6))
+        band = 0.03
+        # Pesos actuales dentro de objetivo ± banda (y que sigan sumando 1)
+        current = np.clip(weights + rng.uniform(-0.01, 0.01, size=6), 0.0, None)
+        values = current / current.sum() * 50_000.0
+        lower, upper = band_edges(values, weights, band)
+        if np.any(values < lower) or np.any(values > upper):
+            continue
+        trades, out_of_band = band_trades(values, weights, band)
+        assert not out_of_band.any()
+        assert np.all(trades == 0.0)
+
+
+@pytest.mark.parametrize("target", ["edge", "centre"])
+@pytest.mark.parametrize("seed", range(30))
+def test_minimum_turnover_back_into_band(seed, target):
+    rng = np.random.default_rng(seed)
+    values, weights = _random_portfolio(rng, int(rng.integers(2, 10)))
+    band = float(rng.choice([0.0, 0.01, 0.02, 0.05]))
+
+    result = rebalance_to_band(values, weights, band, target=target)
+    lower, upper = band_edges(values, weights, band)
+    tol = 1e-9 * max(1.0, values.sum()) * 10
+
+    # Sin dinero nuevo y todo dentro de banda al final
+    assert result.trades.sum() == pytest.approx(0.0, abs=tol)
+    assert np.all(result.values_after >= lower - tol)
+    assert np.all(result.values_after <= upper + tol)
+    # Nunca se compra un activo por encima de su banda ni se vende uno por debajo
+    over, under = values > upper + tol, values < lower - tol
+    assert np.all(result.buys[over] <= tol)
+    assert np.all(result.sells[under] <= tol)
+
+    # Rotación mínima: lo obligatorio hasta el borde (o el centro), por 2 si hay que cuadrarlo
+    goal = weights * values.sum()
+    sell_to = upper if target == "edge" else goal
+    buy_to = lower if target == "edge" else goal
+    must_sell = np.where(over, values - sell_to, 0.0).sum()
+    must_buy = np.where(under, buy_to - values, 0.0).sum()
+    assert result.turnover == pytest.approx(2.0 * max(must_sell, must_buy), abs=tol)
+    assert np.array_equal(result.out_of_band, over | under)
+
+
+def test_band_trades_batches_match_single_portfolios():
+    rng = np.random.default_rng(42)
+    weights = rng.dirichlet(np.ones(5))
+    values = rng.uniform(0, 10_000, size=(40, 5))
+    bands = rng.choice([0.0, 0.01, 0.05], size=40)
+
+    trades, out_of_band = band_trades(values, weights, bands)
+    for row in range(values.shape[0]):
+        single = rebalance_to_band(values[row], weights, float(bands[row]))
+        assert trades[row] == pytest.approx(single.trades, abs=1e-6)
+        assert np.array_equal(out_of_band[row], single.out_of_band)
+
+
+def test_unknown_target_is_rejected():
+    with pytest.raises(ValueError):
+        band_trades(np.ones(2), np.full(2, 0.5), 0.01, target="middle")
@@ -0,0 +1,135 @@
+"""
+Comprobación cruzada de los solvers exactos de la rampa lineal con la búsqueda
+binaria sobre la simulación mes a mes que se usaba antes.
+
+Uso (desde la raíz del repositorio):
+    python -m pytest -q
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+import rebalance_marcos
+from planificador.montecarlo import simulate_monte_carlo
+from planificador.simulacion import horizon_months, simulate_dca_ramp, simulate_plans_batch, solve_ramp_final_monthly
+
+
+def _ramp_value_app(initial_monthly, final_monthly, months, annual_return, initial_value):
+    """app.py: tipo nominal r/12, aportación a final de mes."""
+    r_m = annual_return / 12.0
+    value = initial_value
+    for m in range(months):
+        frac = m / (months - 1) if months > 1 else 1.0
+        value *= 1.0 + r_m
+        value += initial_monthly + (final_monthly - initial_monthly) * frac
+    return value
+
+
+def _ramp_value_cli(initial_monthly, final_monthly, months, annual_return, initial_value):
+    """rebalance_marcos.py: tipo geométrico, aportación al inicio del mes."""
+    r_m = (1 + annual_return) ** (1 / 12) - 1
+    value = initial_value
+    for m in range(months):
+        frac = m / (months - 1) if months > 1 else 1.0
+        value += initial_monthly + (final_monthly - initial_monthly) * frac
+        value *= 1 + r_m
+    return value
+
+
+def _bisect(f, goal, low, high, steps=200):
+    """Menor x con f(x) >= goal, para f creciente; amplía el intervalo si hace falta."""
+    while f(low) >= goal:
+        low -= 2.0 * (high - low)
+    while f(high) < goal:
+        high += 2.0 * (high - low)
+    for _ in range(steps):
+        mid = (low + high) / 2.0
+        if f(mid) < goal:
+            low = mid
+        else:
+            high = mid
+    return high
+
+
+def _random_cases(seed, n=60):
+    rng = random.Random(seed)
+    cases = []
+    for i in range(n):
+        # Un tercio de los casos sin rentabilidad (r = 0)
+        annual_return = 0.0 if i % 3 == 0 else rng.uniform(0.001, 0.10)
+        cases.append(
+            (
+                rng.uniform(20_000, 1_500_000),   # objetivo
+                rng.uniform(0, 50_000),           # capital inicial
+                rng.choice([50, 150, 300, 500]),  # aportación inicial
+                rng.randint(1, 45),               # años
+                annual_return,
+            )
+        )
+    return cases
+
+
+@pytest.mark.parametrize("goal, initial_value, initial_monthly, years, annual_return", _random_cases(1))
+def test_solve_ramp_final_monthly_matches_bisection(goal, initial_value, initial_monthly, years, annual_return):
+    months = years * 12
+    exact = float(solve_ramp_final_monthly(goal, initial_value, initial_monthly, years, annual_return))
+    bisected = _bisect(
+        lambda final: _ramp_value_app(initial_monthly, final, months, annual_return, initial_value),
+        goal,
+        low=0.0,
+        high=5_000.0,
+    )
+    assert exact == pytest.approx(bisected, rel=1e-7, abs=1e-6)
+
+
+def test_solve_ramp_final_monthly_single_month():
+    # Con un único mes se aporta directamente la aportación final
+    exact = float(solve_ramp_final_monthly(1_000.0, 0.0, 100.0, 1 / 12, 0.0))
+    assert exact == pytest.approx(1_000.0)
+
+
+@pytest.mark.parametrize("tax_rate", [0.0, 0.19, 0.26])
+@pytest.mark.parametrize("goal, initial_value, initial_monthly, years, annual_return", _random_cases(2, n=30))
+def test_cli_required_growing_monthlies_matches_bisection(
+    goal, initial_value, initial_monthly, years, annual_return, tax_rate
+):
+    months = years * 12
+
+    def net(final):
+        value = _ramp_value_cli(initial_monthly, final, months, annual_return, initial_value)
+        principal = initial_value + months * (initial_monthly + final) / 2.0
+        return value - tax_rate * max(0.0, value - principal)
+
+    final_monthly, _ = rebalance_marcos.required_growing_monthlies_for_goal(
+        current_total=initial_value,
+        objetivo_final=goal,
+        years=years,
+        annual_return=annual_return,
+        initial_monthly=initial_monthly,
+        tax_rate=tax_rate,
+    )
+    # La CLI acota a >= 0 y redondea al euro
+    expected = 0 if net(0.0) >= goal else round(_bisect(net, goal, low=0.0, high=5_000.0))
+    assert abs(final_monthly - expected) <= 1
+
+
+@pytest.mark.parametrize("years", [1, 2.99, 3.5 / 12, 10.04, 1 / 24])
+def test_monte_carlo_and_deterministic_engine_use_the_same_months(years):
+    months = horizon_months(years)
+    assert months == round(years * 12)
+    assert horizon_months(np.array([years])).tolist() == [months]
+
+    deterministic, series = simulate_dca_ramp(100.0, 300.0, years, 0.06, initial_value=1_000.0)
+    assert len(series) == months
+    final = simulate_plans_batch(1_000.0, 100.0, 300.0, years, 0.06, final_only=True)
+    assert final[0] == pytest.approx(deterministic)
+    if months == 0:
+        with pytest.raises(ValueError):
+            simulate_monte_carlo(1_000.0, 100.0, 300.0, years, 0.06, 0.0, n_paths=4)
+        return
+    # Sin volatilidad todas las trayectorias son la simulación determinista
+    result = simulate_monte_carlo(1_000.0, 100.0, 300.0, years, 0.06, 0.0, n_paths=4, distribution="normal")
+    assert result.bands.shape[1] == months
+    assert result.final_values == pytest.approx(np.full(4, deterministic))
@@ -0,0 +1,124 @@
+"""
+Universo de activos: caché Feather junto al CSV y tipo de activo normalizado.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from planificador import universo
+from planificador.universo import (
+    ASSET_TYPES,
+    load_universe,
+    normalize_asset_type,
+    normalize_asset_types,
+    universe_cache_path,
+)
+
+pytest.importorskip("pyarrow")
+
+CSV_TEXT = """ISIN,Name,Type,Region,Country,ETF_Provider,Currency_Name,Search_Key
+IE00B4L5Y983, iShares Core MSCI World ,ETF,Global,Ireland,iShares,USD,ishares core msci world
+DE0007236101,Siemens,Stock,Europe,Germany,,EUR,siemens
+XS0000000001,Bono Ejemplo,Bond,Europe,Spain,,EUR,bono ejemplo
+"""
+
+
+def _legacy_asset_type(raw_type) -> str:
+    """Clasificación original de app.py, fila a fila."""
+    if not raw_type:
+        return ""
+    s = str(raw_type).strip().lower()
+    if any(x in s for x in ["etf", "index fund", "fund", "fonds"]):
+        return "ETF"
+    if any(x in s for x in ["stock", "share", "equity", "aktion", "acción", "acciones"]):
+        return "Acción"
+    if any(x in s for x in ["bond", "renta fija", "obligat"]):
+        return "Bono"
+    if any(x in s for x in ["crypto", "bitcoin", "btc", "eth"]):
+        return "Criptomoneda"
+    if any(x in s for x in ["derivative", "option", "future", "warrant"]):
+        return "Derivado"
+    if any(x in s for x in ["fund", "sicav", "fond"]):
+        return "Fondo"
+    return "Otro"
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "universo.csv"
+    path.write_text(CSV_TEXT, encoding="utf-8")
+    return path
+
+
+def test_cache_is_written_and_reused(csv_path, monkeypatch):
+    first = load_universe(csv_path)
+    assert universe_cache_path(csv_path).exists()
+    assert first["Name"].tolist()[0] == "iShares Core MSCI World"
+
+    monkeypatch.setattr(universo.pd, "read_csv", lambda *a, **k: pytest.fail("CSV leído con la caché al día"))
+    again = load_universe(csv_path)
+    pd.testing.assert_frame_equal(again, first)
+
+
+def test_cache_is_rebuilt_when_size_changes(csv_path):
+    load_universe(csv_path)
+    with open(csv_path, "a", encoding="utf-8") as f:
+        f.write("US0378331005,Apple,Stock,North America,United States,,USD,apple\n")
+    df = load_universe(csv_path)
+    assert df["ISIN"].tolist()[-1] == "US0378331005"
+
+
+def test_cache_is_rebuilt_when_content_changes_with_same_size(csv_path):
+    load_universe(csv_path)
+    stat = csv_path.stat()
+    csv_path.write_text(CSV_TEXT.replace("Siemens,", "Siemenz,"), encoding="utf-8")
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+    assert csv_path.stat().st_size == stat.st_size
+    df = load_universe(csv_path)
+    assert "Siemenz" in df["Name"].tolist()
+
+
+def test_touched_csv_with_same_content_reuses_cache(csv_path, monkeypatch):
+    first = load_universe(csv_path)
+    stat = csv_path.stat()
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+
+    monkeypatch.setattr(universo.pd, "read_csv", lambda *a, **k: pytest.fail("CSV leído con el mismo contenido"))
+    pd.testing.assert_frame_equal(load_universe(csv_path), first)
+    # Los metadatos se actualizan: la siguiente carga ya ni siquiera calcula la huella
+    monkeypatch.setattr(universo, "_file_digest", lambda path: pytest.fail("huella recalculada"))
+    load_universe(csv_path)
+
+
+def test_stale_cache_version_is_rebuilt(csv_path, monkeypatch):
+    load_universe(csv_path)
+    monkeypatch.setattr(universo, "UNIVERSE_CACHE_VERSION", "otra")
+    calls = []
+    read_csv = pd.read_csv
+    monkeypatch.setattr(universo.pd, "read_csv", lambda *a, **k: calls.append(1) or read_csv(*a, **k))
+    load_universe(csv_path)
+    assert calls == [1]
+
+
+def test_tipo_matches_legacy_classification(csv_path):
+    df = load_universe(csv_path, use_cache=False)
+    assert df["Tipo"].astype(str).tolist() == ["ETF", "Acción", "Bono"]
+
+    raw = pd.Series(
+        ["ETF", "Stock", "stock", "Bond", "Crypto", "Warrant", "SICAV", "Mutual Fund", "REIT", "", np.nan, "ETF"]
+    )
+    types = normalize_asset_types(raw)
+    assert types.astype(str).tolist() == [_legacy_asset_type(value) for value in raw]
+    assert [normalize_asset_type(value) for value in raw] == [_legacy_asset_type(value) for value in raw]
+    assert set(types.cat.categories) == set(ASSET_TYPES) | {""}
+
+
+def test_tipo_on_real_universe_matches_legacy():
+    path = "TradeRepublic_Activos_Completo.csv"
+    if not os.path.exists(path):
+        pytest.skip("no está el CSV del universo")
+    raw = pd.read_csv(path)["Type"]
+    assert normalize_asset_types(raw).astype(str).tolist() == [_legacy_asset_type(value) for value in raw]